@@ -44,6 +44,7 @@ def owner_user(db, user_statuses):
         dni='12345678',
         phone_number='987654321',
         verified=True,
+        verification_status=OwnerProfile.VERIFICATION_VERIFIED,
         status=user_statuses['active']
     )
     return owner
@@ -0,0 +1,104 @@
+import pytest
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from accommodations.models import (
+    Accommodation, AccommodationNearbyPlace, AccommodationPhoto, AccommodationService,
+    Favorite, Review, UniversityDistance,
+)
+from points.models import PointOfInterest, PointType
+from universities.models import UniversityCampus
+from users.models import OwnerProfile, StudentProfile
+from users.utils.tokens import generate_tokens_for_user
+
+User = get_user_model()
+
+# Una página pública completa (PublicAccommodationViewSet pagina de 6 en 6)
+FULL_PAGE = 6
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Sin caché entre pruebas: cada petición medida consulta la BD."""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+def authenticated_client(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {generate_tokens_for_user(user)['access']}")
+    return client
+
+
+@pytest.fixture
+def owner(db, user_status_active):
+    # Sin contraseña: el hash no es parte de lo que se mide y hace lentas las pruebas
+    user = User.objects.create_user(email='presupuesto@owner.com', first_name='Rosa', last_name='Mamani')
+    return OwnerProfile.objects.create(
+        user=user, dni='40404040', phone_number='987000111', status=user_status_active,
+        verification_status=OwnerProfile.VERIFICATION_VERIFIED,
+    )
+
+
+@pytest.fixture
+def student(db, user_status_active):
+    user = User.objects.create_user(email='presupuesto@student.com', first_name='Luis', last_name='Quispe')
+    return StudentProfile.objects.create(user=user, phone_number='912000333', status=user_status_active)
+
+
+@pytest.fixture
+def campuses(db, universities):
+    return [
+        UniversityCampus.objects.create(
+            university=university, name=f'Sede {abbreviation}',
+            latitude=Decimal('-16.40') + Decimal(i) / 100, longitude=Decimal('-71.53'),
+        )
+        for i, (abbreviation, university) in enumerate(universities.items())
+    ]
+
+
+@pytest.fixture
+def catalogue(db, owner, student, campuses, accommodation_statuses, accommodation_types, services):
+    """``catalogue(n)``: n alojamientos publicados con todas sus relaciones (fotos, servicios, distancias, lugares, reseñas, favoritos)."""
+    market = PointOfInterest.objects.create(
+        name='Mercado San Camilo', type=PointType.objects.create(name='Mercado'),
+        latitude=Decimal('-16.4010'), longitude=Decimal('-71.5320'),
+    )
+
+    def build(n):
+        created = []
+        for i in range(n):
+            acc = Accommodation.objects.create(
+                owner=owner, title=f'Departamento {i} cerca de la universidad', description='Amoblado',
+                accommodation_type=accommodation_types['departamento'], address=f'Calle Mercaderes {100 + i}',
+                latitude=Decimal('-16.3990'), longitude=Decimal('-71.5350'),
+                monthly_price=Decimal(400 + 50 * i), rooms=1 + i % 3, status=accommodation_statuses['published'],
+            )
+            AccommodationPhoto.objects.create(accommodation=acc, image=f'fotos/{acc.id}-a', is_main=True)
+            AccommodationPhoto.objects.create(accommodation=acc, image=f'fotos/{acc.id}-b', order_num=1)
+            for service in services.values():
+                AccommodationService.objects.create(accommodation=acc, service=service)
+            # Las señales ya estiman las distancias a cada sede y los lugares cercanos
+            for campus in campuses:
+                UniversityDistance.objects.update_or_create(
+                    accommodation=acc, campus=campus,
+                    defaults={'distance_km': 1.2, 'walk_time_minutes': 15, 'bus_time_minutes': 6},
+                )
+            AccommodationNearbyPlace.objects.update_or_create(
+                accommodation=acc, point_of_interest=market, defaults={'distance_km': 0.3},
+            )
+            Review.objects.create(accommodation=acc, student=student, rating=4, comment='Buena ubicación')
+            Favorite.objects.create(accommodation=acc, student=student)
+            created.append(acc)
+        return created
+
+    return build
+
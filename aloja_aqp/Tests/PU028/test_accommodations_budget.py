@@ -0,0 +1,71 @@
+"""
+PU028: PRESUPUESTO DE CONSULTAS - ALOJAMIENTOS
+----------------------------------------------
+Objetivo: Cada endpoint de alojamientos hace un número fijo de consultas, con un
+alojamiento o con una página completa (Tests/query_budget.py).
+"""
+import pytest
+
+from Tests.query_budget import assert_query_budget
+from .conftest import FULL_PAGE, authenticated_client
+
+SIZES = [1, FULL_PAGE + 1]
+
+
+@pytest.mark.parametrize('n', SIZES)
+def test_pu028_public_list(api_client, catalogue, n):
+    """PU028-1: Listado público."""
+    catalogue(n)
+    response = assert_query_budget(api_client, 'public-accommodations-list')
+    assert len(response.json()['results']) == min(n, FULL_PAGE)
+
+
+@pytest.mark.parametrize('n', SIZES)
+def test_pu028_public_filter(api_client, catalogue, universities, n):
+    """PU028-2: Filtro público, sin parámetros y con todos los que consultan relaciones."""
+    catalogue(n)
+    response = assert_query_budget(api_client, 'public-accommodations-filter-accommodations')
+    assert len(response.json()['results']) == min(n, FULL_PAGE)
+    response = assert_query_budget(api_client, 'public-accommodations-filter-accommodations', data={
+        'q': 'departamento', 'university_id': universities['UNSA'].id, 'max_walk_minutes': 20,
+        'min_price': 100, 'max_price': 5000,
+    })
+    assert len(response.json()['results']) == min(n, FULL_PAGE)
+
+
+def test_pu028_public_detail_and_autocomplete(api_client, catalogue):
+    """PU028-3: Detalle público y autocompletado."""
+    accommodations = catalogue(FULL_PAGE)
+    assert_query_budget(api_client, 'public-accommodations-detail', kwargs={'pk': accommodations[-1].pk})
+    response = assert_query_budget(api_client, 'public-accommodations-autocomplete', data={'q': 'depa'})
+    assert len(response.json()) == FULL_PAGE
+
+
+@pytest.mark.parametrize('n', SIZES)
+def test_pu028_owner_endpoints(catalogue, owner, n):
+    """PU028-4: Alojamientos del propietario y sus fotos, servicios, distancias y lugares cercanos."""
+    accommodations = catalogue(n)
+    client = authenticated_client(owner.user)
+    response = assert_query_budget(client, 'accommodation-list')
+    assert len(response.json()) == n
+    assert_query_budget(client, 'accommodation-detail', kwargs={'pk': accommodations[0].pk})
+    for url_name in ('accommodationphoto-list', 'accommodationservice-list',
+                     'universitydistance-list', 'accommodationnearbyplace-list'):
+        assert len(assert_query_budget(client, url_name).json()) >= n
+
+
+@pytest.mark.parametrize('n', SIZES)
+def test_pu028_student_endpoints(catalogue, student, n):
+    """PU028-5: Reseñas y favoritos del estudiante."""
+    catalogue(n)
+    client = authenticated_client(student.user)
+    assert len(assert_query_budget(client, 'review-list').json()) == n
+    assert len(assert_query_budget(client, 'favorite-list').json()) == n
+
+
+def test_pu028_reference_data(api_client, catalogue):
+    """PU028-6: Estados, tipos, servicios predefinidos e isócronas."""
+    catalogue(1)
+    for url_name in ('accommodationstatus-list', 'accommodationtype-list',
+                     'predefinedservice-list', 'campusisochrone-list'):
+        assert_query_budget(api_client, url_name)
@@ -0,0 +1,26 @@
+"""
+PU028: PRESUPUESTO DE CONSULTAS - UNIVERSIDADES
+-----------------------------------------------
+Objetivo: Universidades (con sus sedes) y sedes hacen un número fijo de
+consultas, sin importar cuántas sedes haya.
+"""
+import pytest
+from decimal import Decimal
+from universities.models import UniversityCampus
+
+from Tests.query_budget import assert_query_budget
+
+
+@pytest.mark.parametrize('extra', [0, 5])
+def test_pu028_universities(api_client, universities, campuses, extra):
+    """PU028-9: Listado y detalle de universidades con sus sedes, y listado de sedes."""
+    unsa = universities['UNSA']
+    for i in range(extra):
+        UniversityCampus.objects.create(
+            university=unsa, name=f'Sede anexa {i}', latitude=Decimal('-16.41'), longitude=Decimal('-71.52'),
+        )
+    response = assert_query_budget(api_client, 'university-list')
+    assert sum(len(u['campuses']) for u in response.json()) == len(campuses) + extra
+    response = assert_query_budget(api_client, 'university-detail', kwargs={'pk': unsa.pk})
+    assert len(response.json()['campuses']) == 1 + extra
+    assert len(assert_query_budget(api_client, 'universitycampus-list').json()) == len(campuses) + extra
@@ -0,0 +1,26 @@
+"""
+PU028: PRESUPUESTO DE CONSULTAS - USUARIOS
+------------------------------------------
+Objetivo: El perfil propio y el perfil público del propietario hacen un número
+fijo de consultas, sin importar cuántas sedes tenga el estudiante.
+"""
+import pytest
+from universities.models import StudentUniversity
+
+from Tests.query_budget import assert_query_budget
+from .conftest import authenticated_client
+
+
+@pytest.mark.parametrize('n', [1, 4])
+def test_pu028_current_user_profile(student, campuses, n):
+    """PU028-7: /me/ sin caché, con una o con varias sedes."""
+    for campus in campuses[:n]:
+        StudentUniversity.objects.create(student=student, campus=campus)
+    response = assert_query_budget(authenticated_client(student.user), 'current-user-profile')
+    assert len(response.json()['student_profile']['campuses']) == n
+
+
+def test_pu028_owner_detail(api_client, owner):
+    """PU028-8: Perfil público del propietario con su usuario."""
+    response = assert_query_budget(api_client, 'owner-detail', kwargs={'id': owner.id})
+    assert response.json()['user']['email'] == owner.user.email
@@ -0,0 +1,132 @@
+"""
+Query budgets per API endpoint.
+
+``QUERY_BUDGETS`` maps a URL name to the most SQL queries one request to it
+may run, whatever the amount of data or the page size (the budget tests run
+each endpoint with a few rows and with a full page). A request over budget
+fails with the duplicated statements first: the same SQL with different
+parameters repeated per row is an N+1.
+
+    response = assert_query_budget(api_client, 'public-accommodations-filter-accommodations',
+                                   data={'university_id': 1})
+
+    with query_budget(3, 'rebuild index'):
+        rebuild_index()
+
+Budgets count what a request runs in production: authentication checks
+included, but not the reloads of the reference tables (core.reference) that
+only happen because a test runs inside a transaction; those are listed apart.
+"""
+import re
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.reference import REFERENCE_MODELS
+
+QUERY_BUDGETS = {
+    # accommodations, public: COUNT, page and the 5 prefetches of accommodation_serializer_prefetch
+    'public-accommodations-list': 7,
+    'public-accommodations-detail': 6,
+    'public-accommodations-autocomplete': 2,
+    # + the price/rooms bounds of the whole catalogue
+    'public-accommodations-filter-accommodations': 8,
+    'accommodationstatus-list': 1,
+    'accommodationtype-list': 1,
+    'predefinedservice-list': 1,
+    'campusisochrone-list': 1,
+    # accommodations, authenticated: + token roles check, the owner and its user
+    'accommodation-list': 9,
+    'accommodation-detail': 8,
+    'accommodationphoto-list': 1,
+    'accommodationservice-list': 1,
+    'universitydistance-list': 1,
+    'accommodationnearbyplace-list': 1,
+    'review-list': 2,
+    'favorite-list': 1,
+    # universities
+    'university-list': 2,
+    'university-detail': 2,
+    'universitycampus-list': 1,
+    # users: token roles check (cached between requests) + load_user_for_response
+    'current-user-profile': 4,
+    'owner-detail': 1,
+}
+
+# Literals replaced to group the same statement run with different parameters
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'IN \((?:\?, )*\?\)')
+MAX_SQL_CHARS = 400
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@lru_cache(maxsize=None)
+def _reference_reloads():
+    """The full-table reads of ReferenceTable (``SELECT pk, name FROM <table>``)."""
+    tables = '|'.join(re.escape(apps.get_model(label)._meta.db_table) for label in REFERENCE_MODELS)
+    return re.compile(rf'SELECT "({tables})"\."\w+" AS "pk", "\1"\."\w+" AS "\w+" FROM "\1"')
+
+
+def is_reference_reload(sql):
+    return _reference_reloads().fullmatch(sql) is not None
+
+
+def normalize_sql(sql):
+    """``sql`` with its literals as ``?`` (and ``IN (...)`` lists collapsed)."""
+    return _IN_LISTS.sub('IN (...)', _LITERALS.sub('?', sql))
+
+
+def duplicated_queries(queries):
+    """[(times, normalized sql)] of the statements run more than once, most repeated first."""
+    counts = Counter(normalize_sql(q['sql']) for q in queries)
+    return [(n, sql) for sql, n in counts.most_common() if n > 1]
+
+
+def _shorten(sql):
+    return sql if len(sql) <= MAX_SQL_CHARS else sql[:MAX_SQL_CHARS] + '...'
+
+
+def budget_report(label, budget, queries, ignored=()):
+    lines = [f'{label}: {len(queries)} queries, budget {budget}.']
+    duplicated = duplicated_queries(queries)
+    if duplicated:
+        lines.append('Duplicated SQL (probably N+1):')
+        lines += [f'  {n}x {_shorten(sql)}' for n, sql in duplicated]
+    lines.append('All queries:')
+    lines += [f'  {i}. {_shorten(q["sql"])}' for i, q in enumerate(queries, 1)]
+    if ignored:
+        lines.append(f'Not counted: {len(ignored)} reference table reloads')
+    return '\n'.join(lines)
+
+
+@contextmanager
+def query_budget(budget, label='block', using=DEFAULT_DB_ALIAS):
+    """Fail with :class:`QueryBudgetExceeded` if the block runs more than ``budget`` queries."""
+    with CaptureQueriesContext(connections[using]) as ctx:
+        yield ctx
+    queries, ignored = [], []
+    for query in ctx.captured_queries:
+        (ignored if is_reference_reload(query['sql']) else queries).append(query)
+    if len(queries) > budget:
+        raise QueryBudgetExceeded(budget_report(label, budget, queries, ignored))
+
+
+def assert_query_budget(client, url_name, *, args=None, kwargs=None, method='get', data=None,
+                        budget=None, expected_status=200, **extra):
+    """Request ``url_name`` with ``client`` within its budget (``QUERY_BUDGETS`` unless ``budget``)."""
+    budget = QUERY_BUDGETS[url_name] if budget is None else budget
+    url = reverse(url_name, args=args, kwargs=kwargs)
+    with query_budget(budget, f'{method.upper()} {url}'):
+        response = getattr(client, method)(url, data, **extra)
+    assert response.status_code == expected_status, (
+        f'{method.upper()} {url} answered {response.status_code}: {response.content[:500]!r}'
+    )
+    return response
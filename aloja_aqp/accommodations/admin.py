@@ -1,9 +1,80 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db.models import Case, CharField, Func, IntegerField, When
+from django.db.models.fields.json import KeyTextTransform, KeyTransform
+from django.db.models.lookups import Exact
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
+from django.utils.html import format_html_join
 from .models import (
     Accommodation, AccommodationType, AccommodationStatus, AccommodationPhoto, 
     PredefinedService, AccommodationService, UniversityDistance, 
-    AccommodationNearbyPlace, Review, Favorite
+    AccommodationNearbyPlace, Review, Favorite, CampusDistanceJob, CampusIsochrone
 )
+from .tasks import STALE_JOB_MINUTES, requeue_stale_job, run_campus_distance_job
+from core.background import run_in_background
+
+# Filas relacionadas que muestran los inlines de reseñas, favoritos, distancias y lugares cercanos
+INLINE_MAX_ROWS = 20
+
+
+def with_route_summary(queryset):
+    """``queryset`` de UniversityDistance sin ``route``, con su tipo y número de puntos calculados en Postgres."""
+    coordinates = KeyTransform('coordinates', 'route')
+    return queryset.defer('route').annotate(
+        route_type=KeyTextTransform('type', 'route'),
+        route_points=Case(
+            When(
+                Exact(Func(coordinates, function='jsonb_typeof', output_field=CharField()), 'array'),
+                then=Func(coordinates, function='jsonb_array_length', output_field=IntegerField()),
+            ),
+        ),
+    )
+
+
+def route_summary(obj):
+    if getattr(obj, 'route_type', None) is None:
+        return '-'
+    if obj.route_points is None:
+        return obj.route_type
+    return f"{obj.route_type}, {obj.route_points} puntos"
+
+
+class CappedInlineFormSet(BaseInlineFormSet):
+    """Muestra solo las primeras ``max_rows`` filas relacionadas (en el orden del inline)."""
+    max_rows = INLINE_MAX_ROWS
+
+    def get_queryset(self):
+        if not hasattr(self, '_capped_queryset'):
+            queryset = super().get_queryset()
+            if self.is_bound:
+                # Al guardar: las filas que venían en el formulario, aunque otras más nuevas las hayan desplazado
+                pk_name = self.model._meta.pk.name
+                posted = (self.data.get(f'{self.add_prefix(i)}-{pk_name}', '') for i in range(self.initial_form_count()))
+                queryset = queryset.filter(pk__in=[pk for pk in posted if str(pk).isdigit()])
+            else:
+                queryset = queryset.filter(pk__in=queryset.values('pk')[:self.max_rows])
+            self._capped_queryset = queryset
+        return self._capped_queryset
+
+
+class CappedInline(admin.TabularInline):
+    """
+    Inline para relaciones que crecen sin límite. Las claves foráneas se
+    muestran de solo lectura (un widget por fila haría una consulta por fila);
+    las filas se crean y reasignan desde el admin de su modelo, con autocompletado.
+    """
+    formset = CappedInlineFormSet
+    max_rows = INLINE_MAX_ROWS
+    extra = 0
+    show_change_link = True
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.max_rows = self.max_rows
+        return formset
 
 @admin.register(AccommodationType)
 class AccommodationTypeAdmin(admin.ModelAdmin):
@@ -23,32 +94,72 @@ class AccommodationServiceInline(admin.TabularInline):
     model = AccommodationService
     extra = 1
 
-class UniversityDistanceInline(admin.TabularInline):
+class UniversityDistanceInline(CappedInline):
     model = UniversityDistance
-    extra = 1
+    # La ruta GeoJSON no se carga: solo su resumen
+    fields = ('campus', 'distance_km', 'walk_time_minutes', 'bus_time_minutes', 'precision', 'route_summary')
+    readonly_fields = ('campus', 'route_summary')
+    ordering = ('distance_km',)
+
+    def get_queryset(self, request):
+        return with_route_summary(super().get_queryset(request)).select_related('accommodation', 'campus__university')
+
+    def route_summary(self, obj):
+        return route_summary(obj)
+    route_summary.short_description = 'Route'
 
-class NearbyPlaceInline(admin.TabularInline):
+class NearbyPlaceInline(CappedInline):
     model = AccommodationNearbyPlace
-    extra = 1
+    readonly_fields = ('point_of_interest',)
+    ordering = ('distance_km',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('accommodation', 'point_of_interest__type')
 
-class ReviewInline(admin.TabularInline):
+class ReviewInline(CappedInline):
     model = Review
-    extra = 0
+    readonly_fields = ('student', 'review_date')
+    ordering = ('-review_date',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('student__user', 'student__status')
 
-class FavoriteInline(admin.TabularInline):
+class FavoriteInline(CappedInline):
     model = Favorite
-    extra = 0
     readonly_fields = ('student', 'accommodation', 'date_added')
     can_delete = False
+    ordering = ('-date_added',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('accommodation', 'student__user', 'student__status')
 
 @admin.register(Accommodation)
 class AccommodationAdmin(admin.ModelAdmin):
     list_display = ('title', 'owner', 'accommodation_type', 'status', 'monthly_price', 'publication_date')
     list_filter = ('accommodation_type', 'status', 'publication_date')
+    list_select_related = ('owner__user', 'owner__status', 'accommodation_type', 'status')
     search_fields = ('title', 'owner__user__email', 'address')
     ordering = ('-publication_date',)
+    autocomplete_fields = ('owner', 'accommodation_type', 'status')
+    readonly_fields = ('related_rows',)
     inlines = [AccommodationPhotoInline, AccommodationServiceInline, UniversityDistanceInline, NearbyPlaceInline, ReviewInline, FavoriteInline]
 
+    def related_rows(self, obj):
+        """Totales de las relaciones recortadas en los inlines, con enlace a su listado completo."""
+        if not obj or not obj.pk:
+            return '-'
+        related = (
+            ('Reseñas', Review.objects.filter(accommodation=obj), 'admin:accommodations_review_changelist'),
+            ('Favoritos', Favorite.objects.filter(accommodation=obj), 'admin:accommodations_favorite_changelist'),
+            ('Distancias', UniversityDistance.objects.filter(accommodation=obj), 'admin:accommodations_universitydistance_changelist'),
+            ('Lugares cercanos', AccommodationNearbyPlace.objects.filter(accommodation=obj), 'admin:accommodations_accommodationnearbyplace_changelist'),
+        )
+        return format_html_join(
+            ' · ', '{}: <a href="{}?accommodation__id__exact={}">{}</a>',
+            ((label, reverse(url), obj.pk, queryset.count()) for label, queryset, url in related),
+        )
+    related_rows.short_description = f'Relaciones (los inlines muestran hasta {INLINE_MAX_ROWS})'
+
 @admin.register(PredefinedService)
 class PredefinedServiceAdmin(admin.ModelAdmin):
     list_display = ('name',)
@@ -59,11 +170,21 @@ class AccommodationServiceAdmin(admin.ModelAdmin):
     list_display = ('accommodation', 'service', 'detail')
     search_fields = ('accommodation__title', 'service__name')
     list_filter = ('service',)
+    list_select_related = ('accommodation', 'service')
+    autocomplete_fields = ('accommodation', 'service')
 
 @admin.register(UniversityDistance)
 class UniversityDistanceAdmin(admin.ModelAdmin):
     list_display = ('accommodation', 'campus_name', 'university_name', 'distance_km', 'walk_time_minutes', 'bus_time_minutes')
     search_fields = ('accommodation__title', 'campus__university__name')
+    list_select_related = ('accommodation', 'campus__university')
+    autocomplete_fields = ('accommodation', 'campus')
+    # La ruta GeoJSON (miles de coordenadas) no se carga ni se edita aquí
+    exclude = ('route',)
+    readonly_fields = ('route_summary', 'fingerprint')
+
+    def get_queryset(self, request):
+        return with_route_summary(super().get_queryset(request))
 
     def campus_name(self, obj):
         return obj.campus.name
@@ -75,24 +196,73 @@ class UniversityDistanceAdmin(admin.ModelAdmin):
     university_name.admin_order_field = 'campus__university__name'
     university_name.short_description = 'University Name'
 
+    def route_summary(self, obj):
+        return route_summary(obj)
+    route_summary.short_description = 'Route'
+
 
 @admin.register(AccommodationNearbyPlace)
 class AccommodationNearbyPlaceAdmin(admin.ModelAdmin):
     list_display = ('accommodation', 'point_of_interest', 'distance_km', 'walking_time_min')
     search_fields = ('accommodation__title', 'point_of_interest__name')
+    list_select_related = ('accommodation', 'point_of_interest__type')
+    autocomplete_fields = ('accommodation', 'point_of_interest')
 
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
     list_display = ('accommodation', 'student', 'rating', 'status', 'review_date')
     list_filter = ('status', 'review_date')
     search_fields = ('accommodation__title', 'student__user__email', 'comment')
+    list_select_related = ('accommodation', 'student__user', 'student__status')
+    autocomplete_fields = ('accommodation', 'student')
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('student', 'accommodation', 'date_added')
     search_fields = ('student__user__email', 'accommodation__title')
     readonly_fields = ('student', 'accommodation', 'date_added')
+    list_select_related = ('accommodation', 'student__user', 'student__status')
 
 @admin.register(AccommodationPhoto)
 class AccommodationPhotoAdmin(admin.ModelAdmin):
-    pass
\ No newline at end of file
+    list_select_related = ('accommodation',)
+    autocomplete_fields = ('accommodation',)
+
+
+@admin.register(CampusDistanceJob)
+class CampusDistanceJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'campus', 'status', 'phase', 'progress', 'errors', 'created_at', 'updated_at', 'finished_at')
+    list_filter = ('status',)
+    list_select_related = ('campus__university',)
+    readonly_fields = [f.name for f in CampusDistanceJob._meta.fields]
+    actions = ['resume_jobs']
+
+    def progress(self, obj):
+        return f"{obj.processed}/{obj.total} ({obj.progress_percent}%)"
+    progress.short_description = 'Progress'
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Reanudar jobs seleccionados (fallidos o interrumpidos)')
+    def resume_jobs(self, request, queryset):
+        count = 0
+        for job_id in queryset.values_list('id', flat=True):
+            # Los que tienen un checkpoint reciente siguen corriendo: no se lanzan dos veces
+            if requeue_stale_job(job_id):
+                run_in_background(run_campus_distance_job, job_id)
+                count += 1
+        self.message_user(
+            request,
+            f"{count} jobs reanudados en segundo plano; los demás siguen en curso "
+            f"(checkpoint de hace menos de {STALE_JOB_MINUTES} min), terminados o cancelados.",
+            messages.INFO,
+        )
+
+
+@admin.register(CampusIsochrone)
+class CampusIsochroneAdmin(admin.ModelAdmin):
+    list_display = ('campus', 'minutes', 'source', 'accommodation_count', 'computed_at')
+    list_filter = ('minutes', 'source')
+    list_select_related = ('campus__university',)
+    readonly_fields = ('computed_at',)
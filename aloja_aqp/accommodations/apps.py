@@ -14,3 +14,14 @@ class AccommodationsConfig(AppConfig):
             # No queremos que un error en signals impida que la app arranque;
             # los problemas se deben investigar en desarrollo/CI.
             pass
+
+        # build_address_index publica 'gazetteer' en el bus: cada worker recarga el archivo
+        from core.invalidation import subscribe
+        from .utils.address_search import invalidate_address_index
+        from .utils.geocoding import invalidate_gazetteer
+
+        def reload_gazetteer(payload):
+            invalidate_address_index()
+            invalidate_gazetteer()
+
+        subscribe('gazetteer', reload_gazetteer)
@@ -0,0 +1,162 @@
+"""
+Vistas asíncronas del camino de lectura público (servidas por ASGI, ver aloja_aqp/asgi.py).
+
+Mientras esperan a la base de datos o a Nominatim no ocupan un worker: las
+consultas usan el ORM asíncrono de Django y las llamadas salientes httpx.
+Responden el mismo JSON que las vistas DRF a las que reemplazan (paginación
+incluida), sin autenticación: son endpoints públicos.
+"""
+import math
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q, prefetch_related_objects
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from core.reference import reference_table
+from core.timing import timed
+
+from .models import Accommodation, AccommodationPhoto, AccommodationStatus
+from .serializers import (
+    ACCOMMODATION_SERIALIZER_SELECT, AccommodationSerializer, accommodation_serializer_prefetch,
+)
+from .utils.geocoding import areverse_geocode
+
+# Igual que PublicAccommodationViewSet.TenPerPagePagination
+PUBLIC_PAGE_SIZE = 6
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+
+def json_response(data, status=200):
+    """Respuesta JSON con el encoder de DRF (Decimal, fechas, UUID...)."""
+    with timed('serialize'):
+        body = JSONRenderer().render(data)
+    return HttpResponse(body, content_type='application/json', status=status)
+
+
+async def published_accommodations():
+    published = await reference_table(AccommodationStatus).aid('published')
+    if published is None:
+        return Accommodation.objects.none()
+    return Accommodation.objects.filter(status_id=published)
+
+
+def _serialize_accommodations(request, accommodations):
+    prefetch_related_objects(accommodations, *accommodation_serializer_prefetch())
+    context = {'request': request}
+    university_id = request.GET.get('university_id')
+    if university_id:
+        context['selected_university_id'] = university_id
+    with timed('serialize'):
+        return AccommodationSerializer(accommodations, many=True, context=context).data
+
+
+async def serialize_accommodations(request, accommodations):
+    """Datos de AccommodationSerializer para ``accommodations``.
+
+    El serializer es código síncrono: la precarga de relaciones (5 consultas
+    para toda la página) y la serialización corren juntas en un solo hilo.
+    """
+    return await sync_to_async(_serialize_accommodations)(request, accommodations)
+
+
+class ReverseGeocodeView(View):
+    """Reverse geocoding (caché por celda de ~20 m, límite de Nominatim y gazetteer local de respaldo)."""
+
+    async def get(self, request):
+        lat = request.GET.get('lat')
+        lon = request.GET.get('lon')
+        if not lat or not lon:
+            return json_response({'error': 'lat and lon are required'}, status=400)
+        try:
+            lat, lon = float(lat), float(lon)
+        except ValueError:
+            return json_response({'error': 'lat and lon must be numbers'}, status=400)
+        # float() acepta "nan" e "inf"
+        if not (math.isfinite(lat) and math.isfinite(lon) and abs(lat) <= 90 and abs(lon) <= 180):
+            return json_response({'error': 'lat must be within [-90, 90] and lon within [-180, 180]'}, status=400)
+        result = await areverse_geocode(lat, lon)
+        if result is None:
+            return json_response({'error': 'Reverse geocoding unavailable'}, status=502)
+        return json_response(result)
+
+
+class PublicAccommodationListView(View):
+    """Alojamientos publicados, paginados de a PUBLIC_PAGE_SIZE (?page=)."""
+    replica_reads = True
+
+    async def get(self, request):
+        qs = (await published_accommodations()).select_related(*ACCOMMODATION_SERIALIZER_SELECT)
+        count = await qs.acount()
+        last_page = max(1, math.ceil(count / PUBLIC_PAGE_SIZE))
+        page = request.GET.get('page', '1')
+        if page == 'last':
+            page = last_page
+        try:
+            page = int(page)
+        except ValueError:
+            page = 0
+        if not 1 <= page <= last_page:
+            return json_response({'detail': 'Invalid page.'}, status=404)
+
+        start = (page - 1) * PUBLIC_PAGE_SIZE
+        accommodations = [a async for a in qs[start:start + PUBLIC_PAGE_SIZE]]
+        url = request.build_absolute_uri()
+        previous = None
+        if page > 1:
+            previous = replace_query_param(url, 'page', page - 1) if page > 2 else remove_query_param(url, 'page')
+        return json_response({
+            'count': count,
+            'next': replace_query_param(url, 'page', page + 1) if page < last_page else None,
+            'previous': previous,
+            'results': await serialize_accommodations(request, accommodations),
+        })
+
+
+class PublicAccommodationDetailView(View):
+    replica_reads = True
+
+    async def get(self, request, pk):
+        qs = (await published_accommodations()).select_related(*ACCOMMODATION_SERIALIZER_SELECT)
+        accommodation = await qs.filter(pk=pk).afirst()
+        if accommodation is None:
+            return json_response({'detail': 'No Accommodation matches the given query.'}, status=404)
+        return json_response((await serialize_accommodations(request, [accommodation]))[0])
+
+
+class PublicAccommodationAutocompleteView(View):
+    """Sugerencias por título o dirección (?q=, ?limit=) con la miniatura de la primera foto."""
+    replica_reads = True
+
+    async def get(self, request):
+        q = request.GET.get('q', '').strip()
+        try:
+            limit = min(int(request.GET.get('limit', 8)), AUTOCOMPLETE_MAX_LIMIT)
+        except ValueError:
+            return json_response({'error': 'limit must be an integer'}, status=400)
+        if limit < 1:
+            return json_response({'error': 'limit must be at least 1'}, status=400)
+        if not q:
+            return json_response([])
+        qs = (await published_accommodations()).filter(Q(title__icontains=q) | Q(address__icontains=q))
+        rows = [a async for a in qs.only('id', 'title', 'address', 'monthly_price', 'rooms')[:limit]]
+
+        # Primera foto de cada resultado en una sola consulta
+        thumbnails = {}
+        photos = AccommodationPhoto.objects.filter(accommodation_id__in=[a.id for a in rows]).order_by('id')
+        async for photo in photos.only('id', 'accommodation_id', 'image'):
+            if photo.accommodation_id not in thumbnails:
+                thumbnails[photo.accommodation_id] = photo.image.url if photo.image else None
+        return json_response([
+            {
+                'id': a.id,
+                'title': a.title,
+                'address': a.address,
+                'monthly_price': str(a.monthly_price),
+                'rooms': a.rooms,
+                'thumbnail': thumbnails.get(a.id),
+            }
+            for a in rows
+        ])
@@ -0,0 +1,79 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from accommodations.models import Accommodation, AccommodationStatus, UniversityDistance
+from accommodations.utils.routing import route_fingerprint_sql, route_or_estimate
+from universities.models import UniversityCampus
+
+
+def stale_distance_pairs(limit=None):
+    """Accommodation x campus pairs whose UniversityDistance is missing or stale.
+
+    One query: every (accommodation, campus) pair with coordinates, anti-joined
+    against the distance rows whose fingerprint matches the current
+    coordinates. Deleted listings are left out. Yields
+    ``(accommodation_id, campus_id, acc_lat, acc_lon, campus_lat, campus_lon, missing)``.
+    """
+    acc_table = Accommodation._meta.db_table
+    campus_table = UniversityCampus._meta.db_table
+    dist_table = UniversityDistance._meta.db_table
+    status_table = AccommodationStatus._meta.db_table
+    expected = route_fingerprint_sql('a.latitude', 'a.longitude', 'c.latitude', 'c.longitude')
+    sql = f"""
+        SELECT a.id, c.id, a.latitude, a.longitude, c.latitude, c.longitude, d.id IS NULL
+        FROM {acc_table} a
+        CROSS JOIN {campus_table} c
+        LEFT JOIN {dist_table} d ON d.accommodation_id = a.id AND d.campus_id = c.id
+        LEFT JOIN {status_table} s ON s.id = a.status_id
+        WHERE a.latitude IS NOT NULL AND a.longitude IS NOT NULL
+          AND c.latitude IS NOT NULL AND c.longitude IS NOT NULL
+          AND s.name IS DISTINCT FROM 'deleted'
+          AND (d.id IS NULL OR d.fingerprint <> {expected})
+        ORDER BY a.id, c.id
+    """
+    params = []
+    if limit:
+        sql += ' LIMIT %s'
+        params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        yield from cursor
+
+
+class Command(BaseCommand):
+    help = 'Recompute only the UniversityDistance rows that are missing or whose coordinates changed since they were computed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=0, help='Max pairs to recompute (0 = all)')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to sleep after each routed pair (rate limiting)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many pairs are missing/stale')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        pairs = list(stale_distance_pairs(limit=options['limit'] or None))
+        missing = sum(1 for p in pairs if p[6])
+        self.stdout.write(f'{len(pairs)} pairs to recompute ({missing} missing, {len(pairs) - missing} stale)')
+        if options['dry_run']:
+            return
+
+        updated = failed = 0
+        for acc_id, campus_id, acc_lat, acc_lon, campus_lat, campus_lon, _ in pairs:
+            try:
+                defaults = route_or_estimate(acc_lat, acc_lon, campus_lat, campus_lon)
+            except Exception as e:
+                self.stderr.write(f'Error routing accommodation={acc_id} campus={campus_id}: {e}')
+                failed += 1
+                continue
+            if not defaults:
+                failed += 1
+                continue
+            UniversityDistance.objects.update_or_create(accommodation_id=acc_id, campus_id=campus_id, defaults=defaults)
+            updated += 1
+            if options['sleep'] and defaults['precision'] == UniversityDistance.PRECISION_ROUTED:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Done. Recomputed {updated} pairs, {failed} failed, in {time.monotonic() - started:.1f}s.'
+        ))
@@ -0,0 +1,196 @@
+"""
+Latency, query count and response size of the public search endpoints.
+
+Requests go through Django's test client against the configured database (no
+server, no network), so the numbers are the view, ORM and serializer cost of
+each endpoint. Every scenario is warmed up and then requested ``--repeat``
+times; the report has p50/p95 latency, the queries per request and the
+response bytes. Scenario parameters (campus, university, type, services,
+prices) are picked from the data, e.g. a catalogue from ``generate_catalogue``.
+
+    python manage.py benchmark_search --output before.json
+    python manage.py benchmark_search --output after.json --compare before.json
+"""
+import json
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accommodations.models import Accommodation, AccommodationService, UniversityDistance
+
+WALK_MINUTES = 15
+
+
+def percentile(sorted_values, q):
+    """``q``-th percentile (1..99) of an ascending list."""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    return statistics.quantiles(sorted_values, n=100)[q - 1]
+
+
+def build_scenarios(detail_samples=20):
+    """[(name, path, params or list of params to cycle through)] for the current data."""
+    published = Accommodation.objects.filter(status__name='published')
+    # Evenly spaced ids: the same sample on every run over the same data
+    all_ids = list(published.order_by('id').values_list('id', flat=True))
+    ids = all_ids[::max(1, len(all_ids) // detail_samples)][:detail_samples]
+    if not ids:
+        raise CommandError('No published accommodations; run generate_catalogue first')
+
+    prices = sorted(published.values_list('monthly_price', flat=True))
+    low, high = str(prices[len(prices) // 4]), str(prices[3 * len(prices) // 4])
+    busiest = (
+        UniversityDistance.objects.values('campus_id', 'campus__university_id')
+        .annotate(n=Count('id')).order_by('-n').first()
+    ) or {}
+    campus_id, university_id = busiest.get('campus_id'), busiest.get('campus__university_id')
+    type_id = (
+        published.exclude(accommodation_type=None).values('accommodation_type')
+        .annotate(n=Count('id')).order_by('-n').values_list('accommodation_type', flat=True).first()
+    )
+    services = list(
+        AccommodationService.objects.values('service').annotate(n=Count('id')).order_by('-n')
+        .values_list('service', flat=True)[:2]
+    )
+    q = published.values_list('title', flat=True).first().split()[0]
+
+    filter_path = reverse('public-accommodations-filter-accommodations')
+    scenarios = [
+        ('list', reverse('public-accommodations-list'), {}),
+        ('list_last_page', reverse('public-accommodations-list'), {'page': 'last'}),
+        ('detail', None, [{'pk': pk} for pk in ids]),
+        ('autocomplete', reverse('public-accommodations-autocomplete'), {'q': q[:4]}),
+        ('filter', filter_path, {}),
+        ('filter_q', filter_path, {'q': q}),
+        ('filter_min_price', filter_path, {'min_price': low}),
+        ('filter_max_price', filter_path, {'max_price': high}),
+        ('filter_price_range', filter_path, {'min_price': low, 'max_price': high}),
+        ('filter_min_rooms', filter_path, {'min_rooms': 2}),
+        ('filter_max_rooms', filter_path, {'max_rooms': 1}),
+    ]
+    if type_id:
+        scenarios.append(('filter_accommodation_type', filter_path, {'accommodation_type': type_id}))
+    if services:
+        scenarios.append(('filter_services', filter_path, {'services': ','.join(map(str, services))}))
+    if campus_id:
+        scenarios += [
+            ('filter_campus_id', filter_path, {'campus_id': campus_id}),
+            ('filter_campus_walk', filter_path, {'campus_id': campus_id, 'max_walk_minutes': WALK_MINUTES}),
+            ('filter_university_id', filter_path, {'university_id': university_id}),
+            ('filter_combined', filter_path, {
+                'university_id': university_id, 'max_walk_minutes': WALK_MINUTES,
+                'min_price': low, 'max_price': high, **({'services': services[0]} if services else {}),
+            }),
+        ]
+    return scenarios
+
+
+def run_scenario(client, name, path, params, repeat, warmup):
+    variants = params if isinstance(params, list) else [params]
+    latencies, queries, sizes, statuses = [], [], [], set()
+    for i in range(warmup + repeat):
+        variant = variants[i % len(variants)]
+        if path is None:
+            url, query = reverse('public-accommodations-detail', kwargs=variant), {}
+        else:
+            url, query = path, variant
+        # The query log is capped (9000 entries); start each request with an empty one
+        reset_queries()
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            response = client.get(url, query)
+            elapsed = time.perf_counter() - started
+        if i < warmup:
+            continue
+        latencies.append(elapsed * 1000)
+        queries.append(len(ctx.captured_queries))
+        sizes.append(len(response.content))
+        statuses.add(response.status_code)
+
+    latencies.sort()
+    return {
+        'name': name,
+        'path': path or reverse('public-accommodations-detail', kwargs=variants[0]),
+        'params': variants[0] if path else {},
+        'requests': repeat,
+        'status': sorted(statuses),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'mean_ms': round(statistics.fmean(latencies), 2),
+        'queries': int(statistics.median(queries)),
+        'queries_max': max(queries),
+        'bytes': int(statistics.median(sizes)),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Measure p50/p95 latency, queries and bytes of the public list, filter, autocomplete and detail endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=30, help='Measured requests per scenario')
+        parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests per scenario')
+        parser.add_argument('--only', action='append', help='Run only this scenario (repeatable)')
+        parser.add_argument('--host', default='localhost', help='Host header sent (must be in ALLOWED_HOSTS)')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--compare', help='JSON file from an earlier run to print the differences against')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        scenarios = build_scenarios()
+        if options['only']:
+            scenarios = [s for s in scenarios if s[0] in options['only']]
+            if not scenarios:
+                raise CommandError('No scenario matches --only')
+
+        client = Client(HTTP_HOST=options['host'])
+        results = [
+            run_scenario(client, name, path, params, options['repeat'], options['warmup'])
+            for name, path, params in scenarios
+        ]
+        report = {
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'accommodations': Accommodation.objects.count(),
+            'published': Accommodation.objects.filter(status__name='published').count(),
+            'repeat': options['repeat'],
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+
+        baseline = {}
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                baseline = {r['name']: r for r in json.load(f)['results']}
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(
+            f"{report['published']}/{report['accommodations']} published accommodations, "
+            f"{options['repeat']} requests per scenario"
+        )
+        self.stdout.write(f"{'scenario':28} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8} {'bytes':>9}")
+        for r in results:
+            line = f"{r['name']:28} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['queries']:>8} {r['bytes']:>9}"
+            if r['status'] != [200]:
+                line += f"  status {r['status']}"
+            before = baseline.get(r['name'])
+            if before:
+                line += (
+                    f"  | p50 {r['p50_ms'] - before['p50_ms']:+.2f}  p95 {r['p95_ms'] - before['p95_ms']:+.2f}"
+                    f"  queries {r['queries'] - before['queries']:+d}  bytes {r['bytes'] - before['bytes']:+d}"
+                )
+            self.stdout.write(line)
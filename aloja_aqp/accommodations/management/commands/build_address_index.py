@@ -0,0 +1,128 @@
+import bz2
+import gzip
+import json
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accommodations.utils.address_search import AddressIndex
+from core.invalidation import publish
+from accommodations.utils.geo import haversine_km_pairs, haversine_m
+from accommodations.utils.geocoding import DEFAULT_GAZETTEER_PATH
+
+STREET_HIGHWAYS = {
+    'trunk', 'primary', 'secondary', 'tertiary', 'unclassified', 'residential',
+    'living_street', 'pedestrian', 'service', 'road',
+}
+DISTRICT_PLACES = {'city', 'town', 'village', 'suburb', 'city_district'}
+LANDMARK_KEYS = ('amenity', 'shop', 'tourism', 'leisure', 'historic', 'office')
+# Street points closer than this to the previous kept one are dropped.
+STREET_POINT_SPACING_M = 60
+
+
+def _open(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def parse_osm(path):
+    """Districts, street points and landmarks from an OSM XML extract."""
+    coords = {}
+    districts, streets, landmarks = [], [], []
+    seen_landmarks = set()
+
+    def add_landmark(name, lat, lon):
+        if name not in seen_landmarks:
+            seen_landmarks.add(name)
+            landmarks.append({'name': name, 'lat': round(lat, 6), 'lon': round(lon, 6)})
+
+    with _open(path) as f:
+        for _, elem in ET.iterparse(f, events=('end',)):
+            if elem.tag == 'node':
+                lat, lon = float(elem.get('lat')), float(elem.get('lon'))
+                coords[elem.get('id')] = (lat, lon)
+                tags = {t.get('k'): t.get('v') for t in elem.iter('tag')}
+                name = tags.get('name')
+                if name and tags.get('place') in DISTRICT_PLACES:
+                    districts.append({'name': name, 'lat': round(lat, 6), 'lon': round(lon, 6)})
+                elif name and any(k in tags for k in LANDMARK_KEYS):
+                    add_landmark(name, lat, lon)
+                elem.clear()
+            elif elem.tag == 'way':
+                tags = {t.get('k'): t.get('v') for t in elem.iter('tag')}
+                name = tags.get('name')
+                points = [coords[nd.get('ref')] for nd in elem.iter('nd') if nd.get('ref') in coords]
+                if name and points:
+                    if tags.get('highway') in STREET_HIGHWAYS:
+                        kept = [points[0]]
+                        for p in points[1:]:
+                            if haversine_m(kept[-1][0], kept[-1][1], p[0], p[1]) >= STREET_POINT_SPACING_M:
+                                kept.append(p)
+                        streets.extend({'name': name, 'lat': round(lat, 6), 'lon': round(lon, 6)} for lat, lon in kept)
+                    elif any(k in tags for k in LANDMARK_KEYS):
+                        add_landmark(name, sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points))
+                elem.clear()
+            elif elem.tag == 'relation':
+                elem.clear()
+    return districts, streets, landmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Build the street/landmark gazetteer used by address search and the offline reverse '
+        'geocoding fallback from an OSM XML extract (.osm, .osm.gz or .osm.bz2; convert .pbf '
+        'files with "osmium cat extract.osm.pbf -o extract.osm")'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('osm_file', help='OSM XML extract covering Arequipa')
+        parser.add_argument('--output', default=None, help='Gazetteer JSON to write (default: settings.GAZETTEER_PATH or the bundled file)')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        output = options['output'] or getattr(settings, 'GAZETTEER_PATH', '') or DEFAULT_GAZETTEER_PATH
+        try:
+            districts, streets, landmarks = parse_osm(options['osm_file'])
+        except (OSError, ET.ParseError) as e:
+            raise CommandError(f'Could not read {options["osm_file"]}: {e}')
+
+        if not districts:
+            # Extracts clipped to the city often lack place nodes; keep the current ones.
+            try:
+                with open(output, encoding='utf-8') as f:
+                    districts = json.load(f).get('districts', [])
+            except (OSError, ValueError):
+                districts = []
+            self.stdout.write(self.style.WARNING(f'No place nodes in the extract; kept {len(districts)} existing districts'))
+
+        items = streets + landmarks
+        if districts and items:
+            dist = haversine_km_pairs(
+                np.array([[i['lat']] for i in items]), np.array([[i['lon']] for i in items]),
+                np.array([[d['lat'] for d in districts]]), np.array([[d['lon'] for d in districts]]),
+            )
+            for item, nearest in zip(items, dist.argmin(axis=1).tolist()):
+                item['district'] = districts[nearest]['name']
+
+        data = {
+            'source': f'OpenStreetMap extract {options["osm_file"]} (ODbL)',
+            'districts': districts,
+            'streets': streets,
+            'landmarks': landmarks,
+        }
+        index = AddressIndex.from_gazetteer(data)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        # Running workers drop their copy of the index and the gazetteer and reload the file
+        publish('gazetteer')
+        self.stdout.write(self.style.SUCCESS(
+            f'Done. {len(index.entries)} searchable names ({len(districts)} districts, '
+            f'{len(streets)} street points, {len(landmarks)} landmarks) written to {output} '
+            f'in {time.monotonic() - started:.2f}s. Running workers reload it on their next query.'
+        ))
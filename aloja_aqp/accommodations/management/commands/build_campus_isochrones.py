@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accommodations.tasks import rebuild_campus_isochrones
+
+
+class Command(BaseCommand):
+    help = 'Precompute walking isochrone polygons (5/10/15/20/30 min) per campus from the stored walk times'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--campus', type=int, default=None, help='Only rebuild this campus id')
+
+    def handle(self, *args, **options):
+        written = rebuild_campus_isochrones(options['campus'])
+        self.stdout.write(self.style.SUCCESS(f'Done. Wrote {written} isochrones.'))
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accommodations.tasks import refresh_all_nearby_places
+from points.spatial import build_poi_index
+
+
+class Command(BaseCommand):
+    help = 'Recompute the automatic nearby places (k nearest points of interest per type) for every accommodation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=None, help='Places per point type (default: settings.NEARBY_PLACES_PER_TYPE)')
+        parser.add_argument('--max-km', type=float, default=None, help='Search radius (default: settings.NEARBY_PLACES_MAX_KM)')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Accommodations per query/upsert batch')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        max_km = options['max_km'] or settings.NEARBY_PLACES_MAX_KM
+        index = build_poi_index(max_km)
+        self.stdout.write(
+            f'Indexed {index.size} points of interest in {len(index.type_ids)} types '
+            f'in {time.monotonic() - started:.2f}s'
+        )
+        processed, written = refresh_all_nearby_places(
+            batch_size=options['batch_size'], index=index, k=options['k'], max_km=max_km,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Done. {written} nearby places for {processed} accommodations in {time.monotonic() - started:.2f}s.'
+        ))
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accommodations.models import CampusDistanceJob
+from accommodations.tasks import STALE_JOB_MINUTES, requeue_stale_job, run_campus_distance_job
+
+
+class Command(BaseCommand):
+    help = 'Resume campus distance recalculation jobs left pending or interrupted (e.g. after a crash or deploy)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-minutes', type=int, default=STALE_JOB_MINUTES,
+                            help='Only resume jobs whose last checkpoint is older than this')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['stale_minutes'])
+        jobs = CampusDistanceJob.objects.filter(
+            status__in=[CampusDistanceJob.STATUS_PENDING, CampusDistanceJob.STATUS_RUNNING],
+            updated_at__lt=cutoff,
+        ).order_by('created_at')
+
+        resumed = 0
+        for job in jobs:
+            # A crashed run stays "running"; put it back so the runner picks it up. Skipped if
+            # another process checkpointed or requeued it since the query above.
+            if not requeue_stale_job(job.id, options['stale_minutes']):
+                continue
+            self.stdout.write(f'Resuming job {job.id} for campus {job.campus_id} at {job.phase}/{job.last_accommodation_id} ({job.processed}/{job.total})')
+            job = run_campus_distance_job(job.id)
+            self.stdout.write(f'  -> {job.status} ({job.processed}/{job.total}, {job.errors} errors)')
+            resumed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Done. Resumed {resumed} jobs.'))
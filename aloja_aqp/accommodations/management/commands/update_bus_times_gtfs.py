@@ -0,0 +1,76 @@
+from datetime import date, datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accommodations.models import Accommodation, UniversityDistance
+from accommodations.utils.transit import load_gtfs, parse_gtfs_time, transit_minutes_matrix
+from universities.models import UniversityCampus
+
+
+class Command(BaseCommand):
+    help = 'Fill UniversityDistance.bus_time_minutes for every accommodation x campus pair from a local GTFS feed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('gtfs', nargs='?', default=None, help='Path to the GTFS zip (defaults to settings.GTFS_FEED_PATH)')
+        parser.add_argument('--date', default=None, help='Service date YYYY-MM-DD (default: today)')
+        parser.add_argument('--arrive-by', default='08:00', help='Target arrival time at the campus, HH:MM')
+        parser.add_argument('--max-walk-m', type=int, default=600, help='Max walking distance to/from a stop, in metres')
+        parser.add_argument('--max-transfers', type=int, default=3, help='Max number of vehicle changes')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk_update')
+        parser.add_argument('--dry-run', action='store_true', help='Compute times without writing them')
+
+    def handle(self, *args, **options):
+        path = options['gtfs'] or getattr(settings, 'GTFS_FEED_PATH', None)
+        if not path:
+            raise CommandError('No GTFS feed given and settings.GTFS_FEED_PATH is not set')
+        try:
+            service_date = datetime.strptime(options['date'], '%Y-%m-%d').date() if options['date'] else date.today()
+            arrive_by = parse_gtfs_time(options['arrive_by'] + ':00')
+        except ValueError as e:
+            raise CommandError(f'Invalid --date/--arrive-by: {e}')
+
+        started = time.monotonic()
+        try:
+            feed = load_gtfs(path, service_date=service_date)
+        except (OSError, KeyError) as e:
+            raise CommandError(f'Could not read GTFS feed {path}: {e}')
+        self.stdout.write(
+            f'Loaded {len(feed.stop_ids)} stops and {len(feed.patterns)} route patterns for {service_date} '
+            f'in {time.monotonic() - started:.1f}s'
+        )
+
+        origins = [
+            (pk, float(lat), float(lon))
+            for pk, lat, lon in Accommodation.objects.filter(latitude__isnull=False, longitude__isnull=False)
+            .values_list('id', 'latitude', 'longitude')
+        ]
+        destinations = [
+            (pk, float(lat), float(lon))
+            for pk, lat, lon in UniversityCampus.objects.filter(latitude__isnull=False, longitude__isnull=False)
+            .values_list('id', 'latitude', 'longitude')
+        ]
+        matrix = transit_minutes_matrix(
+            feed, origins, destinations, arrive_by,
+            max_walk_m=options['max_walk_m'], max_rounds=options['max_transfers'] + 1,
+        )
+        self.stdout.write(
+            f'Computed {len(matrix)} transit times for {len(origins)} accommodations x {len(destinations)} campuses '
+            f'in {time.monotonic() - started:.1f}s'
+        )
+
+        to_update = []
+        for ud in UniversityDistance.objects.only('id', 'accommodation_id', 'campus_id', 'bus_time_minutes').iterator(chunk_size=2000):
+            minutes = matrix.get((ud.accommodation_id, ud.campus_id))
+            if minutes != ud.bus_time_minutes:
+                ud.bus_time_minutes = minutes
+                to_update.append(ud)
+
+        if options['dry_run']:
+            self.stdout.write(f'Dry run: {len(to_update)} rows would change.')
+            return
+        UniversityDistance.objects.bulk_update(to_update, ['bus_time_minutes'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Done. Updated {len(to_update)} rows in {time.monotonic() - started:.1f}s.'
+        ))
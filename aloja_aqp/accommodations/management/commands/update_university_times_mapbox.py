@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
 from accommodations.models import UniversityDistance, Accommodation
 from universities.models import UniversityCampus
-from accommodations.utils.routing import mapbox_route
+from accommodations.utils.routing import mapbox_route, route_fingerprint
 from decimal import Decimal
 from django.db import transaction
 import time
@@ -44,10 +44,12 @@ class Command(BaseCommand):
                 ud.distance_km = result['distance_km']
                 # store duration as integer minutes
                 ud.walk_time_minutes = int(round(result['duration_min'])) if profile == 'walking' else ud.walk_time_minutes
+                if profile == 'walking':
+                    ud.fingerprint = route_fingerprint(acc.latitude, acc.longitude, campus.latitude, campus.longitude)
                 # if driving/cycling profile, store in bus_time_minutes as an example
                 if profile == 'driving':
                     ud.bus_time_minutes = int(round(result['duration_min']))
-                ud.save(update_fields=['distance_km', 'walk_time_minutes', 'bus_time_minutes'])
+                ud.save(update_fields=['distance_km', 'walk_time_minutes', 'bus_time_minutes', 'fingerprint'])
                 processed += 1
 
             time.sleep(sleep)
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accommodations', '0002_add_route_to_universitydistance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='universitydistance',
+            name='precision',
+            field=models.CharField(choices=[('routed', 'Routed'), ('estimated', 'Straight-line estimate')], default='routed', max_length=20),
+        ),
+    ]
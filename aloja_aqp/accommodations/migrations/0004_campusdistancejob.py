@@ -0,0 +1,33 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accommodations', '0003_universitydistance_precision'),
+        ('universities', '0003_add_logo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampusDistanceJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='pending', max_length=20)),
+                ('phase', models.CharField(choices=[('published', 'Published listings'), ('others', 'Drafts and hidden listings')], default='published', max_length=20)),
+                ('last_accommodation_id', models.BigIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('errors', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('campus', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='distance_jobs', to='universities.universitycampus')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
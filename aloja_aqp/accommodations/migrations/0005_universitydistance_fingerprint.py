@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accommodations', '0004_campusdistancejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='universitydistance',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+    ]
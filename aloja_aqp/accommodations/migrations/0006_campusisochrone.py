@@ -0,0 +1,33 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accommodations', '0005_universitydistance_fingerprint'),
+        ('universities', '0003_add_logo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='universitydistance',
+            index=models.Index(fields=['campus', 'walk_time_minutes'], name='ud_campus_walk_idx'),
+        ),
+        migrations.CreateModel(
+            name='CampusIsochrone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minutes', models.PositiveSmallIntegerField()),
+                ('polygon', models.JSONField()),
+                ('source', models.CharField(choices=[('observed', 'Observed walk times'), ('estimated', 'Walk model estimate')], default='observed', max_length=20)),
+                ('accommodation_count', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('campus', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='isochrones', to='universities.universitycampus')),
+            ],
+            options={
+                'ordering': ['campus', 'minutes'],
+                'unique_together': {('campus', 'minutes')},
+            },
+        ),
+    ]
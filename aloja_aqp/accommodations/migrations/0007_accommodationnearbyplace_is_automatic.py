@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accommodations', '0006_campusisochrone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accommodationnearbyplace',
+            name='is_automatic',
+            field=models.BooleanField(default=False),
+        ),
+    ]
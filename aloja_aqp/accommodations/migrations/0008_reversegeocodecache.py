@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accommodations', '0007_accommodationnearbyplace_is_automatic'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReverseGeocodeCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lat_key', models.IntegerField()),
+                ('lon_key', models.IntegerField()),
+                ('address', models.TextField()),
+                ('raw', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('lat_key', 'lon_key')},
+            },
+        ),
+    ]
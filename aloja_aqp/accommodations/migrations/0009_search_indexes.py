@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accommodations', '0008_reversegeocodecache'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['status', 'monthly_price'], name='acc_status_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['status', 'rooms'], name='acc_status_rooms_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['status', 'accommodation_type', 'monthly_price'], name='acc_status_type_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='universitydistance',
+            index=models.Index(fields=['campus', 'distance_km'], include=('accommodation',), name='ud_campus_distance_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['accommodation', '-review_date'], name='review_acc_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['accommodation', '-date_added'], name='favorite_acc_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['student', '-date_added'], name='favorite_student_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accommodations', '0009_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitSlot',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('next_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -4,6 +4,7 @@ from universities.models import University
 from points.models import PointOfInterest
 from cloudinary.models import CloudinaryField
 from universities.models import UniversityCampus
+from core.models import DirtyFieldsMixin
 
 
 class AccommodationStatus(models.Model):
@@ -19,7 +20,7 @@ class AccommodationType(models.Model):
     def __str__(self):
         return self.name
 
-class Accommodation(models.Model):
+class Accommodation(DirtyFieldsMixin, models.Model):
     owner = models.ForeignKey(OwnerProfile, on_delete=models.CASCADE, related_name="accommodations")
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -37,6 +38,14 @@ class Accommodation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Public search: status_id = <published> (core.reference) + price/rooms range and ordering
+            models.Index(fields=['status', 'monthly_price'], name='acc_status_price_idx'),
+            models.Index(fields=['status', 'rooms'], name='acc_status_rooms_idx'),
+            models.Index(fields=['status', 'accommodation_type', 'monthly_price'], name='acc_status_type_price_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -70,6 +79,13 @@ class AccommodationService(models.Model):
         return f"{self.service.name} in {self.accommodation.title}"
 
 class UniversityDistance(models.Model):
+    PRECISION_ROUTED = 'routed'
+    PRECISION_ESTIMATED = 'estimated'
+    PRECISION_CHOICES = [
+        (PRECISION_ROUTED, 'Routed'),
+        (PRECISION_ESTIMATED, 'Straight-line estimate'),
+    ]
+
     accommodation = models.ForeignKey(Accommodation, on_delete=models.CASCADE)
     campus = models.ForeignKey(UniversityCampus, on_delete=models.CASCADE, related_name='accommodation_distances')
     distance_km = models.DecimalField(max_digits=6, decimal_places=2)
@@ -77,13 +93,105 @@ class UniversityDistance(models.Model):
     bus_time_minutes = models.IntegerField(null=True, blank=True)
     # GeoJSON route returned by Mapbox (LineString). Stored as JSON to avoid PostGIS dependency.
     route = models.JSONField(null=True, blank=True)
+    # 'routed' when the values come from the routing provider, 'estimated' when
+    # they are derived from the straight-line distance (e.g. far-away campuses).
+    precision = models.CharField(max_length=20, choices=PRECISION_CHOICES, default=PRECISION_ROUTED)
+    # md5 of both endpoints' coordinates and the routing profile the row was
+    # computed with (utils.routing.route_fingerprint); empty when unknown.
+    fingerprint = models.CharField(max_length=32, blank=True, default='')
 
     class Meta:
         unique_together = ("accommodation", "campus")
+        indexes = [
+            # "within N minutes of campus X" filters
+            models.Index(fields=['campus', 'walk_time_minutes'], name='ud_campus_walk_idx'),
+            # "closest to campus/university" ordering, answered from the index alone
+            models.Index(fields=['campus', 'distance_km'], include=['accommodation'], name='ud_campus_distance_idx'),
+        ]
 
     def __str__(self):
         return f"{self.accommodation.title} - {self.campus}"
 
+class CampusDistanceJob(models.Model):
+    """Background recalculation of UniversityDistance rows after a campus moves.
+
+    Accommodations are processed in ``id`` order, published listings first;
+    ``phase`` + ``last_accommodation_id`` form the checkpoint a crashed job
+    resumes from.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_CANCELLED, 'Cancelled'),
+    ]
+    PHASE_PUBLISHED = 'published'
+    PHASE_OTHERS = 'others'
+    PHASE_CHOICES = [
+        (PHASE_PUBLISHED, 'Published listings'),
+        (PHASE_OTHERS, 'Drafts and hidden listings'),
+    ]
+
+    campus = models.ForeignKey(UniversityCampus, on_delete=models.CASCADE, related_name='distance_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    phase = models.CharField(max_length=20, choices=PHASE_CHOICES, default=PHASE_PUBLISHED)
+    last_accommodation_id = models.BigIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    @property
+    def progress_percent(self):
+        if not self.total:
+            return 100 if self.status == self.STATUS_DONE else 0
+        return min(100, int(self.processed * 100 / self.total))
+
+    def __str__(self):
+        return f"{self.campus} - {self.status} ({self.processed}/{self.total})"
+
+class CampusIsochrone(models.Model):
+    """Area reachable on foot from a campus within ``minutes``.
+
+    ``polygon`` is a GeoJSON Polygon ([lon, lat]). It is the convex hull of the
+    accommodations whose walk_time_minutes to the campus fits in the band
+    (``source='observed'``), or a circle from the calibrated walk model when
+    there are too few of them (``source='estimated'``).
+    """
+    BANDS = (5, 10, 15, 20, 30)
+    SOURCE_OBSERVED = 'observed'
+    SOURCE_ESTIMATED = 'estimated'
+    SOURCE_CHOICES = [
+        (SOURCE_OBSERVED, 'Observed walk times'),
+        (SOURCE_ESTIMATED, 'Walk model estimate'),
+    ]
+
+    campus = models.ForeignKey(UniversityCampus, on_delete=models.CASCADE, related_name='isochrones')
+    minutes = models.PositiveSmallIntegerField()
+    polygon = models.JSONField()
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default=SOURCE_OBSERVED)
+    accommodation_count = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("campus", "minutes")
+        ordering = ['campus', 'minutes']
+
+    def __str__(self):
+        return f"{self.campus} - {self.minutes} min"
+
 class AccommodationNearbyPlace(models.Model):
     accommodation = models.ForeignKey(
         'Accommodation', on_delete=models.CASCADE, related_name='nearby_places'
@@ -93,6 +201,9 @@ class AccommodationNearbyPlace(models.Model):
     )
     distance_km = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
     walking_time_min = models.IntegerField(null=True, blank=True)
+    # True for rows computed from the POI index (tasks.refresh_nearby_places), which
+    # replaces them on every run; rows saved through the API are kept.
+    is_automatic = models.BooleanField(default=False)
 
     class Meta:
         unique_together = ('accommodation', 'point_of_interest')
@@ -110,6 +221,12 @@ class Review(models.Model):
     review_date = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, default="visible")
 
+    class Meta:
+        indexes = [
+            # Reviews of an accommodation, newest first
+            models.Index(fields=['accommodation', '-review_date'], name='review_acc_date_idx'),
+        ]
+
     def __str__(self):
         return f"Review by {self.student.user.email}"
 
@@ -120,6 +237,35 @@ class Favorite(models.Model):
 
     class Meta:
         unique_together = ("student", "accommodation")
+        indexes = [
+            # Favorites of an accommodation / of a student, newest first
+            models.Index(fields=['accommodation', '-date_added'], name='favorite_acc_date_idx'),
+            models.Index(fields=['student', '-date_added'], name='favorite_student_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.user.email} - {self.accommodation.title}"
+
+
+class ReverseGeocodeCache(models.Model):
+    """Nominatim reverse geocoding results by ~20 m grid cell (see utils.geocoding.snap)."""
+    lat_key = models.IntegerField()
+    lon_key = models.IntegerField()
+    address = models.TextField()
+    raw = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('lat_key', 'lon_key')
+
+    def __str__(self):
+        return self.address
+
+
+class RateLimitSlot(models.Model):
+    """Next moment a rate-limited upstream may be called again (see utils.geocoding.RateLimiter)."""
+    name = models.CharField(max_length=50, primary_key=True)
+    next_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} @ {self.next_at}"
@@ -8,7 +8,7 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
         # Verifica que el usuario sea el owner del alojamiento
-        return hasattr(obj, 'owner') and obj.owner.user == request.user
+        return hasattr(obj, 'owner_id') and obj.owner_id is not None and obj.owner_id == request.user.owner_profile_id
 
 class IsStudentOrReadOnly(permissions.BasePermission):
     """
@@ -17,7 +17,7 @@ class IsStudentOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return hasattr(obj, 'student_profile') and obj.student.user == request.user
+        return hasattr(obj, 'student_profile') and obj.student_id == request.user.student_profile_id
 
 class IsAccommodationOwnerOrReadOnly(permissions.BasePermission):
     """
@@ -29,7 +29,6 @@ class IsAccommodationOwnerOrReadOnly(permissions.BasePermission):
             return True
 
         # Comprobar propiedad
-        user_owner = getattr(request.user, "owner_profile", None)
-        accommodation_owner = getattr(obj.accommodation, "owner", None)
-        return user_owner == accommodation_owner
+        # Compara ids: con el usuario del token no hace consultas
+        return obj.accommodation.owner_id == getattr(request.user, "owner_profile_id", None)
     
\ No newline at end of file
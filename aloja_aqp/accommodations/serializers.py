@@ -1,14 +1,17 @@
 ## Archivo: accommodations/serializers.py
 from rest_framework import serializers
+from django.db import transaction
+from django.db.models import Prefetch
 from .models import (
     AccommodationStatus, AccommodationType, Accommodation, AccommodationPhoto,
     PredefinedService, AccommodationService, UniversityDistance, AccommodationNearbyPlace,
-    Review, Favorite
+    Review, Favorite, CampusIsochrone
 )
 from users.models import OwnerProfile, StudentProfile
 from universities.models import University, UniversityCampus
 from points.models import PointOfInterest
 from users.serializers import OwnerProfileSerializer
+from core.reference import reference_table
 from users.serializers import UserSerializer
 import bleach
 
@@ -58,10 +61,8 @@ class UniversityDistanceNestedSerializer(serializers.ModelSerializer):
         return getattr(obj.campus, 'id', None)
 
     def get_campus_university_id(self, obj):
-        try:
-            return obj.campus.university.id if obj.campus and getattr(obj.campus, 'university', None) else None
-        except Exception:
-            return None
+        # university_id ya viene en la fila del campus: no hace falta cargar la universidad
+        return obj.campus.university_id if obj.campus_id else None
 
     def get_campus_latitude(self, obj):
         return getattr(obj.campus, 'latitude', None)
@@ -72,10 +73,7 @@ class UniversityDistanceNestedSerializer(serializers.ModelSerializer):
     def get_route(self, obj):
         """Return route GeoJSON only when the serializer context requests it for a specific university."""
         selected_university_id = self.context.get('selected_university_id')
-        try:
-            campus_univ_id = obj.campus.university.id if obj.campus and getattr(obj.campus, 'university', None) else None
-        except Exception:
-            campus_univ_id = None
+        campus_univ_id = obj.campus.university_id if obj.campus_id else None
         if selected_university_id and campus_univ_id and int(selected_university_id) == int(campus_univ_id):
             return obj.route
         # No exponer la ruta por defecto para mantener el payload pequeño
@@ -85,7 +83,7 @@ class UniversityDistanceNestedSerializer(serializers.ModelSerializer):
         model = UniversityDistance
         fields = [
             'id', 'campus', 'campus_id', 'campus_university_id', 'campus_latitude', 'campus_longitude',
-            'distance_km', 'walk_time_minutes', 'bus_time_minutes', 'route'
+            'distance_km', 'walk_time_minutes', 'bus_time_minutes', 'precision', 'route'
         ]
         
 class AccommodationNearbyPlaceNestedSerializer(serializers.ModelSerializer):
@@ -118,7 +116,7 @@ class AccommodationSerializer(serializers.ModelSerializer):
     nearby_places = AccommodationNearbyPlaceNestedSerializer(many=True, read_only=True)
     reviews = ReviewNestedSerializer(many=True, read_only=True)
     favorites = FavoriteNestedSerializer(many=True, read_only=True)
-    status = serializers.CharField(source="status.name", read_only=True)
+    status = serializers.SerializerMethodField()
     owner = OwnerProfileSerializer(read_only=True)
     user = UserSerializer(source='owner.user', read_only=True)
     class Meta:
@@ -126,6 +124,10 @@ class AccommodationSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['owner', 'publication_date', 'created_at', 'updated_at']
 
+    def get_status(self, obj):
+        # Nombre del estado desde el registro en memoria, sin consultar accommodations_accommodationstatus
+        return reference_table(AccommodationStatus).name(obj.status_id)
+
     def validate_coexistence_rules(self, value):
         """Sanitize HTML submitted for coexistence_rules to prevent XSS.
 
@@ -146,6 +148,20 @@ class AccommodationSerializer(serializers.ModelSerializer):
                 pass  # Si linkify falla, se usa el texto limpio
         return cleaned
 
+# Lo que lee AccommodationSerializer, para serializar sin consultas por fila
+# (las vistas asíncronas no pueden consultar la BD desde el serializer)
+ACCOMMODATION_SERIALIZER_SELECT = ('owner__user', 'accommodation_type')
+
+
+def accommodation_serializer_prefetch():
+    return [
+        Prefetch('photos', queryset=AccommodationPhoto.objects.order_by('id')),
+        Prefetch('services', queryset=AccommodationService.objects.select_related('service')),
+        Prefetch('universitydistance_set', queryset=UniversityDistance.objects.select_related('campus__university')),
+        Prefetch('nearby_places', queryset=AccommodationNearbyPlace.objects.select_related('point_of_interest__type')),
+        Prefetch('reviews', queryset=Review.objects.select_related('student__user')),
+    ]
+
 ## Otros serializers simples
 class PhotoSerializer(serializers.Serializer):
     image = serializers.CharField()
@@ -202,27 +218,37 @@ class AccommodationBasicCreateSerializer(serializers.ModelSerializer):
             'latitude', 'longitude', 'monthly_price', 'coexistence_rules','rooms'
         ]
 
+def _check_accommodation(accommodation_id):
+    if not Accommodation.objects.filter(pk=accommodation_id).exists():
+        raise serializers.ValidationError("El alojamiento no existe.")
+
+
+def _check_existing_ids(model, ids, message):
+    """Valida con una sola consulta IN que todos los ids referenciados existan."""
+    ids = set(ids)
+    found = set(model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+    missing = sorted(ids - found)
+    if missing:
+        raise serializers.ValidationError(message.format(id=missing[0]))
+
+
 class AccommodationPhotoBulkSerializer(serializers.Serializer):
     accommodation = serializers.IntegerField()
     photos = PhotoSerializer(many=True)
 
     def create(self, validated_data):
         accommodation_id = validated_data['accommodation']
-        try:
-            accommodation = Accommodation.objects.get(pk=accommodation_id)
-        except Accommodation.DoesNotExist:
-            raise serializers.ValidationError("El alojamiento no existe.")
-        photos_data = validated_data['photos']
-        created_photos = []
-        for photo_data in photos_data:
-            photo_obj = AccommodationPhoto.objects.create(
-                accommodation=accommodation,
-                image=photo_data['image'],
-                order_num=photo_data.get('order_num', 1),
-                is_main=photo_data.get('is_main', False)
-            )
-            created_photos.append(photo_obj)
-        return created_photos
+        with transaction.atomic():
+            _check_accommodation(accommodation_id)
+            return AccommodationPhoto.objects.bulk_create([
+                AccommodationPhoto(
+                    accommodation_id=accommodation_id,
+                    image=photo_data['image'],
+                    order_num=photo_data.get('order_num', 1),
+                    is_main=photo_data.get('is_main', False)
+                )
+                for photo_data in validated_data['photos']
+            ])
 
 class ServiceBulkSerializer(serializers.Serializer):
     service = serializers.IntegerField()
@@ -234,29 +260,19 @@ class AccommodationServiceBulkSerializer(serializers.Serializer):
 
     def create(self, validated_data):
         accommodation_id = validated_data['accommodation']
-        try:
-            accommodation = Accommodation.objects.get(pk=accommodation_id)
-        except Accommodation.DoesNotExist:
-            raise serializers.ValidationError("El alojamiento no existe.")
         services_data = validated_data['services']
-        created_services = []
-        for service_data in services_data:
-            try:
-                predefined_service = PredefinedService.objects.get(pk=service_data['service'])
-            except PredefinedService.DoesNotExist:
-                raise serializers.ValidationError(f"El servicio con id {service_data['service']} no existe.")
-            exists = AccommodationService.objects.filter(
-                accommodation=accommodation,
-                service=predefined_service
-            ).exists()
-            if not exists:
-                service_obj = AccommodationService.objects.create(
-                    accommodation=accommodation,
-                    service=predefined_service,
+        with transaction.atomic():
+            _check_accommodation(accommodation_id)
+            _check_existing_ids(PredefinedService, [d['service'] for d in services_data], "El servicio con id {id} no existe.")
+            # Los servicios que el alojamiento ya tiene se ignoran (unique_together)
+            return AccommodationService.objects.bulk_create([
+                AccommodationService(
+                    accommodation_id=accommodation_id,
+                    service_id=service_data['service'],
                     detail=service_data.get('detail', '')
                 )
-                created_services.append(service_obj)
-        return created_services
+                for service_data in services_data
+            ], ignore_conflicts=True)
 
 class DistanceBulkSerializer(serializers.Serializer):
     campus = serializers.IntegerField()
@@ -270,31 +286,40 @@ class UniversityDistanceBulkSerializer(serializers.Serializer):
 
     def create(self, validated_data):
         accommodation_id = validated_data['accommodation']
-        try:
-            accommodation = Accommodation.objects.get(pk=accommodation_id)
-        except Accommodation.DoesNotExist:
-            raise serializers.ValidationError("El alojamiento no existe.")
-        distances_data = validated_data['distances']
-        created_distances = []
-        for dist_data in distances_data:
-            try:
-                campus = UniversityCampus.objects.get(pk=dist_data['campus'])
-            except UniversityCampus.DoesNotExist:
-                raise serializers.ValidationError(f"El campus con id {dist_data['campus']} no existe.")
-            exists = UniversityDistance.objects.filter(
-                accommodation=accommodation,
-                campus=campus
-            ).exists()
-            if not exists:
-                dist_obj = UniversityDistance.objects.create(
-                    accommodation=accommodation,
-                    campus=campus,
-                    distance_km=dist_data['distance_km'],
-                    walk_time_minutes=dist_data.get('walk_time_minutes'),
-                    bus_time_minutes=dist_data.get('bus_time_minutes')
-                )
-                created_distances.append(dist_obj)
-        return created_distances
+        distances_by_campus = {d['campus']: d for d in validated_data['distances']}
+        with transaction.atomic():
+            _check_accommodation(accommodation_id)
+            _check_existing_ids(UniversityCampus, distances_by_campus, "El campus con id {id} no existe.")
+            existing = {
+                d.campus_id: d
+                for d in UniversityDistance.objects.filter(
+                    accommodation_id=accommodation_id, campus_id__in=distances_by_campus
+                ).only('id', 'campus_id', 'precision', 'bus_time_minutes')
+            }
+            to_create, to_update = [], []
+            for campus_id, dist_data in distances_by_campus.items():
+                current = existing.get(campus_id)
+                if current is None:
+                    to_create.append(UniversityDistance(
+                        accommodation_id=accommodation_id,
+                        campus_id=campus_id,
+                        distance_km=dist_data['distance_km'],
+                        walk_time_minutes=dist_data.get('walk_time_minutes'),
+                        bus_time_minutes=dist_data.get('bus_time_minutes')
+                    ))
+                elif current.precision == UniversityDistance.PRECISION_ESTIMATED:
+                    # Las estimaciones en línea recta se reemplazan por los valores enrutados del frontend
+                    current.distance_km = dist_data['distance_km']
+                    current.walk_time_minutes = dist_data.get('walk_time_minutes')
+                    current.bus_time_minutes = dist_data.get('bus_time_minutes', current.bus_time_minutes)
+                    current.precision = UniversityDistance.PRECISION_ROUTED
+                    to_update.append(current)
+            # ignore_conflicts cubre una fila creada en paralelo por el signal de coordenadas
+            created = UniversityDistance.objects.bulk_create(to_create, ignore_conflicts=True)
+            UniversityDistance.objects.bulk_update(
+                to_update, ['distance_km', 'walk_time_minutes', 'bus_time_minutes', 'precision']
+            )
+        return created + to_update
 
 class NearbyPlaceBulkSerializer(serializers.Serializer):
     point_of_interest = serializers.IntegerField()
@@ -307,28 +332,43 @@ class AccommodationNearbyPlaceBulkSerializer(serializers.Serializer):
 
     def create(self, validated_data):
         accommodation_id = validated_data['accommodation']
-        try:
-            accommodation = Accommodation.objects.get(pk=accommodation_id)
-        except Accommodation.DoesNotExist:
-            raise serializers.ValidationError("El alojamiento no existe.")
         places_data = validated_data['places']
-        created_places = []
-        for place_data in places_data:
-            try:
-                poi = PointOfInterest.objects.get(pk=place_data['point_of_interest'])
-            except PointOfInterest.DoesNotExist:
-                raise serializers.ValidationError(f"El punto de interés con id {place_data['point_of_interest']} no existe.")
-            exists = AccommodationNearbyPlace.objects.filter(
-                accommodation=accommodation,
-                point_of_interest=poi
-            ).exists()
-            if not exists:
-                place_obj = AccommodationNearbyPlace.objects.create(
-                    accommodation=accommodation,
-                    point_of_interest=poi,
+        with transaction.atomic():
+            _check_accommodation(accommodation_id)
+            _check_existing_ids(
+                PointOfInterest, [d['point_of_interest'] for d in places_data],
+                "El punto de interés con id {id} no existe."
+            )
+            return AccommodationNearbyPlace.objects.bulk_create([
+                AccommodationNearbyPlace(
+                    accommodation_id=accommodation_id,
+                    point_of_interest_id=place_data['point_of_interest'],
                     distance_km=place_data.get('distance_km'),
                     walking_time_min=place_data.get('walking_time_min')
                 )
-                created_places.append(place_obj)
-        return created_places
+                for place_data in places_data
+            ], ignore_conflicts=True)
+
+
+class CampusIsochroneSerializer(serializers.ModelSerializer):
+    """Isócrona como GeoJSON Feature para superponer en el mapa."""
+    type = serializers.SerializerMethodField()
+    geometry = serializers.JSONField(source='polygon')
+    properties = serializers.SerializerMethodField()
 
+    class Meta:
+        model = CampusIsochrone
+        fields = ['type', 'geometry', 'properties']
+
+    def get_type(self, obj):
+        return 'Feature'
+
+    def get_properties(self, obj):
+        return {
+            'id': obj.id,
+            'campus_id': obj.campus_id,
+            'minutes': obj.minutes,
+            'source': obj.source,
+            'accommodation_count': obj.accommodation_count,
+            'computed_at': obj.computed_at,
+        }
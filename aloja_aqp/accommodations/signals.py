@@ -1,52 +1,34 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.conf import settings
-import math
 import logging
 
 from .models import Accommodation, UniversityDistance
 from universities.models import UniversityCampus
-from .utils.routing import mapbox_route
+from .tasks import refresh_nearby_places, upgrade_accommodation_distances
+from .utils.estimates import estimate_fields, get_walk_model
+from .utils.routing import route_fingerprint, should_route
+from .utils.geo import haversine_km_array
+from core.background import run_in_background
 
 logger = logging.getLogger(__name__)
 
 
 
 
-# Guardar coordenadas antiguas antes de guardar
-@receiver(pre_save, sender=Accommodation)
-def guardar_coordenadas_anteriores(sender, instance, **kwargs):
-    if instance.pk:
-        try:
-            old = Accommodation.objects.get(pk=instance.pk)
-            instance._old_latitude = old.latitude
-            instance._old_longitude = old.longitude
-        except Accommodation.DoesNotExist:
-            instance._old_latitude = None
-            instance._old_longitude = None
-    else:
-        instance._old_latitude = None
-        instance._old_longitude = None
-
 @receiver(post_save, sender=Accommodation)
 def calcular_distancias_universidad_al_guardar(sender, instance, created, **kwargs):
     """
     Calcular distancias/tiempos hacia cada UniversityCampus solo cuando:
     - Se crea una nueva propiedad (created=True)
     - O cuando cambian las coordenadas (latitude/longitude)
+    Se guardan primero estimaciones para todos los campus y luego se encola el
+    enrutamiento preciso (ver tasks.upgrade_accommodation_distances).
     """
     logger.info('Signal: post_save Accommodation id=%s created=%s', getattr(instance, 'id', None), created)
 
-    recalcular = False
-    if created:
-        recalcular = True
-    else:
-        old_lat = getattr(instance, '_old_latitude', None)
-        old_lon = getattr(instance, '_old_longitude', None)
-        if old_lat != instance.latitude or old_lon != instance.longitude:
-            recalcular = True
-
-    if not recalcular:
+    # changed_fields (DirtyFieldsMixin) compara con los valores cargados, sin otro SELECT
+    if not created and not instance.has_changed('latitude', 'longitude'):
         logger.info('Accommodation id=%s sin cambio de coordenadas, omitiendo cálculo de distancias', getattr(instance, 'id', None))
         return
 
@@ -54,39 +36,41 @@ def calcular_distancias_universidad_al_guardar(sender, instance, created, **kwar
         logger.info('Accommodation id=%s sin coordenadas, omitiendo cálculo de distancias', getattr(instance, 'id', None))
         return
 
-    campuses_con_coordenadas = UniversityCampus.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    try:
+        # Índice espacial en memoria: no consulta servicios externos
+        refresh_nearby_places([(instance.id, instance.latitude, instance.longitude)])
+    except Exception as e:
+        logger.error('Fallo al calcular lugares cercanos para accommodation=%s: %s', instance.id, str(e))
 
-    for campus in campuses_con_coordenadas:
-        try:
-            logger.info('Calculando ruta server-side para accommodation=%s -> campus=%s', instance.id, getattr(campus, 'id', None))
-            logger.debug('Coords accommodation=(%s,%s) campus=(%s,%s)', instance.latitude, instance.longitude, campus.latitude, campus.longitude)
-            resultado_ruta = mapbox_route(
-                float(instance.latitude), float(instance.longitude),
-                float(campus.latitude), float(campus.longitude),
-                profile='walking'
-            )
-        except Exception as e:
-            logger.warning('Error calculando ruta para accommodation=%s campus=%s: %s', instance.id, getattr(campus, 'id', None), str(e))
-            continue
-
-        if not resultado_ruta:
-            logger.info('Proveedor no devolvió ruta para accommodation=%s campus=%s', instance.id, getattr(campus, 'id', None))
-            continue
+    campuses_con_coordenadas = list(
+        UniversityCampus.objects.filter(latitude__isnull=False, longitude__isnull=False)
+        .values_list('id', 'latitude', 'longitude')
+    )
+    if not campuses_con_coordenadas:
+        return
 
-        distancia_km = resultado_ruta.get('distance_km')
-        duracion_minutos = resultado_ruta.get('duration_min')
-        minutos_a_pie = math.ceil(duracion_minutos) if duracion_minutos is not None else None
+    # Fase 1: estimaciones en línea recta (vectorizadas) escritas de inmediato en
+    # bloque, para que el alojamiento aparezca ya en los filtros por universidad.
+    campus_ids, campus_lats, campus_lons = zip(*campuses_con_coordenadas)
+    distancias_rectas = haversine_km_array(instance.latitude, instance.longitude, campus_lats, campus_lons)
+    modelo = get_walk_model()
+    estimaciones = [
+        UniversityDistance(
+            accommodation=instance,
+            campus_id=campus_id,
+            fingerprint=route_fingerprint(instance.latitude, instance.longitude, campus_lat, campus_lon),
+            **estimate_fields(float(distancia_recta), modelo),
+        )
+        for campus_id, campus_lat, campus_lon, distancia_recta in zip(campus_ids, campus_lats, campus_lons, distancias_rectas)
+    ]
+    UniversityDistance.objects.bulk_create(
+        estimaciones,
+        update_conflicts=True,
+        unique_fields=['accommodation', 'campus'],
+        update_fields=['distance_km', 'walk_time_minutes', 'bus_time_minutes', 'route', 'precision', 'fingerprint'],
+    )
+    logger.info('Accommodation id=%s: %s distancias estimadas guardadas', instance.id, len(estimaciones))
 
-        try:
-            UniversityDistance.objects.update_or_create(
-                accommodation=instance,
-                campus=campus,
-                defaults={
-                    'distance_km': distancia_km,
-                    'walk_time_minutes': minutos_a_pie,
-                    'route': resultado_ruta.get('geometry'),
-                }
-            )
-            logger.info('UniversityDistance guardado para accommodation=%s campus=%s distance_km=%s walk_min=%s', instance.id, getattr(campus, 'id', None), distancia_km, minutos_a_pie)
-        except Exception as e:
-            logger.error('Fallo al guardar UniversityDistance para accommodation=%s campus=%s: %s', instance.id, getattr(campus, 'id', None), str(e))
+    # Fase 2: los campus cercanos se enrutan con Mapbox en segundo plano.
+    if any(should_route(float(d)) for d in distancias_rectas):
+        run_in_background(upgrade_accommodation_distances, instance.id)
@@ -1,39 +1,314 @@
+import logging
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from core.background import run_in_background
+from core.reference import reference_table
+
+logger = logging.getLogger(__name__)
+
+# Accommodations fetched per round trip; the checkpoint is saved after each chunk.
+CHUNK_SIZE = 200
+# A pending/running job without a checkpoint for this long is considered interrupted.
+STALE_JOB_MINUTES = 10
+
+
 def recalculate_accommodations_for_campus(campus_id):
 	"""
-	Recalcula distancia, tiempo y geometría de todos los alojamientos asociados a un campus/universidad.
-	Llama a la API de Mapbox y actualiza UniversityDistance.
+	Encola el recálculo de distancia, tiempo y geometría de todos los alojamientos hacia un campus.
+	Cancela los jobs anteriores del mismo campus (usaban coordenadas viejas) y devuelve el nuevo
+	CampusDistanceJob, que se ejecuta en segundo plano al confirmar la transacción.
 	"""
 	from universities.models import UniversityCampus
-	from .models import Accommodation, UniversityDistance
-	from .utils.routing import mapbox_route
-	import math
+	from .models import CampusDistanceJob
+
+	if not UniversityCampus.objects.filter(id=campus_id).exists():
+		return None
+
+	CampusDistanceJob.objects.filter(
+		campus_id=campus_id,
+		status__in=[CampusDistanceJob.STATUS_PENDING, CampusDistanceJob.STATUS_RUNNING],
+	).update(status=CampusDistanceJob.STATUS_CANCELLED, finished_at=timezone.now())
+
+	job = CampusDistanceJob.objects.create(
+		campus_id=campus_id,
+		total=sum(_phase_queryset(phase).count() for phase, _ in CampusDistanceJob.PHASE_CHOICES),
+	)
+	run_in_background(run_campus_distance_job, job.id)
+	return job
+
+
+def _phase_queryset(phase):
+	"""Alojamientos con coordenadas de una fase: primero publicados, luego el resto (sin eliminados)."""
+	from .models import Accommodation, CampusDistanceJob
+
+	qs = Accommodation.objects.filter(latitude__isnull=False, longitude__isnull=False)
+	published = reference_table('accommodations.AccommodationStatus').id('published')
+	if phase == CampusDistanceJob.PHASE_PUBLISHED:
+		return qs.filter(status_id=published) if published is not None else qs.none()
+	return qs.exclude(status_id__in=reference_table('accommodations.AccommodationStatus').ids('published', 'deleted'))
+
+
+def run_campus_distance_job(job_id):
+	"""
+	Ejecuta (o reanuda) un CampusDistanceJob desde su último checkpoint.
+	Itera con .iterator(chunk_size=...) en orden de id y guarda el progreso tras cada chunk,
+	deteniéndose si el job fue cancelado o lo reanudó otro runner mientras tanto.
+	"""
+	from .models import CampusDistanceJob, UniversityDistance
+	from .utils.routing import route_or_estimate
+
+	if not _claim(job_id):
+		# Cancelado, terminado o ya en curso en otro runner
+		return CampusDistanceJob.objects.filter(id=job_id).first()
+	job = CampusDistanceJob.objects.select_related('campus').get(id=job_id)
+	campus = job.campus
+	if campus.latitude is None or campus.longitude is None:
+		_checkpoint(job, status=CampusDistanceJob.STATUS_DONE, finished_at=timezone.now())
+		return job
+
+	phases = [phase for phase, _ in CampusDistanceJob.PHASE_CHOICES]
 
 	try:
-		campus = UniversityCampus.objects.get(id=campus_id)
-	except UniversityCampus.DoesNotExist:
-		return
-
-	accommodations = Accommodation.objects.filter(latitude__isnull=False, longitude__isnull=False)
-	for acc in accommodations:
-		resultado_ruta = mapbox_route(
-			float(acc.latitude), float(acc.longitude),
-			float(campus.latitude), float(campus.longitude),
-			profile='walking'
+		for phase in phases[phases.index(job.phase):]:
+			if phase != job.phase:
+				job.phase = phase
+				job.last_accommodation_id = 0
+			qs = (
+				_phase_queryset(phase)
+				.filter(id__gt=job.last_accommodation_id)
+				.order_by('id')
+				.only('id', 'latitude', 'longitude')
+			)
+			pending_in_chunk = 0
+			for acc in qs.iterator(chunk_size=CHUNK_SIZE):
+				try:
+					defaults = route_or_estimate(acc.latitude, acc.longitude, campus.latitude, campus.longitude)
+					if defaults:
+						UniversityDistance.objects.update_or_create(accommodation_id=acc.id, campus=campus, defaults=defaults)
+				except Exception as e:
+					logger.warning('Job %s: error en accommodation=%s campus=%s: %s', job.id, acc.id, campus.id, e)
+					job.errors += 1
+					job.last_error = str(e)[:1000]
+				job.processed += 1
+				job.last_accommodation_id = acc.id
+				pending_in_chunk += 1
+				if pending_in_chunk >= CHUNK_SIZE:
+					pending_in_chunk = 0
+					if not _checkpoint(job):
+						return job
+			if not _checkpoint(job):
+				return job
+	except Exception as e:
+		logger.exception('Job %s falló', job.id)
+		job.last_error = str(e)[:1000]
+		_checkpoint(job, status=CampusDistanceJob.STATUS_FAILED)
+		return job
+
+	# Sin pisar una cancelación hecha después del último checkpoint
+	if _checkpoint(job, status=CampusDistanceJob.STATUS_DONE, finished_at=timezone.now()):
+		rebuild_campus_isochrones(campus.id)
+	return job
+
+
+def rebuild_campus_isochrones(campus_id=None):
+	"""
+	Recalcula los polígonos de isócronas (CampusIsochrone.BANDS minutos a pie) de un campus, o de
+	todos si campus_id es None, a partir de los walk_time_minutes guardados. Devuelve cuántas
+	isócronas se escribieron.
+	"""
+	from universities.models import UniversityCampus
+	from .models import CampusIsochrone, UniversityDistance
+	from .utils.estimates import get_walk_model
+	from .utils.geo import circle_ring, convex_hull, geojson_polygon
+
+	campuses = UniversityCampus.objects.filter(latitude__isnull=False, longitude__isnull=False)
+	if campus_id is not None:
+		campuses = campuses.filter(id=campus_id)
+	model = get_walk_model()
+	written = 0
+	for campus in campuses.only('id', 'latitude', 'longitude'):
+		samples = sorted(
+			(minutes, float(lon), float(lat))
+			for minutes, lat, lon in UniversityDistance.objects.filter(
+				campus_id=campus.id,
+				walk_time_minutes__lte=max(CampusIsochrone.BANDS),
+				accommodation__latitude__isnull=False, accommodation__longitude__isnull=False,
+			).values_list('walk_time_minutes', 'accommodation__latitude', 'accommodation__longitude')
 		)
-		if not resultado_ruta:
+		for band in CampusIsochrone.BANDS:
+			points = [(lon, lat) for minutes, lon, lat in samples if minutes <= band]
+			hull = convex_hull(points + [(campus.longitude, campus.latitude)])
+			if len(hull) >= 3:
+				source = CampusIsochrone.SOURCE_OBSERVED
+			else:
+				radius_km = max(band - model.intercept, 0.5) / model.minutes_per_km
+				hull = circle_ring(campus.latitude, campus.longitude, radius_km * 1000.0)
+				source = CampusIsochrone.SOURCE_ESTIMATED
+			CampusIsochrone.objects.update_or_create(
+				campus=campus, minutes=band,
+				defaults={'polygon': geojson_polygon(hull), 'source': source, 'accommodation_count': len(points)},
+			)
+			written += 1
+	return written
+
+
+def upgrade_accommodation_distances(accommodation_id):
+	"""
+	Fase 2 del cálculo de distancias: reemplaza las estimaciones en línea recta de un alojamiento
+	por valores enrutados con Mapbox para los campus cercanos. Solo se sobrescribe la fila si su
+	huella sigue coincidiendo (si las coordenadas cambiaron entretanto, otro job se encargará).
+	"""
+	from universities.models import UniversityCampus
+	from .models import Accommodation, UniversityDistance
+	from .utils.geo import haversine_m
+	from .utils.routing import route_or_estimate, should_route
+
+	acc = Accommodation.objects.filter(id=accommodation_id).only('id', 'latitude', 'longitude').first()
+	if acc is None or acc.latitude is None or acc.longitude is None:
+		return 0
+
+	upgraded = 0
+	campuses = UniversityCampus.objects.filter(latitude__isnull=False, longitude__isnull=False).only('id', 'latitude', 'longitude')
+	for campus in campuses:
+		straight_km = haversine_m(float(acc.latitude), float(acc.longitude), campus.latitude, campus.longitude) / 1000.0
+		if not should_route(straight_km):
+			continue
+		try:
+			defaults = route_or_estimate(acc.latitude, acc.longitude, campus.latitude, campus.longitude, straight_km=straight_km)
+		except Exception as e:
+			logger.warning('Error enrutando accommodation=%s campus=%s: %s', acc.id, campus.id, e)
 			continue
+		if not defaults:
+			logger.info('Proveedor no devolvió ruta para accommodation=%s campus=%s', acc.id, campus.id)
+			continue
+		upgraded += UniversityDistance.objects.filter(
+			accommodation_id=acc.id, campus_id=campus.id, fingerprint=defaults['fingerprint'],
+		).update(**defaults)
+	logger.info('Accommodation id=%s: %s distancias enrutadas', acc.id, upgraded)
+	return upgraded
+
 
-		distancia_km = resultado_ruta.get('distance_km')
-		duracion_minutos = resultado_ruta.get('duration_min')
-		minutos_a_pie = math.ceil(duracion_minutos) if duracion_minutos is not None else None
-		geometry = resultado_ruta.get('geometry')
-
-		UniversityDistance.objects.update_or_create(
-			accommodation=acc,
-			campus=campus,
-			defaults={
-				'distance_km': distancia_km,
-				'walk_time_minutes': minutos_a_pie,
-				'route': geometry,
-			}
+def refresh_nearby_places(accommodations, index=None, k=None, max_km=None):
+	"""
+	Calcula los k puntos de interés más cercanos de cada tipo para los alojamientos dados
+	(iterable de (id, lat, lon)) con el índice espacial en memoria y los guarda en bloque.
+	Las filas automáticas anteriores de esos alojamientos se reemplazan; las cargadas a mano
+	solo actualizan distancia y tiempo. Devuelve el número de filas escritas.
+	"""
+	from django.conf import settings
+	from django.db import transaction
+	from points.spatial import get_poi_index
+	from .models import AccommodationNearbyPlace
+	from .utils.estimates import estimate_fields, get_walk_model
+
+	accommodations = list(accommodations)
+	if not accommodations:
+		return 0
+	index = index or get_poi_index()
+	k = k or getattr(settings, 'NEARBY_PLACES_PER_TYPE', 3)
+	max_km = max_km or getattr(settings, 'NEARBY_PLACES_MAX_KM', 1.5)
+	walk_model = get_walk_model()
+
+	ids, lats, lons = zip(*accommodations)
+	rows = []
+	for type_id in index.type_ids:
+		for acc_id, matches in zip(ids, index.nearest_many(lats, lons, k=k, type_id=type_id, max_km=max_km)):
+			for poi_id, distance_km in matches:
+				estimate = estimate_fields(distance_km, walk_model)
+				rows.append(AccommodationNearbyPlace(
+					accommodation_id=acc_id,
+					point_of_interest_id=poi_id,
+					distance_km=estimate['distance_km'],
+					walking_time_min=estimate['walk_time_minutes'],
+					is_automatic=True,
+				))
+
+	with transaction.atomic():
+		AccommodationNearbyPlace.objects.filter(accommodation_id__in=ids, is_automatic=True).delete()
+		AccommodationNearbyPlace.objects.bulk_create(
+			rows,
+			batch_size=2000,
+			update_conflicts=True,
+			unique_fields=['accommodation', 'point_of_interest'],
+			update_fields=['distance_km', 'walking_time_min'],
 		)
+	return len(rows)
+
+
+def refresh_all_nearby_places(batch_size=2000, index=None, k=None, max_km=None):
+	"""Recalcula los lugares cercanos de todo el catálogo (alojamientos con coordenadas) por lotes."""
+	from points.spatial import build_poi_index
+	from .models import Accommodation
+
+	index = index or build_poi_index(max_km)
+	qs = (
+		Accommodation.objects.filter(latitude__isnull=False, longitude__isnull=False)
+		.exclude(status_id__in=reference_table('accommodations.AccommodationStatus').ids('deleted'))
+		.order_by('id')
+		.values_list('id', 'latitude', 'longitude')
+	)
+	written = processed = 0
+	batch = []
+	for row in qs.iterator(chunk_size=batch_size):
+		batch.append(row)
+		if len(batch) >= batch_size:
+			written += refresh_nearby_places(batch, index=index, k=k, max_km=max_km)
+			processed += len(batch)
+			batch = []
+	written += refresh_nearby_places(batch, index=index, k=k, max_km=max_km)
+	processed += len(batch)
+	return processed, written
+
+
+def requeue_stale_job(job_id, stale_minutes=STALE_JOB_MINUTES):
+	"""
+	Vuelve a "pending" un job fallido, o pendiente/en curso sin checkpoint desde hace
+	``stale_minutes`` (interrumpido). Devuelve False si sigue activo, terminó o fue cancelado.
+	"""
+	from .models import CampusDistanceJob
+
+	cutoff = timezone.now() - timedelta(minutes=stale_minutes)
+	return bool(CampusDistanceJob.objects.filter(
+		Q(status=CampusDistanceJob.STATUS_FAILED)
+		| Q(status__in=[CampusDistanceJob.STATUS_PENDING, CampusDistanceJob.STATUS_RUNNING], updated_at__lt=cutoff),
+		id=job_id,
+	).update(status=CampusDistanceJob.STATUS_PENDING, updated_at=timezone.now()))
+
+
+def _claim(job_id):
+	"""Pasa el job a "running" si está pendiente o fallido; solo un runner lo consigue."""
+	from .models import CampusDistanceJob
+
+	return bool(CampusDistanceJob.objects.filter(
+		id=job_id, status__in=[CampusDistanceJob.STATUS_PENDING, CampusDistanceJob.STATUS_FAILED],
+	).update(status=CampusDistanceJob.STATUS_RUNNING, updated_at=timezone.now()))
+
+
+def _checkpoint(job, **fields):
+	"""
+	Guarda el progreso (y ``fields``, p. ej. el estado final) si el job sigue siendo de este
+	runner: en curso y sin escrituras de otro desde la última. Devuelve False si fue
+	cancelado o reanudado por otro entretanto.
+	"""
+	from .models import CampusDistanceJob
+
+	now = timezone.now()
+	updated = CampusDistanceJob.objects.filter(
+		id=job.id, status=CampusDistanceJob.STATUS_RUNNING, updated_at=job.updated_at,
+	).update(
+		phase=job.phase,
+		last_accommodation_id=job.last_accommodation_id,
+		processed=job.processed,
+		errors=job.errors,
+		last_error=job.last_error,
+		updated_at=now,
+		**fields,
+	)
+	if updated:
+		job.updated_at = now
+		for name, value in fields.items():
+			setattr(job, name, value)
+	return bool(updated)
@@ -1,9 +1,24 @@
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from io import StringIO
+import json
+import os
+import tempfile
+import zipfile
+from decimal import Decimal
+from unittest.mock import patch
 from users.models import User, UserStatus, OwnerProfile, StudentProfile
 from universities.models import University, UniversityCampus
-from .models import Accommodation, AccommodationStatus, AccommodationType, Favorite, UniversityDistance, PredefinedService, AccommodationService
+from .models import Accommodation, AccommodationStatus, AccommodationType, Favorite, Review, UniversityDistance, PredefinedService, AccommodationService, CampusDistanceJob, CampusIsochrone, AccommodationPhoto, AccommodationNearbyPlace, ReverseGeocodeCache, RateLimitSlot
+from points.models import PointOfInterest, PointType
+from .tasks import recalculate_accommodations_for_campus, run_campus_distance_job, rebuild_campus_isochrones
 
 class AccommodationManagementTests(APITestCase):
     """
@@ -24,7 +39,8 @@ class AccommodationManagementTests(APITestCase):
         self.owner_profile = OwnerProfile.objects.create(
             user=self.owner_user, 
             dni='88888888', 
-            status=UserStatus.objects.create(name='active')
+            status=UserStatus.objects.create(name='active'),
+            verification_status=OwnerProfile.VERIFICATION_VERIFIED,
         )
 
         # --- 3. CREACIÓN DE UNIVERSIDAD (Para pruebas de distancia) ---
@@ -319,7 +335,8 @@ class SearchAndStateTests(APITestCase):
         # --- 2. USUARIOS ---
         self.owner_user = User.objects.create_user(email='propietario@test.com', password='123')
         self.owner_profile = OwnerProfile.objects.create(
-            user=self.owner_user, dni='123', status=UserStatus.objects.create(name='active_o')
+            user=self.owner_user, dni='123', status=UserStatus.objects.create(name='active_o'),
+            verification_status=OwnerProfile.VERIFICATION_VERIFIED,
         )
 
         # --- 3. UNIVERSIDAD (Para filtros) ---
@@ -440,7 +457,7 @@ class SearchAndStateTests(APITestCase):
         public_url = reverse('public-accommodations-list')
         resp_public = self.client.get(public_url)
         # Iteramos los resultados para asegurar que no esté
-        ids = [acc['id'] for acc in resp_public.data['results']]
+        ids = [acc['id'] for acc in resp_public.json()['results']]
         self.assertNotIn(self.acc_cheap.id, ids, "Una propiedad oculta no debe ser pública")
 
     def test_recover_hidden_property(self):
@@ -489,3 +506,1150 @@ class SearchAndStateTests(APITestCase):
         
         self.assertIn(self.acc_draft.id, ids, "El propietario debe poder ver sus borradores")
         self.assertIn(self.acc_hidden.id, ids, "El propietario debe poder ver sus ocultos")
+
+
+class GTFSBusTimeTests(TestCase):
+    """
+    PU007: TIEMPOS EN BUS DESDE GTFS
+    -------------------------------------------------------------------
+    Objetivo: Verificar que update_bus_times_gtfs llena bus_time_minutes con el
+    router RAPTOR sobre un feed GTFS local.
+    """
+
+    def setUp(self):
+        status_published = AccommodationStatus.objects.create(name="published")
+        owner_user = User.objects.create_user(email='gtfs@test.com', password='123')
+        owner = OwnerProfile.objects.create(user=owner_user, dni='77777777', status=UserStatus.objects.create(name='active_g'))
+        uni = University.objects.create(name="UNSA", abbreviation="UNSA")
+        # Campus a ~150 m de la parada B
+        self.campus = UniversityCampus.objects.create(university=uni, name="Central", latitude=-16.3989, longitude=-71.5364)
+
+        self.near = Accommodation.objects.create(owner=owner, title="Cerca a parada", monthly_price=300, status=status_published)
+        self.far = Accommodation.objects.create(owner=owner, title="Sin paradas", monthly_price=300, status=status_published)
+        # Coordenadas vía update() para no disparar el cálculo de rutas con Mapbox
+        Accommodation.objects.filter(pk=self.near.pk).update(latitude=-16.4300, longitude=-71.5200)
+        Accommodation.objects.filter(pk=self.far.pk).update(latitude=-16.3000, longitude=-71.6500)
+        for acc in (self.near, self.far):
+            UniversityDistance.objects.create(accommodation=acc, campus=self.campus, distance_km=5, walk_time_minutes=60)
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.feed_path = os.path.join(self.tmpdir.name, 'feed.zip')
+        files = {
+            'stops.txt': "stop_id,stop_name,stop_lat,stop_lon\nA,Parada A,-16.4303,-71.5203\nB,Parada B,-16.3989,-71.5350\n",
+            'routes.txt': "route_id,route_short_name,route_type\nR1,Combi 1,3\n",
+            'trips.txt': "route_id,service_id,trip_id\nR1,WEEK,T1\n",
+            'stop_times.txt': "trip_id,arrival_time,departure_time,stop_id,stop_sequence\nT1,07:30:00,07:30:00,A,1\nT1,07:50:00,07:50:00,B,2\n",
+            'frequencies.txt': "trip_id,start_time,end_time,headway_secs\nT1,06:00:00,09:00:00,600\n",
+        }
+        with zipfile.ZipFile(self.feed_path, 'w') as zf:
+            for name, content in files.items():
+                zf.writestr(name, content)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_bus_times_filled_from_gtfs(self):
+        """PU007-1: Alojamiento cerca de una parada recibe tiempo en bus; uno sin paradas queda en null."""
+        call_command('update_bus_times_gtfs', self.feed_path, '--arrive-by', '08:00', stdout=StringIO())
+
+        near = UniversityDistance.objects.get(accommodation=self.near, campus=self.campus)
+        far = UniversityDistance.objects.get(accommodation=self.far, campus=self.campus)
+        # 20 min en combi (07:30 -> 07:50 es la salida más tardía que llega a las 08:00) + caminatas
+        self.assertIsNotNone(near.bus_time_minutes)
+        self.assertGreaterEqual(near.bus_time_minutes, 22)
+        self.assertLessEqual(near.bus_time_minutes, 35)
+        self.assertIsNone(far.bus_time_minutes)
+
+
+class StraightLinePrefilterTests(TestCase):
+    """
+    PU008: PREFILTRO POR DISTANCIA EN LÍNEA RECTA
+    -------------------------------------------------------------------
+    Objetivo: Solo los campus cercanos se enrutan con Mapbox; los lejanos se
+    guardan con una estimación marcada como 'estimated'.
+    """
+
+    def setUp(self):
+        owner_user = User.objects.create_user(email='prefiltro@test.com', password='123')
+        self.owner = OwnerProfile.objects.create(user=owner_user, dni='66666666', status=UserStatus.objects.create(name='active_p'))
+        uni = University.objects.create(name="UNSA", abbreviation="UNSA")
+        self.campus_near = UniversityCampus.objects.create(university=uni, name="Central", latitude=-16.3989, longitude=-71.5350)
+        # ~90 km al noroeste (Majes): nunca se debe consultar a Mapbox
+        self.campus_far = UniversityCampus.objects.create(university=uni, name="Majes", latitude=-16.3600, longitude=-72.1900)
+
+    @override_settings(BACKGROUND_TASKS_EAGER=True)
+    def test_far_campus_is_not_routed(self):
+        """PU008-1: Un alojamiento en el Cercado solo enruta hacia el campus cercano."""
+        fake_route = {'distance_km': Decimal('1.20'), 'duration_min': 14.2, 'geometry': {'type': 'LineString', 'coordinates': []}}
+        with patch('accommodations.utils.routing.mapbox_route', return_value=fake_route) as mock_route, \
+                self.captureOnCommitCallbacks(execute=True):
+            acc = Accommodation.objects.create(
+                owner=self.owner, title="Cuarto Cercado", monthly_price=350,
+                latitude=Decimal('-16.4050'), longitude=Decimal('-71.5300'),
+            )
+
+        self.assertEqual(mock_route.call_count, 1)
+        near = UniversityDistance.objects.get(accommodation=acc, campus=self.campus_near)
+        far = UniversityDistance.objects.get(accommodation=acc, campus=self.campus_far)
+        self.assertEqual(near.precision, UniversityDistance.PRECISION_ROUTED)
+        self.assertEqual(near.walk_time_minutes, 15)
+        self.assertEqual(far.precision, UniversityDistance.PRECISION_ESTIMATED)
+        self.assertGreater(far.distance_km, 50)
+        self.assertIsNone(far.route)
+
+
+class CampusDistanceJobTests(TestCase):
+    """
+    PU009: RECÁLCULO DE DISTANCIAS POR CAMPUS EN SEGUNDO PLANO
+    -------------------------------------------------------------------
+    Objetivo: El job procesa primero los publicados, omite los eliminados,
+    guarda checkpoints y puede reanudarse sin repetir trabajo.
+    """
+
+    def setUp(self):
+        owner_user = User.objects.create_user(email='jobs@test.com', password='123')
+        owner = OwnerProfile.objects.create(user=owner_user, dni='77777777', status=UserStatus.objects.create(name='active_j'))
+        published = AccommodationStatus.objects.create(name='published')
+        draft = AccommodationStatus.objects.create(name='draft')
+        deleted = AccommodationStatus.objects.create(name='deleted')
+        uni = University.objects.create(name="UNSA", abbreviation="UNSA")
+        self.campus = UniversityCampus.objects.create(university=uni, name="Central", latitude=-16.3989, longitude=-71.5350)
+
+        self.draft = Accommodation.objects.create(owner=owner, title="Borrador", monthly_price=300, status=draft)
+        self.published = [
+            Accommodation.objects.create(owner=owner, title=f"Publicado {i}", monthly_price=400, status=published)
+            for i in range(3)
+        ]
+        self.deleted = Accommodation.objects.create(owner=owner, title="Eliminado", monthly_price=300, status=deleted)
+        # Coordenadas vía update() para no disparar el signal de post_save
+        Accommodation.objects.update(latitude=Decimal('-16.4050'), longitude=Decimal('-71.5300'))
+        self.fake_route = {'distance_km': Decimal('1.20'), 'duration_min': 14.2, 'geometry': None}
+
+    def test_job_processes_published_first_and_skips_deleted(self):
+        """PU009-1: Publicados primero, luego borradores; los eliminados no se calculan."""
+        with self.captureOnCommitCallbacks(execute=False):
+            job = recalculate_accommodations_for_campus(self.campus.id)
+        self.assertEqual(job.total, 4)
+
+        calls = []
+        def fake_route(lat1, lon1, lat2, lon2, profile='driving'):
+            calls.append((lat1, lon1))
+            return self.fake_route
+        with patch('accommodations.utils.routing.mapbox_route', side_effect=fake_route):
+            job = run_campus_distance_job(job.id)
+
+        self.assertEqual(job.status, CampusDistanceJob.STATUS_DONE)
+        self.assertEqual(job.processed, 4)
+        self.assertEqual(job.errors, 0)
+        self.assertEqual(len(calls), 4)
+        self.assertTrue(UniversityDistance.objects.filter(accommodation=self.draft, campus=self.campus).exists())
+        self.assertFalse(UniversityDistance.objects.filter(accommodation=self.deleted, campus=self.campus).exists())
+        # El borrador (menor id) se procesa al final: los publicados van primero
+        last_written = UniversityDistance.objects.filter(campus=self.campus).order_by('-id').first()
+        self.assertEqual(last_written.accommodation_id, self.draft.id)
+
+    def test_job_resumes_from_checkpoint(self):
+        """PU009-2: Un job interrumpido continúa desde el último alojamiento guardado."""
+        job = CampusDistanceJob.objects.create(
+            campus=self.campus, status=CampusDistanceJob.STATUS_RUNNING, total=4,
+            phase=CampusDistanceJob.PHASE_PUBLISHED, last_accommodation_id=self.published[1].id, processed=2,
+        )
+        with patch('accommodations.utils.routing.mapbox_route', return_value=self.fake_route) as mock_route:
+            call_command('resume_campus_distance_jobs', '--stale-minutes', '0', stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, CampusDistanceJob.STATUS_DONE)
+        self.assertEqual(job.processed, 4)
+        self.assertEqual(mock_route.call_count, 2)
+        self.assertEqual(
+            set(UniversityDistance.objects.filter(campus=self.campus).values_list('accommodation_id', flat=True)),
+            {self.published[2].id, self.draft.id},
+        )
+
+    def test_new_job_cancels_previous_one(self):
+        """PU009-3: Un nuevo cambio de coordenadas cancela el job anterior del mismo campus."""
+        with self.captureOnCommitCallbacks(execute=False):
+            first = recalculate_accommodations_for_campus(self.campus.id)
+            second = recalculate_accommodations_for_campus(self.campus.id)
+        first.refresh_from_db()
+        self.assertEqual(first.status, CampusDistanceJob.STATUS_CANCELLED)
+        self.assertEqual(second.status, CampusDistanceJob.STATUS_PENDING)
+        self.assertEqual(run_campus_distance_job(first.id).status, CampusDistanceJob.STATUS_CANCELLED)
+
+    def test_running_job_not_resumed_twice(self):
+        """PU009-4: Un job con checkpoint reciente no se relanza desde el admin ni lo toma un segundo runner."""
+        from datetime import timedelta
+        from django.contrib import admin
+        from django.test import RequestFactory
+        from django.utils import timezone
+        from .admin import CampusDistanceJobAdmin
+        running = CampusDistanceJob.objects.create(campus=self.campus, status=CampusDistanceJob.STATUS_RUNNING, total=4)
+        stale = CampusDistanceJob.objects.create(campus=self.campus, status=CampusDistanceJob.STATUS_RUNNING, total=4)
+        CampusDistanceJob.objects.filter(id=stale.id).update(updated_at=timezone.now() - timedelta(hours=1))
+
+        model_admin = CampusDistanceJobAdmin(CampusDistanceJob, admin.site)
+        with patch.object(model_admin, 'message_user'), \
+                patch('accommodations.admin.run_in_background') as background:
+            model_admin.resume_jobs(RequestFactory().get('/'), CampusDistanceJob.objects.all())
+        background.assert_called_once_with(run_campus_distance_job, stale.id)
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, CampusDistanceJob.STATUS_PENDING)
+
+        with patch('accommodations.utils.routing.mapbox_route', return_value=self.fake_route) as mock_route:
+            self.assertEqual(run_campus_distance_job(running.id).status, CampusDistanceJob.STATUS_RUNNING)
+        mock_route.assert_not_called()
+
+    def test_cancel_after_last_checkpoint_is_kept(self):
+        """PU009-5: Una cancelación posterior al último checkpoint no se pisa con "done"."""
+        from . import tasks
+        with self.captureOnCommitCallbacks(execute=False):
+            job = recalculate_accommodations_for_campus(self.campus.id)
+        real_checkpoint = tasks._checkpoint
+
+        def checkpoint_then_cancel(job, **fields):
+            saved = real_checkpoint(job, **fields)
+            if not fields and job.phase == CampusDistanceJob.PHASE_OTHERS:
+                CampusDistanceJob.objects.filter(id=job.id).update(status=CampusDistanceJob.STATUS_CANCELLED)
+            return saved
+
+        with patch('accommodations.utils.routing.mapbox_route', return_value=self.fake_route), \
+                patch.object(tasks, '_checkpoint', side_effect=checkpoint_then_cancel), \
+                patch.object(tasks, 'rebuild_campus_isochrones') as rebuild:
+            run_campus_distance_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, CampusDistanceJob.STATUS_CANCELLED)
+        self.assertEqual(job.processed, 4)
+        rebuild.assert_not_called()
+
+
+class StaleDistanceBackfillTests(TestCase):
+    """
+    PU010: BACKFILL INCREMENTAL DE DISTANCIAS
+    -------------------------------------------------------------------
+    Objetivo: Solo se recalculan los pares alojamiento-campus faltantes o cuyas
+    coordenadas cambiaron desde el último cálculo.
+    """
+
+    def setUp(self):
+        owner_user = User.objects.create_user(email='backfill@test.com', password='123')
+        owner = OwnerProfile.objects.create(user=owner_user, dni='88888888', status=UserStatus.objects.create(name='active_b'))
+        uni = University.objects.create(name="UNSA", abbreviation="UNSA")
+        self.campus = UniversityCampus.objects.create(university=uni, name="Central", latitude=-16.3989, longitude=-71.5350)
+        self.fresh = Accommodation.objects.create(owner=owner, title="Al día", monthly_price=300)
+        self.moved = Accommodation.objects.create(owner=owner, title="Movido", monthly_price=300)
+        self.missing = Accommodation.objects.create(owner=owner, title="Sin distancia", monthly_price=300)
+        Accommodation.objects.update(latitude=Decimal('-16.4050'), longitude=Decimal('-71.5300'))
+        self.fake_route = {'distance_km': Decimal('1.20'), 'duration_min': 14.2, 'geometry': None}
+
+        with patch('accommodations.utils.routing.mapbox_route', return_value=self.fake_route):
+            call_command('backfill_university_distances', stdout=StringIO())
+        UniversityDistance.objects.filter(accommodation=self.missing).delete()
+        Accommodation.objects.filter(pk=self.moved.pk).update(latitude=Decimal('-16.4100'))
+
+    def test_python_and_sql_fingerprints_match(self):
+        """PU010-1: La huella calculada en Python coincide con la de la consulta SQL."""
+        from .management.commands.backfill_university_distances import stale_distance_pairs
+        pairs = {(p[0], p[1]): p[6] for p in stale_distance_pairs()}
+        self.assertEqual(pairs, {(self.moved.id, self.campus.id): False, (self.missing.id, self.campus.id): True})
+
+    def test_only_missing_and_stale_pairs_are_recomputed(self):
+        """PU010-2: El backfill enruta solo el par faltante y el desactualizado."""
+        with patch('accommodations.utils.routing.mapbox_route', return_value=self.fake_route) as mock_route:
+            out = StringIO()
+            call_command('backfill_university_distances', stdout=out)
+        self.assertIn('2 pairs to recompute (1 missing, 1 stale)', out.getvalue())
+        self.assertEqual(mock_route.call_count, 2)
+        self.assertEqual(UniversityDistance.objects.filter(campus=self.campus).count(), 3)
+
+        with patch('accommodations.utils.routing.mapbox_route', return_value=self.fake_route) as mock_route:
+            call_command('backfill_university_distances', stdout=StringIO())
+        mock_route.assert_not_called()
+
+
+class TwoPhaseDistanceTests(TestCase):
+    """
+    PU011: DISTANCIAS EN DOS FASES
+    -------------------------------------------------------------------
+    Objetivo: Al guardar un alojamiento se escriben de inmediato estimaciones
+    calibradas para todos los campus; luego se reemplazan por valores enrutados.
+    """
+
+    def setUp(self):
+        cache.clear()
+        owner_user = User.objects.create_user(email='dosfases@test.com', password='123')
+        self.owner = OwnerProfile.objects.create(user=owner_user, dni='99999999', status=UserStatus.objects.create(name='active_d'))
+        uni = University.objects.create(name="UNSA", abbreviation="UNSA")
+        self.campus = UniversityCampus.objects.create(university=uni, name="Central", latitude=-16.3989, longitude=-71.5350)
+        self.fake_route = {'distance_km': Decimal('1.20'), 'duration_min': 14.2, 'geometry': None}
+
+    def tearDown(self):
+        cache.clear()
+
+    @override_settings(BACKGROUND_TASKS_EAGER=True)
+    def test_estimates_written_before_routing(self):
+        """PU011-1: La estimación existe antes del enrutamiento y luego se actualiza a 'routed'."""
+        with patch('accommodations.utils.routing.mapbox_route', return_value=self.fake_route) as mock_route:
+            with self.captureOnCommitCallbacks(execute=True):
+                acc = Accommodation.objects.create(
+                    owner=self.owner, title="Nuevo", monthly_price=350,
+                    latitude=Decimal('-16.4050'), longitude=Decimal('-71.5300'),
+                )
+                estimated = UniversityDistance.objects.get(accommodation=acc, campus=self.campus)
+                self.assertEqual(estimated.precision, UniversityDistance.PRECISION_ESTIMATED)
+                self.assertEqual(estimated.distance_km, Decimal('0.86'))
+                self.assertIsNotNone(estimated.walk_time_minutes)
+                mock_route.assert_not_called()
+
+        routed = UniversityDistance.objects.get(accommodation=acc, campus=self.campus)
+        self.assertEqual(routed.precision, UniversityDistance.PRECISION_ROUTED)
+        self.assertEqual(routed.distance_km, Decimal('1.20'))
+        self.assertEqual(routed.walk_time_minutes, 15)
+
+    def test_moved_accommodation_clears_bus_time(self):
+        """PU011-3: Al mover el alojamiento se borra el tiempo en bus calculado para la ubicación anterior."""
+        far = UniversityCampus.objects.create(university=self.campus.university, name="Lejano", latitude=-16.2000, longitude=-71.5350)
+        with self.captureOnCommitCallbacks(execute=False):
+            acc = Accommodation.objects.create(
+                owner=self.owner, title="Se muda", monthly_price=350,
+                latitude=Decimal('-16.4050'), longitude=Decimal('-71.5300'),
+            )
+        UniversityDistance.objects.filter(accommodation=acc).update(bus_time_minutes=12)
+
+        acc.latitude = Decimal('-16.4200')
+        with self.captureOnCommitCallbacks(execute=False):
+            acc.save()
+        for distance in UniversityDistance.objects.filter(accommodation=acc, campus__in=[self.campus, far]):
+            self.assertEqual(distance.precision, UniversityDistance.PRECISION_ESTIMATED)
+            self.assertIsNone(distance.bus_time_minutes)
+
+    def test_walk_model_calibrated_on_routed_rows(self):
+        """PU011-2: El modelo de caminata se ajusta con las distancias enrutadas existentes."""
+        from .utils.estimates import DEFAULT_MODEL, get_walk_model
+
+        self.assertEqual(get_walk_model(), DEFAULT_MODEL)
+        cache.clear()
+        # 30 alojamientos al sur del campus, con 20 min/km en línea recta + 3 min
+        from .utils.geo import haversine_m
+        rows = []
+        for i in range(30):
+            lat = Decimal('-16.3989') - Decimal('0.002') * (i + 1)
+            acc = Accommodation.objects.create(owner=self.owner, title=f"Muestra {i}", monthly_price=300)
+            Accommodation.objects.filter(pk=acc.pk).update(latitude=lat, longitude=Decimal('-71.5350'))
+            km = haversine_m(float(lat), -71.5350, -16.3989, -71.5350) / 1000.0
+            rows.append(UniversityDistance(accommodation=acc, campus=self.campus, distance_km=Decimal('1.00'),
+                                           walk_time_minutes=round(3 + 20 * km)))
+        UniversityDistance.objects.bulk_create(rows)
+
+        model = get_walk_model()
+        self.assertEqual(model.samples, 30)
+        self.assertAlmostEqual(model.minutes_per_km, 20, delta=1)
+        self.assertAlmostEqual(model.intercept, 3, delta=1)
+
+
+class WalkIsochroneTests(APITestCase):
+    """
+    PU012: FILTRO "A N MINUTOS CAMINANDO" E ISÓCRONAS
+    -------------------------------------------------------------------
+    Objetivo: Filtrar alojamientos por tiempo a pie hacia un campus y servir
+    los polígonos de isócronas precalculados.
+    """
+
+    def setUp(self):
+        cache.clear()
+        owner_user = User.objects.create_user(email='isocronas@test.com', password='123')
+        owner = OwnerProfile.objects.create(user=owner_user, dni='12121212', status=UserStatus.objects.create(name='active_i'))
+        published = AccommodationStatus.objects.create(name='published')
+        self.uni = University.objects.create(name="UNSA", abbreviation="UNSA")
+        self.campus = UniversityCampus.objects.create(university=self.uni, name="Central", latitude=-16.3989, longitude=-71.5350)
+        # (minutos a pie, lat, lon)
+        muestras = [(4, '-16.4010', '-71.5340'), (8, '-16.3960', '-71.5390'), (12, '-16.4060', '-71.5300'), (25, '-16.4200', '-71.5450')]
+        self.accs = []
+        for minutes, lat, lon in muestras:
+            acc = Accommodation.objects.create(owner=owner, title=f"A {minutes} min", monthly_price=300, status=published)
+            Accommodation.objects.filter(pk=acc.pk).update(latitude=Decimal(lat), longitude=Decimal(lon))
+            UniversityDistance.objects.create(accommodation=acc, campus=self.campus, distance_km=1, walk_time_minutes=minutes)
+            self.accs.append(acc)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_max_walk_minutes_filter(self):
+        """PU012-1: Solo los alojamientos a 10 minutos o menos del campus."""
+        url = reverse('public-accommodations-filter-accommodations')
+        resp = self.client.get(url, {'campus_id': self.campus.id, 'max_walk_minutes': 10})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual({r['id'] for r in resp.data['results']}, {self.accs[0].id, self.accs[1].id})
+
+        resp = self.client.get(url, {'university_id': self.uni.id, 'max_walk_minutes': 15})
+        self.assertEqual(resp.data['count'], 3)
+
+    def test_isochrones_endpoint(self):
+        """PU012-2: Las isócronas se precalculan por banda y se sirven como GeoJSON."""
+        self.assertEqual(rebuild_campus_isochrones(self.campus.id), len(CampusIsochrone.BANDS))
+
+        resp = self.client.get(reverse('campusisochrone-list'), {'campus_id': self.campus.id})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['type'], 'FeatureCollection')
+        features = {f['properties']['minutes']: f for f in resp.data['features']}
+        self.assertEqual(sorted(features), list(CampusIsochrone.BANDS))
+        # 5 min: un solo alojamiento -> círculo estimado; 30 min: casco convexo de los 4
+        self.assertEqual(features[5]['properties']['source'], CampusIsochrone.SOURCE_ESTIMATED)
+        self.assertEqual(features[30]['properties']['source'], CampusIsochrone.SOURCE_OBSERVED)
+        self.assertEqual(features[30]['properties']['accommodation_count'], 4)
+        ring = features[30]['geometry']['coordinates'][0]
+        self.assertEqual(features[30]['geometry']['type'], 'Polygon')
+        self.assertEqual(ring[0], ring[-1])
+        self.assertIn([-71.545, -16.42], ring)
+
+
+class BulkEndpointQueryCountTests(APITestCase):
+    """
+    PU013: ENDPOINTS /bulk/ CON NÚMERO CONSTANTE DE CONSULTAS
+    -------------------------------------------------------------------
+    Objetivo: Guardar 50 elementos cuesta las mismas consultas que guardar 1
+    (lookup IN de ids + un bulk_create en una transacción).
+    """
+
+    N = 50
+
+    def setUp(self):
+        self.owner_user = User.objects.create_user(email='bulk@test.com', password='123')
+        self.owner = OwnerProfile.objects.create(user=self.owner_user, dni='34343434', status=UserStatus.objects.create(name='active_bulk'))
+        uni = University.objects.create(name="UNSA", abbreviation="UNSA")
+        self.campuses = UniversityCampus.objects.bulk_create(
+            [UniversityCampus(university=uni, name=f"Campus {i}") for i in range(self.N)]
+        )
+        self.services = PredefinedService.objects.bulk_create([PredefinedService(name=f"Servicio {i}") for i in range(self.N)])
+        self.pois = PointOfInterest.objects.bulk_create([PointOfInterest(name=f"Punto {i}") for i in range(self.N)])
+        self.client.force_authenticate(user=self.owner_user)
+
+    def _new_accommodation(self):
+        return Accommodation.objects.create(owner=self.owner, title="Bulk", monthly_price=300)
+
+    def _queries_for(self, url_name, key, items):
+        acc = self._new_accommodation()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post(reverse(url_name), {'accommodation': acc.id, key: items}, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED, resp.data)
+        return acc, len(ctx.captured_queries)
+
+    def _assert_constant(self, url_name, key, make_item, model, fk):
+        _, one = self._queries_for(url_name, key, [make_item(0)])
+        acc, many = self._queries_for(url_name, key, [make_item(i) for i in range(self.N)])
+        print(f"\n[{url_name}] consultas: 1 elemento={one}, {self.N} elementos={many}")
+        self.assertEqual(one, many)
+        self.assertEqual(model.objects.filter(**{fk: acc}).count(), self.N)
+
+    def test_services_bulk(self):
+        """PU013-1: Servicios."""
+        self._assert_constant('accommodation-services-bulk', 'services',
+                              lambda i: {'service': self.services[i].id, 'detail': 'ok'},
+                              AccommodationService, 'accommodation')
+
+    def test_distances_bulk(self):
+        """PU013-2: Distancias a campus."""
+        self._assert_constant('university-distances-bulk', 'distances',
+                              lambda i: {'campus': self.campuses[i].id, 'distance_km': '1.50', 'walk_time_minutes': 18},
+                              UniversityDistance, 'accommodation')
+
+    def test_nearby_places_bulk(self):
+        """PU013-3: Lugares cercanos."""
+        self._assert_constant('accommodation-nearby-places-bulk', 'places',
+                              lambda i: {'point_of_interest': self.pois[i].id, 'distance_km': '0.30'},
+                              AccommodationNearbyPlace, 'accommodation')
+
+    def test_photos_bulk(self):
+        """PU013-4: Fotos."""
+        self._assert_constant('accommodation-photos-bulk', 'photos',
+                              lambda i: {'image': f'alojamientos/foto_{i}', 'order_num': i, 'is_main': i == 0},
+                              AccommodationPhoto, 'accommodation')
+
+    def test_missing_reference_rolls_back(self):
+        """PU013-5: Un id inexistente devuelve error y no guarda nada."""
+        acc = self._new_accommodation()
+        items = [{'service': self.services[0].id}, {'service': 999999}]
+        resp = self.client.post(reverse('accommodation-services-bulk'), {'accommodation': acc.id, 'services': items}, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(AccommodationService.objects.filter(accommodation=acc).exists())
+
+
+class NearbyPlacesIndexTests(TestCase):
+    """
+    PU014: LUGARES CERCANOS AUTOMÁTICOS
+    -------------------------------------------------------------------
+    Objetivo: Calcular con el índice espacial los k puntos de interés más
+    cercanos por tipo y guardarlos en bloque, sin tocar los cargados a mano.
+    """
+
+    def setUp(self):
+        from points.spatial import invalidate_poi_index
+        invalidate_poi_index()
+        cache.clear()
+        owner_user = User.objects.create_user(email='cercanos@test.com', password='123')
+        self.owner = OwnerProfile.objects.create(user=owner_user, dni='56565656', status=UserStatus.objects.create(name='active_n'))
+        self.market = PointType.objects.create(name='Mercado')
+        self.pharmacy = PointType.objects.create(name='Farmacia')
+        # Mercados a ~110 m, ~330 m, ~560 m y ~5 km; una farmacia a ~220 m
+        self.m1, self.m2, self.m3, self.m_far = [
+            PointOfInterest.objects.create(name=f'Mercado {i}', type=self.market, latitude=lat, longitude='-71.5300')
+            for i, lat in enumerate(['-16.4060', '-16.4080', '-16.4100', '-16.4500'])
+        ]
+        self.ph = PointOfInterest.objects.create(name='Botica', type=self.pharmacy, latitude='-16.4050', longitude='-71.5280')
+
+    def tearDown(self):
+        from points.spatial import invalidate_poi_index
+        invalidate_poi_index()
+
+    def _nearby(self, acc):
+        return {
+            p.point_of_interest_id: p
+            for p in acc.nearby_places.all()
+        }
+
+    @override_settings(NEARBY_PLACES_PER_TYPE=2, NEARBY_PLACES_MAX_KM=1.5)
+    def test_nearby_places_computed_on_save(self):
+        """PU014-1: Al guardar con coordenadas se guardan los 2 más cercanos de cada tipo."""
+        acc = Accommodation.objects.create(
+            owner=self.owner, title="Cuarto", monthly_price=300,
+            latitude=Decimal('-16.4050'), longitude=Decimal('-71.5300'),
+        )
+        nearby = self._nearby(acc)
+        self.assertEqual(set(nearby), {self.m1.id, self.m2.id, self.ph.id})
+        self.assertTrue(all(p.is_automatic for p in nearby.values()))
+        self.assertEqual(nearby[self.m1.id].distance_km, Decimal('0.11'))
+        self.assertGreaterEqual(nearby[self.m2.id].walking_time_min, nearby[self.m1.id].walking_time_min)
+
+    @override_settings(NEARBY_PLACES_PER_TYPE=2, NEARBY_PLACES_MAX_KM=1.5)
+    def test_batch_command_replaces_automatic_rows_only(self):
+        """PU014-2: El comando por lotes reemplaza las filas automáticas y respeta las manuales."""
+        acc = Accommodation.objects.create(owner=self.owner, title="Cuarto", monthly_price=300)
+        Accommodation.objects.filter(pk=acc.pk).update(latitude=Decimal('-16.4050'), longitude=Decimal('-71.5300'))
+        AccommodationNearbyPlace.objects.create(accommodation=acc, point_of_interest=self.m_far, distance_km=5)
+        AccommodationNearbyPlace.objects.create(accommodation=acc, point_of_interest=self.m3, distance_km=9, is_automatic=True)
+
+        out = StringIO()
+        call_command('compute_nearby_places', stdout=out)
+        self.assertIn('3 nearby places for 1 accommodations', out.getvalue())
+        nearby = self._nearby(acc)
+        # m3 (automática, ya no está entre las 2 más cercanas) se elimina; la manual se conserva
+        self.assertEqual(set(nearby), {self.m1.id, self.m2.id, self.ph.id, self.m_far.id})
+        self.assertFalse(nearby[self.m_far.id].is_automatic)
+
+    def test_index_matches_brute_force(self):
+        """PU014-3: El índice por celdas devuelve lo mismo que la búsqueda exhaustiva."""
+        import numpy as np
+        from points.spatial import POIIndex
+        from .utils.geo import haversine_km_pairs
+
+        rng = np.random.default_rng(7)
+        lats = -16.40 + rng.uniform(-0.05, 0.05, 2000)
+        lons = -71.53 + rng.uniform(-0.05, 0.05, 2000)
+        types = rng.integers(0, 4, 2000)
+        index = POIIndex(zip(range(2000), types.tolist(), lats, lons), cell_km=1.0)
+        q_lats = -16.40 + rng.uniform(-0.05, 0.05, 300)
+        q_lons = -71.53 + rng.uniform(-0.05, 0.05, 300)
+        for type_id in range(4):
+            got = index.nearest_many(q_lats, q_lons, k=3, type_id=type_id, max_km=1.0)
+            ids = np.flatnonzero(types == type_id)
+            for q in range(0, 300, 17):
+                d = haversine_km_pairs(q_lats[q], q_lons[q], lats[ids], lons[ids])
+                expected = [int(ids[i]) for i in np.argsort(d)[:3] if d[i] <= 1.0]
+                self.assertEqual([poi_id for poi_id, _ in got[q]], expected)
+
+
+class ReverseGeocodeTests(APITestCase):
+    """
+    PU016: REVERSE GEOCODING CON CACHÉ
+    -------------------------------------------------------------------
+    Objetivo: Consultar Nominatim una sola vez por celda de ~20 m, respetar
+    su límite de peticiones y responder desde el gazetteer local cuando no
+    está disponible.
+    """
+
+    def setUp(self):
+        from .utils import geocoding
+        self.geocoding = geocoding
+        geocoding._lru.clear()
+        cache.clear()
+        self.url = reverse('reverse-geocode')
+
+    def _nominatim(self, lat, lon, timeout):
+        return {'display_name': f'Calle de prueba {lat},{lon}', 'lat': str(lat), 'lon': str(lon)}
+
+    def test_nearby_clicks_share_cache(self):
+        """PU016-1: Dos clics a ~5 m usan la misma celda; el segundo no llama a Nominatim."""
+        with patch.object(self.geocoding, 'anominatim_reverse', side_effect=self._nominatim) as upstream:
+            first = self.client.get(self.url, {'lat': '-16.40460', 'lon': '-71.52460'})
+            second = self.client.get(self.url, {'lat': '-16.40463', 'lon': '-71.52464'})
+            self.geocoding._lru.clear()
+            third = self.client.get(self.url, {'lat': '-16.40460', 'lon': '-71.52460'})
+        self.assertEqual(upstream.call_count, 1)
+        self.assertEqual(first.json()['source'], 'nominatim')
+        self.assertEqual(second.json()['source'], 'cache')
+        self.assertEqual(second.json()['address'], first.json()['address'])
+        # Tras vaciar la LRU responde la tabla
+        self.assertEqual(third.json()['source'], 'cache')
+        self.assertEqual(ReverseGeocodeCache.objects.count(), 1)
+
+    def test_gazetteer_when_upstream_down(self):
+        """PU016-2: Si Nominatim falla se usa la calle/distrito más cercano y no se guarda en caché."""
+        import httpx
+        with patch.object(self.geocoding, 'anominatim_reverse', side_effect=httpx.ReadTimeout('lento')):
+            resp = self.client.get(self.url, {'lat': '-16.4046', 'lon': '-71.5236'})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.json()['source'], 'gazetteer')
+        self.assertEqual(resp.json()['address'], 'Avenida Independencia, Arequipa, Perú')
+        # raw con la forma de la respuesta de Nominatim
+        raw = resp.json()['raw']
+        self.assertEqual(raw['display_name'], resp.json()['address'])
+        self.assertEqual(raw['address']['road'], 'Avenida Independencia')
+        self.assertEqual(raw['address']['city'], 'Arequipa')
+        self.assertFalse(ReverseGeocodeCache.objects.exists())
+
+    @override_settings(NOMINATIM_MAX_WAIT=0)
+    def test_rate_limit_falls_back_to_gazetteer(self):
+        """PU016-3: Sin turno libre en el limitador no se llama a Nominatim."""
+        with patch.object(self.geocoding.nominatim_limiter, 'interval', 60), \
+                patch.object(self.geocoding, 'anominatim_reverse', side_effect=self._nominatim) as upstream:
+            first = self.client.get(self.url, {'lat': '-16.3880', 'lon': '-71.5430'})
+            second = self.client.get(self.url, {'lat': '-16.4270', 'lon': '-71.5250'})
+        self.assertEqual(upstream.call_count, 1)
+        self.assertEqual(first.json()['source'], 'nominatim')
+        self.assertEqual(second.json()['source'], 'gazetteer')
+        self.assertIn('José Luis Bustamante y Rivero', second.json()['address'])
+
+    def test_invalid_coordinates(self):
+        """PU016-4: Coordenadas ausentes, no numéricas, no finitas o fuera de rango devuelven 400."""
+        self.assertEqual(self.client.get(self.url, {'lat': '-16.4'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'lat': 'x', 'lon': '-71.5'}).status_code, status.HTTP_400_BAD_REQUEST)
+        for lat, lon in (('nan', '-71.5'), ('-16.4', 'inf'), ('-infinity', '-71.5'), ('90.5', '-71.5'), ('-16.4', '-180.1')):
+            resp = self.client.get(self.url, {'lat': lat, 'lon': lon})
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, (lat, lon))
+
+    def test_rate_limit_shared_between_processes(self):
+        """PU016-5: El turno se guarda en la base de datos: otro proceso con su propio limitador tampoco lo obtiene."""
+        from asgiref.sync import async_to_sync
+        worker_a = self.geocoding.RateLimiter('nominatim-test', 60)
+        worker_b = self.geocoding.RateLimiter('nominatim-test', 60)
+        self.assertTrue(async_to_sync(worker_a.aacquire)(0))
+        self.assertFalse(async_to_sync(worker_b.aacquire)(0))
+        self.assertTrue(RateLimitSlot.objects.filter(name='nominatim-test').exists())
+        # Pasado el intervalo el turno vuelve a estar libre
+        RateLimitSlot.objects.filter(name='nominatim-test').update(next_at=timezone.now())
+        self.assertTrue(async_to_sync(worker_b.aacquire)(0))
+
+    def test_http_client_closed_with_its_loop(self):
+        """PU016-6: El cliente HTTP se reutiliza dentro de un bucle y se cierra cuando ese bucle termina (WSGI)."""
+        from asgiref.sync import async_to_sync
+
+        async def clients():
+            return await self.geocoding._http_client(), await self.geocoding._http_client()
+
+        first, again = async_to_sync(clients)()
+        second, _ = async_to_sync(clients)()
+        self.assertIs(first, again)
+        self.assertIsNot(first, second)
+        self.assertTrue(first.is_closed)
+        self.assertTrue(second.is_closed)
+
+
+OSM_SAMPLE = """<?xml version='1.0' encoding='UTF-8'?>
+<osm version="0.6">
+  <node id="1" lat="-16.3880" lon="-71.5430"><tag k="place" v="suburb"/><tag k="name" v="Yanahuara"/></node>
+  <node id="2" lat="-16.4045" lon="-71.5240"><tag k="place" v="suburb"/><tag k="name" v="Cercado"/></node>
+  <node id="10" lat="-16.3900" lon="-71.5440"/>
+  <node id="11" lat="-16.3875" lon="-71.5480"/>
+  <node id="12" lat="-16.3874" lon="-71.5481"/>
+  <node id="20" lat="-16.4030" lon="-71.5270"/>
+  <node id="21" lat="-16.4060" lon="-71.5220"/>
+  <node id="30" lat="-16.4048" lon="-71.5245"><tag k="amenity" v="university"/><tag k="name" v="Universidad Nacional de San Agustín"/></node>
+  <way id="100"><nd ref="10"/><nd ref="11"/><nd ref="12"/><tag k="highway" v="primary"/><tag k="name" v="Avenida Ejército"/></way>
+  <way id="101"><nd ref="20"/><nd ref="21"/><tag k="highway" v="secondary"/><tag k="name" v="Avenida Independencia"/></way>
+  <way id="102"><nd ref="10"/><nd ref="20"/><tag k="highway" v="footway"/></way>
+</osm>
+"""
+
+
+class AddressSearchTests(APITestCase):
+    """
+    PU017: AUTOCOMPLETADO DE DIRECCIONES
+    -------------------------------------------------------------------
+    Objetivo: Construir el índice de calles y lugares desde un extracto de
+    OSM y buscar direcciones por prefijo y por trigramas, sin red.
+    """
+
+    def setUp(self):
+        from .utils import address_search, geocoding
+        self.address_search = address_search
+        self.geocoding = geocoding
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.osm_path = os.path.join(tmp.name, 'arequipa.osm')
+        with open(self.osm_path, 'w', encoding='utf-8') as f:
+            f.write(OSM_SAMPLE)
+        self.gazetteer_path = os.path.join(tmp.name, 'gazetteer.json')
+        settings_override = override_settings(GAZETTEER_PATH=self.gazetteer_path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self._reset()
+        self.addCleanup(self._reset)
+        call_command('build_address_index', self.osm_path, stdout=StringIO())
+
+    def _reset(self):
+        self.address_search.invalidate_address_index()
+        self.geocoding._gazetteer = None
+
+    def _search(self, q, **params):
+        resp = self.client.get(reverse('address-search'), {'q': q, **params})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return [r['name'] for r in resp.data['results']], resp.data['results']
+
+    def test_command_builds_gazetteer(self):
+        """PU017-1: El comando guarda distritos, puntos de calles (espaciados) y lugares."""
+        import json
+        with open(self.gazetteer_path, encoding='utf-8') as f:
+            data = json.load(f)
+        self.assertEqual({d['name'] for d in data['districts']}, {'Yanahuara', 'Cercado'})
+        # El nodo 12 está a ~15 m del 11 y se descarta; la vía sin nombre se ignora
+        self.assertEqual([s['name'] for s in data['streets']], ['Avenida Ejército'] * 2 + ['Avenida Independencia'] * 2)
+        self.assertEqual(data['streets'][0]['district'], 'Yanahuara')
+        self.assertEqual(data['landmarks'][0]['name'], 'Universidad Nacional de San Agustín')
+
+    def test_prefix_and_abbreviations(self):
+        """PU017-2: "av indep" encuentra la avenida, sin importar tildes ni abreviaturas."""
+        names, results = self._search('av indep')
+        self.assertEqual(names, ['Avenida Independencia'])
+        self.assertEqual(results[0]['kind'], 'street')
+        self.assertAlmostEqual(results[0]['lat'], -16.4060)
+        self.assertEqual(self._search('universidad nacional san agus')[0], ['Universidad Nacional de San Agustín'])
+        # Palabras del distrito también filtran
+        self.assertEqual(self._search('yanahuara ejer')[0], ['Avenida Ejército'])
+
+    def test_typo_uses_trigrams(self):
+        """PU017-3: Con errores de tipeo se recurre a la similitud por trigramas."""
+        self.assertEqual(self._search('ejercitto')[0], ['Avenida Ejército'])
+        self.assertEqual(self._search('zzzz')[0], [])
+
+    def test_short_query_rejected(self):
+        """PU017-4: Consultas de menos de 2 caracteres devuelven 400."""
+        resp = self.client.get(reverse('address-search'), {'q': 'a'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_limit_bounds(self):
+        """PU017-5: limit no pasa de 20 y los valores menores que 1 devuelven 400."""
+        for limit in ('0', '-1'):
+            resp = self.client.get(reverse('address-search'), {'q': 'avenida', 'limit': limit})
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        with patch.object(self.address_search.AddressIndex, 'search', return_value=[]) as search:
+            self._search('avenida', limit=50)
+        self.assertEqual(search.call_args.kwargs['limit'], 20)
+
+
+class SearchQueryPlanTests(TestCase):
+    """
+    PU023: PLANES DE CONSULTA DE LA BÚSQUEDA PÚBLICA (100k ALOJAMIENTOS)
+    -------------------------------------------------------------------
+    Objetivo: Con un catálogo sembrado de 100.000 alojamientos, verificar con
+    EXPLAIN que las consultas del endpoint de filtros se resuelven con índices
+    (acc_status_*_idx, ud_campus_*_idx) y no con lecturas completas de tabla.
+    El COUNT del paginador no se revisa: cuenta la mayoría de los publicados y
+    ahí una lectura secuencial es el plan correcto.
+    """
+    CATALOGUE_SIZE = 100_000
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = OwnerProfile.objects.create(
+            user=User.objects.create_user(email='planes@propietario.com', password='password123'), dni='45454545'
+        )
+        cls.published = AccommodationStatus.objects.create(name='published')
+        draft = AccommodationStatus.objects.create(name='draft')
+        types = [AccommodationType.objects.create(name=n) for n in ('Departamento', 'Habitación', 'Minidepartamento')]
+        cls.type_id = types[1].id
+        university = University.objects.create(name='UNSA', address='Av. Independencia', abbreviation='UNSA')
+        cls.campuses = [
+            UniversityCampus.objects.create(university=university, name=f'Sede {i}', latitude=-16.40, longitude=-71.53)
+            for i in range(10)
+        ]
+        cls.university_id = university.id
+        with connection.cursor() as cursor:
+            # 70% publicados, 3 tipos, precios de 200 a 1700, 1 a 5 habitaciones
+            cursor.execute(
+                """
+                INSERT INTO accommodations_accommodation
+                    (owner_id, title, description, accommodation_type_id, address, latitude, longitude,
+                     monthly_price, coexistence_rules, publication_date, status_id, rooms, created_at, updated_at)
+                SELECT %s, 'Alojamiento ' || g, '', (ARRAY[%s, %s, %s])[1 + g %% 3], 'Calle ' || g,
+                       -16.45 + (g %% 1000) * 0.0001, -71.56 + (g / 1000) * 0.0005,
+                       200 + (g * 7919) %% 1500, '', now(), CASE WHEN g %% 10 < 7 THEN %s ELSE %s END,
+                       1 + g %% 5, now(), now()
+                FROM generate_series(1, %s) AS g
+                """,
+                [owner.id, *[t.id for t in types], cls.published.id, draft.id, cls.CATALOGUE_SIZE],
+            )
+            # Cada sede tiene distancias a una décima parte del catálogo
+            cursor.execute(
+                """
+                INSERT INTO accommodations_universitydistance
+                    (accommodation_id, campus_id, distance_km, walk_time_minutes, precision, fingerprint)
+                SELECT a.id, c.id, ((a.id * 31 + c.id) %% 800) / 100.0, ((a.id * 31 + c.id) %% 800) / 8,
+                       'estimated', ''
+                FROM accommodations_accommodation a
+                JOIN universities_universitycampus c ON a.id %% 10 = c.id %% 10
+                WHERE c.university_id = %s
+                """,
+                [university.id],
+            )
+            cursor.execute('ANALYZE accommodations_accommodation')
+            cursor.execute('ANALYZE accommodations_universitydistance')
+
+    def _plans(self, params):
+        """Planes (EXPLAIN en JSON) de las consultas del endpoint de filtros, salvo el COUNT del paginador."""
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('public-accommodations-filter-accommodations'), params)
+        self.assertEqual(resp.status_code, 200)
+        plans = []
+        for query in ctx.captured_queries:
+            sql = query['sql']
+            if 'FROM "accommodations_accommodation"' not in sql or 'COUNT(' in sql:
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+                plans.append((sql, cursor.fetchone()[0][0]['Plan']))
+        return plans
+
+    def _nodes(self, plan):
+        yield plan
+        for child in plan.get('Plans', ()):
+            yield from self._nodes(child)
+
+    def _seq_scanned(self, plan):
+        return {n['Relation Name'] for n in self._nodes(plan) if n['Node Type'] == 'Seq Scan'}
+
+    def _indexes(self, plans):
+        return {n['Index Name'] for _, plan in plans for n in self._nodes(plan) if 'Index Name' in n}
+
+    def _assert_index_driven(self, params, expected_index):
+        plans = self._plans(params)
+        self.assertTrue(plans)
+        for sql, plan in plans:
+            self.assertFalse(
+                self._seq_scanned(plan) & {'accommodations_accommodation', 'accommodations_universitydistance'},
+                f'Seq Scan en {sql[:120]}...',
+            )
+        self.assertIn(expected_index, self._indexes(plans))
+
+    def test_listing_and_ranges_use_status_indexes(self):
+        """PU023-1: Sin filtros, por precio y por habitaciones: mínimos/máximos y página salen de acc_status_*_idx."""
+        self._assert_index_driven({}, 'acc_status_price_idx')
+        self._assert_index_driven({'min_price': 300, 'max_price': 400}, 'acc_status_price_idx')
+        self._assert_index_driven({'min_rooms': 5}, 'acc_status_rooms_idx')
+
+    def test_type_filter_uses_composite_index(self):
+        """PU023-2: Filtrar por tipo ordenando por precio usa acc_status_type_price_idx."""
+        self._assert_index_driven({'accommodation_type': self.type_id}, 'acc_status_type_price_idx')
+
+    def test_campus_and_university_filters_avoid_seq_scans(self):
+        """PU023-3: Los filtros por sede (con minutos a pie) y por universidad no recorren las tablas completas."""
+        self._assert_index_driven({'campus_id': self.campuses[3].id, 'max_walk_minutes': 20}, 'acc_status_price_idx')
+        plans = self._plans({'university_id': self.university_id})
+        for sql, plan in plans:
+            self.assertFalse(
+                self._seq_scanned(plan) & {'accommodations_accommodation', 'accommodations_universitydistance'},
+                f'Seq Scan en {sql[:120]}...',
+            )
+
+
+class AsyncPublicReadTests(TestCase):
+    """
+    PU025: CAMINO DE LECTURA PÚBLICO ASÍNCRONO (ASGI)
+    -------------------------------------------------------------------
+    Objetivo: Servir la lista, el detalle y el autocompletado públicos y el
+    reverse geocoding con vistas asíncronas que devuelven el mismo JSON que
+    antes, con un número de consultas que no crece con la página y sin
+    bloquear el worker mientras se espera a Nominatim.
+    """
+
+    def setUp(self):
+        cache.clear()
+        owner_user = User.objects.create_user(email='async@propietario.com', password='password123')
+        self.owner = OwnerProfile.objects.create(user=owner_user, dni='25252525')
+        self.published = AccommodationStatus.objects.create(name='published')
+        self.draft = AccommodationStatus.objects.create(name='draft')
+        self.service = PredefinedService.objects.create(name='WiFi')
+        university = University.objects.create(name='UNSA', address='Av. Independencia', abbreviation='UNSA')
+        self.campus = UniversityCampus.objects.create(university=university, name='Ingenierías', latitude=-16.40, longitude=-71.53)
+
+    def _accommodation(self, title, status=None, address='Calle Mercaderes 100'):
+        acc = Accommodation.objects.create(
+            owner=self.owner, title=title, address=address, monthly_price=Decimal('450.00'),
+            status=status or self.published,
+        )
+        AccommodationPhoto.objects.create(accommodation=acc, image=f'fotos/{acc.id}-a')
+        AccommodationPhoto.objects.create(accommodation=acc, image=f'fotos/{acc.id}-b')
+        AccommodationService.objects.create(accommodation=acc, service=self.service)
+        UniversityDistance.objects.create(accommodation=acc, campus=self.campus, distance_km=1.2)
+        return acc
+
+    def _list_queries(self, n):
+        Accommodation.objects.all().delete()
+        for i in range(n):
+            self._accommodation(f'Depa {i}')
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('public-accommodations-list'))
+        self.assertEqual(resp.status_code, 200)
+        # Dentro de la transacción del test el registro de estados se relee en cada uso; no se cuenta
+        return resp.json(), len([q for q in ctx.captured_queries if 'accommodations_accommodationstatus' not in q['sql']])
+
+    def test_list_shape_and_constant_queries(self):
+        """PU025-1: La lista conserva el formato paginado de DRF y sus consultas no dependen del tamaño de la página."""
+        _, one = self._list_queries(1)
+        body, six = self._list_queries(6)
+        self.assertEqual(one, six)
+        self.assertEqual(six, 7)  # COUNT, página y 5 precargas
+        self.assertEqual(body['count'], 6)
+        self.assertIsNone(body['next'])
+        result = body['results'][0]
+        self.assertEqual(result['status'], 'published')
+        self.assertEqual(result['monthly_price'], '450.00')
+        self.assertEqual(len(result['photos']), 2)
+        self.assertEqual(result['services'][0]['service']['name'], 'WiFi')
+        self.assertEqual(result['university_distances'][0]['campus'], 'UNSA - Ingenierías')
+        self.assertEqual(result['user']['email'], 'async@propietario.com')
+
+        self._accommodation('Depa 7')
+        page_2 = self.client.get(reverse('public-accommodations-list'), {'page': 2}).json()
+        self.assertEqual(len(page_2['results']), 1)
+        self.assertTrue(page_2['previous'].endswith('/api/public/accommodations/'))
+        self.assertEqual(self.client.get(reverse('public-accommodations-list'), {'page': 9}).status_code, 404)
+
+    def test_detail_only_published(self):
+        """PU025-2: El detalle devuelve alojamientos publicados y 404 para el resto."""
+        published = self._accommodation('Publicado')
+        draft = self._accommodation('Borrador', status=self.draft)
+        resp = self.client.get(reverse('public-accommodations-detail', args=[published.id]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['title'], 'Publicado')
+        self.assertEqual(self.client.get(reverse('public-accommodations-detail', args=[draft.id])).status_code, 404)
+
+    def test_autocomplete(self):
+        """PU025-3: El autocompletado busca por título o dirección y trae la miniatura de la primera foto en una consulta."""
+        first = self._accommodation('Cuarto cerca a la UNSA')
+        self._accommodation('Minidepa', address='Av. Independencia 1200')
+        self._accommodation('Cuarto oculto', status=self.draft)
+        url = reverse('public-accommodations-autocomplete')
+        results = self.client.get(url, {'q': 'unsa'}).json()
+        self.assertEqual([r['title'] for r in results], ['Cuarto cerca a la UNSA'])
+        self.assertIn(f'fotos/{first.id}-a', results[0]['thumbnail'])
+        self.assertEqual(len(self.client.get(url, {'q': 'independencia'}).json()), 1)
+        self.assertEqual(self.client.get(url, {'q': 'a', 'limit': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'q': 'a', 'limit': '-1'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'q': 'a', 'limit': '0'}).status_code, 400)
+        self.assertEqual(self.client.get(url).json(), [])
+
+    async def test_reverse_geocode_waits_without_blocking(self):
+        """PU025-4: Varias consultas a Nominatim lentas se atienden a la vez, no una detrás de otra."""
+        import asyncio
+        import time
+        from .utils import geocoding
+        geocoding._lru.clear()
+
+        async def slow_nominatim(lat, lon, timeout):
+            await asyncio.sleep(0.3)
+            return {'display_name': f'Calle {lat},{lon}'}
+
+        url = reverse('reverse-geocode')
+        with patch.object(geocoding, 'anominatim_reverse', side_effect=slow_nominatim), \
+                patch.object(geocoding.nominatim_limiter, 'interval', 0.001):
+            started = time.monotonic()
+            responses = await asyncio.gather(*(
+                self.async_client.get(url, {'lat': f'-16.40{i}', 'lon': '-71.53'}) for i in range(5)
+            ))
+            elapsed = time.monotonic() - started
+        self.assertEqual([r.json()['source'] for r in responses], ['nominatim'] * 5)
+        self.assertLess(elapsed, 1.0)  # en serie serían 1.5 s
+
+
+class AdminPerformanceTests(TestCase):
+    """
+    PU026: ADMIN CON DATOS REALES
+    -------------------------------------------------------------------
+    Objetivo: Que los listados del admin hagan un número de consultas que no
+    crece con las filas, y que la edición de un alojamiento no cargue todas
+    sus reseñas, favoritos y distancias ni la ruta GeoJSON de cada distancia.
+    """
+
+    ROUTE_LON = -71.123456789
+
+    def setUp(self):
+        cache.clear()
+        admin_user = User.objects.create_superuser(email='admin@alojaaqp.com', password='password123')
+        self.client.force_login(admin_user)
+        self.published = AccommodationStatus.objects.create(name='published')
+        self.active = UserStatus.objects.create(name='active')
+        self.university = University.objects.create(name='UNSA', address='Av. Independencia', abbreviation='UNSA')
+        self.student_n = 0
+
+    def _student(self):
+        self.student_n += 1
+        user = User.objects.create_user(email=f'estudiante{self.student_n}@test.com')
+        return StudentProfile.objects.create(user=user, status=self.active)
+
+    def _accommodation(self, n_related=0):
+        user = User.objects.create_user(email=f'propietario{Accommodation.objects.count()}@test.com')
+        owner = OwnerProfile.objects.create(user=user, dni=f'{Accommodation.objects.count():08d}', status=self.active)
+        acc = Accommodation.objects.create(
+            owner=owner, title='Depa', address='Calle Mercaderes 100', monthly_price=Decimal('450.00'),
+            status=self.published, accommodation_type=AccommodationType.objects.create(name=f'Tipo {owner.id}'),
+        )
+        route = {'type': 'LineString', 'coordinates': [[self.ROUTE_LON, -16.4]] * 300}
+        for i in range(n_related):
+            student = self._student()
+            Review.objects.create(accommodation=acc, student=student, rating=4, comment=f'Comentario {i}')
+            Favorite.objects.create(accommodation=acc, student=student)
+            campus = UniversityCampus.objects.create(university=self.university, name=f'Campus {acc.id}-{i}', latitude=-16.40, longitude=-71.53)
+            UniversityDistance.objects.create(accommodation=acc, campus=campus, distance_km=Decimal(i + 1), route=route)
+        return acc
+
+    def _queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return resp, len(ctx.captured_queries)
+
+    def test_changelists_constant_queries(self):
+        """PU026-1: Los listados de alojamientos, distancias, reseñas y estudiante-universidad no hacen consultas por fila."""
+        from universities.models import StudentUniversity
+
+        self._accommodation(n_related=2)
+        campus = UniversityCampus.objects.first()
+        StudentUniversity.objects.create(student=self._student(), campus=campus)
+        urls = [
+            reverse('admin:accommodations_accommodation_changelist'),
+            reverse('admin:accommodations_universitydistance_changelist'),
+            reverse('admin:accommodations_review_changelist'),
+            reverse('admin:universities_studentuniversity_changelist'),
+        ]
+        few = [self._queries(url)[1] for url in urls]
+
+        for _ in range(4):
+            acc = self._accommodation(n_related=2)
+            for distance in UniversityDistance.objects.filter(accommodation=acc):
+                StudentUniversity.objects.create(student=self._student(), campus=distance.campus)
+        many = [self._queries(url)[1] for url in urls]
+        self.assertEqual(few, many)
+
+    def test_distance_changelist_skips_route(self):
+        """PU026-2: El listado y la edición de distancias no leen la ruta; muestran su resumen."""
+        acc = self._accommodation(n_related=1)
+        distance = UniversityDistance.objects.get(accommodation=acc)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('admin:accommodations_universitydistance_changelist'))
+        self.assertFalse(any('"accommodations_universitydistance"."route",' in q['sql'] for q in ctx.captured_queries))
+
+        resp = self.client.get(reverse('admin:accommodations_universitydistance_change', args=[distance.id]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotContains(resp, str(self.ROUTE_LON))
+        self.assertContains(resp, 'LineString, 300 puntos')
+
+    def test_change_form_caps_inlines(self):
+        """PU026-3: La edición muestra hasta 20 reseñas, favoritos y distancias, con los totales y sus enlaces."""
+        small = self._accommodation(n_related=3)
+        self.client.get(reverse('admin:accommodations_accommodation_change', args=[small.id]))  # caché de content types
+        _, small_queries = self._queries(reverse('admin:accommodations_accommodation_change', args=[small.id]))
+
+        acc = self._accommodation(n_related=25)
+        resp, queries = self._queries(reverse('admin:accommodations_accommodation_change', args=[acc.id]))
+        self.assertEqual(resp.context['inline_admin_formsets'][4].formset.initial_form_count(), 20)
+        self.assertContains(resp, 'name="reviews-INITIAL_FORMS" value="20"')
+        self.assertContains(resp, 'name="favorite_set-INITIAL_FORMS" value="20"')
+        self.assertContains(resp, 'name="universitydistance_set-INITIAL_FORMS" value="20"')
+        self.assertContains(resp, f'?accommodation__id__exact={acc.id}">25</a>')
+        # Las más recientes primero
+        self.assertContains(resp, 'Comentario 24')
+        self.assertNotContains(resp, 'Comentario 0<')
+        self.assertNotContains(resp, str(self.ROUTE_LON))
+        self.assertContains(resp, 'LineString, 300 puntos')
+        # 3 filas por inline o 20: mismas consultas
+        self.assertEqual(queries, small_queries)
+
+    def test_capped_formset_saves_rows_outside_window(self):
+        """PU026-4: Al guardar se usan las filas enviadas aunque reseñas más nuevas las hayan desplazado."""
+        from django.contrib.admin.sites import site
+        from django.test import RequestFactory
+
+        acc = self._accommodation(n_related=21)
+        oldest = Review.objects.filter(accommodation=acc).order_by('review_date').first()
+        request = RequestFactory().post('/')
+        request.user = User.objects.get(email='admin@alojaaqp.com')
+        inline = next(i for i in site._registry[Accommodation].get_inline_instances(request, acc) if i.model is Review)
+        FormSet = inline.get_formset(request, acc)
+        data = {
+            'reviews-TOTAL_FORMS': '1', 'reviews-INITIAL_FORMS': '1',
+            'reviews-0-id': str(oldest.id), 'reviews-0-accommodation': str(acc.id),
+            'reviews-0-student': str(oldest.student_id), 'reviews-0-rating': '2',
+            'reviews-0-comment': 'Editado', 'reviews-0-status': 'visible',
+        }
+        formset = FormSet(data, instance=acc, prefix='reviews', queryset=inline.get_queryset(request))
+        self.assertTrue(formset.is_valid(), formset.errors)
+        formset.save()
+        oldest.refresh_from_db()
+        self.assertEqual(oldest.comment, 'Editado')
+        self.assertEqual(Review.objects.filter(accommodation=acc).count(), 21)
+
+
+class SyntheticCatalogueTests(TestCase):
+    """
+    PU027: CATÁLOGO SINTÉTICO Y BENCHMARK DE BÚSQUEDA
+    -------------------------------------------------------------------
+    Objetivo: Generar en bloque un catálogo realista de Arequipa (con
+    distancias a todos los campus de universidades.json) y medir latencia,
+    consultas y bytes de los endpoints públicos sobre él.
+    """
+
+    def _generate(self, **options):
+        call_command('generate_catalogue', seed=1, stdout=StringIO(), **options)
+
+    def test_generates_related_rows(self):
+        """PU027-1: Se crean propietarios, alojamientos en Arequipa, fotos, servicios, reseñas y una distancia por campus."""
+        self._generate(listings=40)
+        campuses = UniversityCampus.objects.count()
+        self.assertGreater(campuses, 1)
+        self.assertEqual(Accommodation.objects.count(), 40)
+        self.assertEqual(OwnerProfile.objects.count(), 10)
+        self.assertEqual(UniversityDistance.objects.count(), 40 * campuses)
+        self.assertFalse(UniversityDistance.objects.exclude(precision=UniversityDistance.PRECISION_ESTIMATED).exists())
+        self.assertFalse(Accommodation.objects.exclude(latitude__range=(-16.6, -16.2), longitude__range=(-71.7, -71.4)).exists())
+        self.assertFalse(Accommodation.objects.filter(photos=None).exists())
+        self.assertTrue(Review.objects.exists())
+        self.assertFalse(Review.objects.exclude(accommodation__status__name='published').exists())
+
+    def test_clear_removes_synthetic_data(self):
+        """PU027-2: --clear borra lo generado (por cascada desde los usuarios sintéticos) y nada más."""
+        real = User.objects.create_user(email='real@test.com', password='password123')
+        self._generate(listings=10)
+        self._generate(listings=0, clear=True)
+        self.assertEqual(Accommodation.objects.count(), 0)
+        self.assertEqual(list(User.objects.all()), [real])
+
+    def test_benchmark_writes_json(self):
+        """PU027-3: El benchmark mide cada escenario (lista, detalle, autocompletado y cada filtro) y guarda un JSON."""
+        self._generate(listings=20)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.json')
+            out = StringIO()
+            call_command('benchmark_search', repeat=2, warmup=0, host='testserver', output=path, stdout=out)
+            with open(path) as f:
+                report = json.load(f)
+            call_command('benchmark_search', repeat=1, warmup=0, host='testserver', only=['list'], compare=path, stdout=out)
+
+        results = {r['name']: r for r in report['results']}
+        for name in ('list', 'detail', 'autocomplete', 'filter', 'filter_price_range', 'filter_services', 'filter_campus_walk'):
+            self.assertIn(name, results)
+        for result in results.values():
+            self.assertEqual(result['status'], [200], result['name'])
+            self.assertGreater(result['queries'], 0)
+            self.assertGreater(result['bytes'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+        self.assertIn('queries +0', out.getvalue())
@@ -2,7 +2,11 @@
 from rest_framework import routers
 from django.urls import path, include
 from .views import *
-from .views import ReverseGeocodeAPIView
+from .views import AddressSearchAPIView
+from .async_views import (
+    PublicAccommodationAutocompleteView, PublicAccommodationDetailView, PublicAccommodationListView,
+    ReverseGeocodeView,
+)
 
 router = routers.DefaultRouter()
 router.register(r'accommodation-status', AccommodationStatusViewSet)
@@ -12,6 +16,7 @@ router.register(r'accommodations', AccommodationViewSet)
 router.register(r'accommodation-photos', AccommodationPhotoViewSet)
 router.register(r'accommodation-services', AccommodationServiceViewSet)
 router.register(r'university-distances', UniversityDistanceViewSet)
+router.register(r'campus-isochrones', CampusIsochroneViewSet)
 router.register(r'accommodation-nearby-places', AccommodationNearbyPlaceViewSet)
 router.register(r'reviews', ReviewViewSet)
 router.register(r'favorites', FavoriteViewSet)
@@ -22,6 +27,11 @@ urlpatterns = [
     path('api/accommodation-photos/bulk/', AccommodationPhotoBulkCreateView.as_view(), name='accommodation-photos-bulk'),
     path('api/university-distances/bulk/', UniversityDistanceBulkCreateView.as_view(), name='university-distances-bulk'),
     path('api/accommodation-nearby-places/bulk/', AccommodationNearbyPlaceBulkCreateView.as_view(), name='accommodation-nearby-places-bulk'),
+    # Lectura pública asíncrona (ASGI); el filtro sigue en PublicAccommodationViewSet
+    path('api/public/accommodations/', PublicAccommodationListView.as_view(), name='public-accommodations-list'),
+    path('api/public/accommodations/autocomplete/', PublicAccommodationAutocompleteView.as_view(), name='public-accommodations-autocomplete'),
+    path('api/public/accommodations/<int:pk>/', PublicAccommodationDetailView.as_view(), name='public-accommodations-detail'),
     path('api/', include(router.urls)),
-    path('api/reverse-geocode', ReverseGeocodeAPIView.as_view(), name='reverse-geocode'),
+    path('api/reverse-geocode', ReverseGeocodeView.as_view(), name='reverse-geocode'),
+    path('api/address-search', AddressSearchAPIView.as_view(), name='address-search'),
 ]
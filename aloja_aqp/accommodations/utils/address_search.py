@@ -0,0 +1,186 @@
+"""
+Offline address autocomplete over the street/landmark gazetteer.
+
+Names are normalised (lower case, no accents, common abbreviations expanded)
+and every word of the name and its district goes into a prefix trie, so
+"av indep" finds "Avenida Independencia" and "yanahuara ejer" finds
+"Avenida Ejército" in Yanahuara without scanning the catalogue. Candidates
+are ranked by trigram similarity with the whole query; when no word matches
+by prefix (typos) the trigram inverted index supplies the candidates instead.
+
+The gazetteer file is the one used by :mod:`.geocoding` and is rebuilt from an
+OSM extract with ``manage.py build_address_index``.
+"""
+import heapq
+import json
+import re
+import threading
+import unicodedata
+
+from django.conf import settings
+
+from .geocoding import DEFAULT_GAZETTEER_PATH
+
+ABBREVIATIONS = {
+    'av': 'avenida', 'ave': 'avenida', 'avda': 'avenida',
+    'jr': 'jiron', 'jiron': 'jiron',
+    'ca': 'calle', 'cl': 'calle',
+    'psje': 'pasaje', 'pje': 'pasaje',
+    'urb': 'urbanizacion', 'univ': 'universidad',
+    'pza': 'plaza', 'prol': 'prolongacion',
+}
+# Street-type words are too common to find candidates by themselves.
+GENERIC_WORDS = {'avenida', 'calle', 'jiron', 'pasaje', 'urbanizacion', 'plaza', 'prolongacion', 'de', 'del', 'la', 'las', 'los', 'el', 'y'}
+KIND_WEIGHT = {'street': 0.05, 'landmark': 0.03, 'district': 0.0}
+MIN_TRIGRAM_SCORE = 0.3
+# At most this many candidates are scored; very common prefixes keep the shortest names.
+MAX_SCORED = 300
+
+_word_re = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+    """Lower-case words without accents, with abbreviations expanded."""
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode().lower()
+    return [ABBREVIATIONS.get(w, w) for w in _word_re.findall(text)]
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _TrieNode:
+    __slots__ = ('children', 'ids', 'shortest')
+
+    def __init__(self):
+        self.children = {}
+        self.ids = set()
+        # first MAX_SCORED ids in insertion order, which is shortest name first
+        self.shortest = []
+
+
+class AddressIndex:
+    """Prefix trie + trigram index over gazetteer entries.
+
+    ``entries`` is a list of dicts with ``name``, ``kind`` (street/landmark/
+    district), ``district``, ``lat`` and ``lon``.
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.root = _TrieNode()
+        self.by_trigram = {}
+        self.texts = [' '.join(normalize(entry['name'])) for entry in entries]
+        self.grams = [trigrams(text) for text in self.texts]
+        for i, grams in enumerate(self.grams):
+            for g in grams:
+                self.by_trigram.setdefault(g, set()).add(i)
+        for i in sorted(range(len(entries)), key=lambda i: len(self.texts[i])):
+            words = set(self.texts[i].split()) | set(normalize(entries[i].get('district')))
+            for word in words:
+                node = self.root
+                for ch in word:
+                    node = node.children.setdefault(ch, _TrieNode())
+                    node.ids.add(i)
+                    if len(node.shortest) < MAX_SCORED:
+                        node.shortest.append(i)
+
+    @classmethod
+    def from_gazetteer(cls, data):
+        """Entries from gazetteer JSON: one per street name and district, plus landmarks."""
+        entries = []
+        streets = {}
+        for s in data.get('streets', []):
+            streets.setdefault((s['name'], s.get('district')), []).append((s['lat'], s['lon']))
+        for (name, district), points in streets.items():
+            # The middle point of the street as stored, not an average that may fall off it.
+            lat, lon = points[len(points) // 2]
+            entries.append({'name': name, 'kind': 'street', 'district': district, 'lat': lat, 'lon': lon})
+        for p in data.get('landmarks', []):
+            entries.append({'name': p['name'], 'kind': 'landmark', 'district': p.get('district'), 'lat': p['lat'], 'lon': p['lon']})
+        for d in data.get('districts', []):
+            entries.append({'name': d['name'], 'kind': 'district', 'district': d['name'], 'lat': d['lat'], 'lon': d['lon']})
+        return cls(entries)
+
+    def _prefix_node(self, word):
+        node = self.root
+        for ch in word:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def search(self, query, limit=10):
+        """Ranked ``[{name, kind, district, lat, lon, score}, ...]`` for a free-text query."""
+        words = normalize(query)
+        if not words:
+            return []
+        text = ' '.join(words)
+        q_grams = trigrams(text)
+
+        # Every significant word must prefix-match some word of the name or district.
+        significant = [w for w in words if w not in GENERIC_WORDS] or words
+        nodes = [self._prefix_node(w) for w in significant]
+        if None in nodes:
+            candidates = set()
+        elif len(nodes) == 1:
+            candidates = nodes[0].shortest
+        else:
+            candidates = set.intersection(*(n.ids for n in nodes))
+            if len(candidates) > MAX_SCORED:
+                candidates = heapq.nsmallest(MAX_SCORED, candidates, key=lambda i: len(self.texts[i]))
+        prefix_match = bool(candidates)
+        if not prefix_match:
+            # Trigrams of street-type words are everywhere; only the rest select candidates.
+            # Trigrams shared by a tenth of the index (e.g. "  c") are skipped as well.
+            common = max(MAX_SCORED, len(self.entries) // 10)
+            postings = [self.by_trigram.get(g, ()) for g in trigrams(' '.join(significant))]
+            postings = [p for p in postings if len(p) <= common] or postings
+            counts = {}
+            for posting in postings:
+                for i in posting:
+                    counts[i] = counts.get(i, 0) + 1
+            needed = max(1, int(len(postings) * MIN_TRIGRAM_SCORE))
+            candidates = [i for i, n in counts.items() if n >= needed]
+
+        scored = []
+        for i in candidates:
+            grams = self.grams[i]
+            score = len(q_grams & grams) / len(q_grams | grams)
+            if not prefix_match and score < MIN_TRIGRAM_SCORE:
+                continue
+            if prefix_match:
+                score += 0.5
+                if self.texts[i].startswith(text):
+                    score += 0.2
+            score += KIND_WEIGHT.get(self.entries[i]['kind'], 0.0)
+            scored.append((score, -len(self.texts[i]), i))
+        scored.sort(reverse=True)
+        return [
+            {**self.entries[i], 'score': round(score, 3)}
+            for score, _, i in scored[:limit]
+        ]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_address_index():
+    """Process-wide index over ``settings.GAZETTEER_PATH`` (or the bundled gazetteer), loaded on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                path = getattr(settings, 'GAZETTEER_PATH', '') or DEFAULT_GAZETTEER_PATH
+                with open(path, encoding='utf-8') as f:
+                    _index = AddressIndex.from_gazetteer(json.load(f))
+    return _index
+
+
+def invalidate_address_index():
+    """Drop the process-wide index; the next :func:`get_address_index` reloads the file."""
+    global _index
+    with _index_lock:
+        _index = None
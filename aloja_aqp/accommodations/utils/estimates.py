@@ -0,0 +1,99 @@
+"""
+Straight-line estimates for UniversityDistance rows, with the walk time
+calibrated on the routed rows already in the database.
+
+Walk minutes are fitted as ``intercept + minutes_per_km * straight_km`` over
+(straight-line km, routed walk minutes) pairs, which absorbs Arequipa's street
+network detour. Until there are enough routed samples the defaults from
+``geo`` are used.
+"""
+from collections import namedtuple
+from decimal import Decimal
+import logging
+import math
+
+import numpy as np
+from django.core.cache import cache
+
+from .geo import WALK_DETOUR_FACTOR, WALK_SPEED_MPS, haversine_km_pairs
+
+logger = logging.getLogger(__name__)
+
+WalkModel = namedtuple('WalkModel', 'minutes_per_km intercept samples')
+
+DEFAULT_MODEL = WalkModel(
+    minutes_per_km=1000.0 * WALK_DETOUR_FACTOR / WALK_SPEED_MPS / 60.0,
+    intercept=0.0,
+    samples=0,
+)
+
+MIN_SAMPLES = 20
+MAX_SAMPLES = 5000
+# Pairs closer than this are dominated by building/entrance offsets; skip them.
+MIN_STRAIGHT_KM = 0.05
+MODEL_CACHE_KEY = 'accommodations:walk_estimate_model'
+MODEL_CACHE_SECONDS = 60 * 60
+
+
+def fit_walk_model(straight_km, minutes):
+    """Least-squares :class:`WalkModel` from parallel sequences; falls back to the defaults."""
+    s = np.asarray(straight_km, dtype=float)
+    m = np.asarray(minutes, dtype=float)
+    keep = s >= MIN_STRAIGHT_KM
+    s, m = s[keep], m[keep]
+    if len(s) < MIN_SAMPLES:
+        return DEFAULT_MODEL
+
+    slope, intercept = np.polyfit(s, m, 1)
+    if not slope > 0:
+        slope, intercept = DEFAULT_MODEL.minutes_per_km, DEFAULT_MODEL.intercept
+    return WalkModel(minutes_per_km=float(slope), intercept=max(float(intercept), 0.0), samples=len(s))
+
+
+def load_walk_model():
+    """Fit the model on the most recent routed UniversityDistance rows."""
+    from accommodations.models import UniversityDistance
+
+    rows = list(
+        UniversityDistance.objects.filter(
+            precision=UniversityDistance.PRECISION_ROUTED,
+            walk_time_minutes__isnull=False,
+            accommodation__latitude__isnull=False, accommodation__longitude__isnull=False,
+            campus__latitude__isnull=False, campus__longitude__isnull=False,
+        )
+        .order_by('-id')
+        .values_list('walk_time_minutes', 'accommodation__latitude', 'accommodation__longitude',
+                     'campus__latitude', 'campus__longitude')[:MAX_SAMPLES]
+    )
+    if len(rows) < MIN_SAMPLES:
+        return DEFAULT_MODEL
+    minutes, alat, alon, clat, clon = zip(*rows)
+    straight = haversine_km_pairs(alat, alon, clat, clon)
+    model = fit_walk_model(straight, minutes)
+    logger.info('Walk estimate model fitted: %s', model)
+    return model
+
+
+def get_walk_model():
+    """Cached :func:`load_walk_model` (refit at most once per ``MODEL_CACHE_SECONDS``)."""
+    model = cache.get(MODEL_CACHE_KEY)
+    if model is None:
+        model = load_walk_model()
+        cache.set(MODEL_CACHE_KEY, tuple(model), MODEL_CACHE_SECONDS)
+        return model
+    return WalkModel(*model)
+
+
+def estimate_fields(straight_km, model=None):
+    """UniversityDistance fields estimated from a straight-line distance (``precision='estimated'``).
+
+    The bus time is cleared: one computed for other coordinates no longer applies.
+    """
+    model = model or get_walk_model()
+    return {
+        'distance_km': Decimal(straight_km).quantize(Decimal('0.01')),
+        'walk_time_minutes': max(1, math.ceil(model.intercept + model.minutes_per_km * straight_km)),
+        'bus_time_minutes': None,
+        'route': None,
+        'precision': 'estimated',
+    }
@@ -0,0 +1,107 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+# Average walking speed (m/s) and street-network detour over the straight
+# line, used wherever a walking time has to be estimated without a router.
+WALK_SPEED_MPS = 1.3
+WALK_DETOUR_FACTOR = 1.25
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres between two (lat, lon) points in degrees."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_km_array(lat, lon, lats, lons):
+    """Vectorized great-circle distance in km from one point to many.
+
+    ``lats``/``lons`` are sequences (or arrays) of degrees; returns a NumPy array.
+    """
+    return haversine_km_pairs(float(lat), float(lon), lats, lons)
+
+
+def haversine_km_pairs(lats1, lons1, lats2, lons2):
+    """Element-wise great-circle distance in km between two sets of points (broadcasts)."""
+    lat1 = np.radians(np.asarray(lats1, dtype=float))
+    lon1 = np.radians(np.asarray(lons1, dtype=float))
+    lat2 = np.radians(np.asarray(lats2, dtype=float))
+    lon2 = np.radians(np.asarray(lons2, dtype=float))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * (EARTH_RADIUS_M / 1000.0) * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def convex_hull(points):
+    """Convex hull of ``[(x, y), ...]`` (Andrew's monotone chain), counter-clockwise, not closed."""
+    pts = sorted(set(points))
+    if len(pts) < 3:
+        return pts
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    lower, upper = [], []
+    for p in pts:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    for p in reversed(pts):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return lower[:-1] + upper[:-1]
+
+
+def circle_ring(lat, lon, radius_m, segments=32):
+    """``[(lon, lat), ...]`` approximating a circle of ``radius_m`` around a point."""
+    dlat = radius_m / 111320.0
+    dlon = dlat / max(math.cos(math.radians(lat)), 0.01)
+    return [
+        (lon + dlon * math.cos(2 * math.pi * i / segments), lat + dlat * math.sin(2 * math.pi * i / segments))
+        for i in range(segments)
+    ]
+
+
+def geojson_polygon(ring):
+    """GeoJSON Polygon from an open ``[(lon, lat), ...]`` ring."""
+    coords = [[round(x, 6), round(y, 6)] for x, y in ring]
+    return {'type': 'Polygon', 'coordinates': [coords + coords[:1]]}
+
+
+class PointGrid:
+    """Bucket points into square lat/lon cells so radius queries only look at
+    neighbouring cells instead of every point.
+
+    ``cell_m`` should be at least the largest radius that will be queried.
+    """
+
+    def __init__(self, points, cell_m):
+        # points: iterable of (key, lat, lon)
+        self.cell_deg = cell_m / 111320.0
+        self.cells = {}
+        for key, lat, lon in points:
+            self.cells.setdefault(self._cell(lat, lon), []).append((key, lat, lon))
+
+    def _cell(self, lat, lon):
+        return (int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg)))
+
+    def within(self, lat, lon, radius_m):
+        """Return ``[(key, distance_m), ...]`` for the points closer than ``radius_m``."""
+        ci, cj = self._cell(lat, lon)
+        # Longitude cells shrink with latitude; widen the search accordingly.
+        span_j = max(1, int(math.ceil(1 / max(math.cos(math.radians(lat)), 0.01))))
+        found = []
+        for i in range(ci - 1, ci + 2):
+            for j in range(cj - span_j, cj + span_j + 1):
+                for key, plat, plon in self.cells.get((i, j), ()):
+                    d = haversine_m(lat, lon, plat, plon)
+                    if d <= radius_m:
+                        found.append((key, d))
+        return found
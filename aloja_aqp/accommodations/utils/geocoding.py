@@ -0,0 +1,284 @@
+"""
+Reverse geocoding for map clicks.
+
+Coordinates are snapped to a ~20 m grid and looked up in an in-process LRU,
+then in the ``ReverseGeocodeCache`` table, and only then sent to Nominatim.
+Outbound calls go through a rate limiter kept in the database (one request
+per ``NOMINATIM_MIN_INTERVAL`` across every worker and host), as required by
+Nominatim's usage policy. When the limiter
+has no slot in time, or Nominatim is slow or down, the nearest street/district
+from the bundled Arequipa gazetteer is returned instead (and not cached, so
+the next click retries upstream).
+
+Everything is async (``areverse_geocode``): the view runs under ASGI and a
+worker waiting on Nominatim or on the rate limiter keeps serving other
+requests.
+"""
+from collections import OrderedDict
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from datetime import timedelta
+
+import httpx
+import numpy as np
+from django.conf import settings
+from django.db.models import DurationField, ExpressionWrapper, F
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from core.timing import timed
+
+from .geo import haversine_km_array
+
+logger = logging.getLogger(__name__)
+
+NOMINATIM_URL = 'https://nominatim.openstreetmap.org/reverse'
+USER_AGENT = 'alojaaqp/1.0'
+
+# ~22 m of latitude (and a bit less of longitude at Arequipa's latitude)
+SNAP_DEGREES = 0.0002
+
+DEFAULT_GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'arequipa_gazetteer.json')
+# A street point farther than this is not used; the address falls back to the district.
+GAZETTEER_STREET_MAX_KM = 0.4
+
+def snap(lat, lon):
+    """Integer grid cell ``(lat_key, lon_key)`` of a coordinate."""
+    return int(round(float(lat) / SNAP_DEGREES)), int(round(float(lon) / SNAP_DEGREES))
+
+
+class LRUCache:
+    """Small thread-safe LRU mapping."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_lru = LRUCache(getattr(settings, 'REVERSE_GEOCODE_LRU_SIZE', 2048))
+
+
+class RateLimiter:
+    """At most one call per ``interval`` seconds across every process, through a ``RateLimitSlot`` row.
+
+    The row holds the next moment a call may be made; a caller takes the turn
+    with a conditional UPDATE (``next_at <= now()``) that only one of the
+    concurrent callers wins. Times come from the database clock, so workers on
+    different hosts agree on them.
+    """
+
+    def __init__(self, name, interval):
+        self.name = name
+        self.interval = interval
+
+    async def _aclaim(self):
+        """None if this call took the turn, otherwise the seconds until the next one."""
+        from accommodations.models import RateLimitSlot
+
+        interval = timedelta(seconds=self.interval)
+        slots = RateLimitSlot.objects.filter(name=self.name)
+        if await slots.filter(next_at__lte=Now()).aupdate(next_at=Now() + interval):
+            return None
+        wait = await slots.annotate(
+            wait=ExpressionWrapper(F('next_at') - Now(), output_field=DurationField()),
+        ).values_list('wait', flat=True).afirst()
+        if wait is None:
+            # First call ever: whoever creates the row has the turn
+            _, created = await RateLimitSlot.objects.aget_or_create(
+                name=self.name, defaults={'next_at': timezone.now() + interval},
+            )
+            return None if created else 0.0
+        return max(wait.total_seconds(), 0.0)
+
+    async def aacquire(self, max_wait):
+        """Wait (at most ``max_wait`` seconds) for a free turn; False if none was free."""
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = await self._aclaim()
+            if wait is None:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+
+nominatim_limiter = RateLimiter('nominatim', getattr(settings, 'NOMINATIM_MIN_INTERVAL', 1.0))
+
+
+class Gazetteer:
+    """Nearest street and district from a ``{"districts": [...], "streets": [...]}`` JSON file."""
+
+    def __init__(self, data):
+        districts = data.get('districts', [])
+        streets = data.get('streets', [])
+        self.district_names = [d['name'] for d in districts]
+        self.district_lats = np.array([d['lat'] for d in districts], dtype=float)
+        self.district_lons = np.array([d['lon'] for d in districts], dtype=float)
+        self.streets = [(s['name'], s.get('district')) for s in streets]
+        self.street_lats = np.array([s['lat'] for s in streets], dtype=float)
+        self.street_lons = np.array([s['lon'] for s in streets], dtype=float)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def lookup(self, lat, lon):
+        """``{'street', 'district', 'distance_km'}`` for a point, or None if the gazetteer is empty."""
+        if not self.district_names:
+            return None
+        d = haversine_km_array(lat, lon, self.district_lats, self.district_lons)
+        district = self.district_names[int(np.argmin(d))]
+        street, distance_km = None, None
+        if self.streets:
+            s = haversine_km_array(lat, lon, self.street_lats, self.street_lons)
+            i = int(np.argmin(s))
+            if s[i] <= GAZETTEER_STREET_MAX_KM:
+                street, street_district = self.streets[i]
+                district = street_district or district
+                distance_km = round(float(s[i]), 3)
+        return {'street': street, 'district': district, 'distance_km': distance_km}
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                path = getattr(settings, 'GAZETTEER_PATH', '') or DEFAULT_GAZETTEER_PATH
+                _gazetteer = Gazetteer.load(path)
+    return _gazetteer
+
+
+def invalidate_gazetteer():
+    """Drop the process-wide gazetteer; the next :func:`get_gazetteer` reloads the file."""
+    global _gazetteer
+    with _gazetteer_lock:
+        _gazetteer = None
+
+
+def gazetteer_reverse(lat, lon):
+    """Offline result in the same shape as :func:`areverse_geocode`, or None.
+
+    ``raw`` follows Nominatim's JSON (``display_name``, ``lat``/``lon`` and an
+    ``address`` with ``road``, ``suburb``, ``city``, ``country``) so clients
+    read both sources the same way.
+    """
+    found = get_gazetteer().lookup(lat, lon)
+    if found is None:
+        return None
+    parts = [p for p in (found['street'], found['district'], 'Arequipa') if p]
+    # "Arequipa, Arequipa" for the Cercado district
+    if len(parts) > 1 and parts[-1] == parts[-2]:
+        parts.pop()
+    display_name = ', '.join(parts) + ', Perú'
+    address = {'road': found['street'], 'suburb': found['district'], 'city': 'Arequipa',
+               'country': 'Perú', 'country_code': 'pe'}
+    raw = {
+        'display_name': display_name,
+        'lat': str(lat),
+        'lon': str(lon),
+        'address': {k: v for k, v in address.items() if v},
+    }
+    return {'address': display_name, 'raw': raw, 'source': 'gazetteer'}
+
+
+# One pooled client per event loop (its connections belong to the loop that opened them).
+# Under ASGI that is one client per worker. Under WSGI, async_to_sync runs every request
+# in a new loop, so each client is closed when its loop shuts down (see _close_with_loop)
+# instead of leaving its sockets to the garbage collector.
+_http_clients = weakref.WeakKeyDictionary()
+
+
+async def _close_with_loop(client):
+    """Parked async generator; the loop's ``shutdown_asyncgens()`` (asyncio.run, asgiref) closes it and the client."""
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+async def _http_client():
+    loop = asyncio.get_running_loop()
+    entry = _http_clients.get(loop)
+    if entry is None:
+        client = httpx.AsyncClient(headers={'User-Agent': USER_AGENT})
+        closer = _close_with_loop(client)
+        await closer.asend(None)
+        entry = _http_clients[loop] = (client, closer)
+    return entry[0]
+
+
+async def anominatim_reverse(lat, lon, timeout):
+    """Nominatim's JSON for a point; raises on HTTP/network errors."""
+    with timed('http', 'nominatim'):
+        client = await _http_client()
+        resp = await client.get(
+            getattr(settings, 'NOMINATIM_URL', NOMINATIM_URL),
+            params={'format': 'json', 'lat': lat, 'lon': lon, 'zoom': 18, 'addressdetails': 1},
+            timeout=timeout,
+        )
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def areverse_geocode(lat, lon):
+    """``{'address', 'raw', 'source'}`` for a point, or None if nothing could resolve it.
+
+    ``source`` is ``'cache'``, ``'nominatim'`` or ``'gazetteer'``.
+    """
+    from accommodations.models import ReverseGeocodeCache
+
+    key = snap(lat, lon)
+    hit = _lru.get(key)
+    if hit is not None:
+        return {**hit, 'source': 'cache'}
+
+    row = await ReverseGeocodeCache.objects.filter(lat_key=key[0], lon_key=key[1]).values('address', 'raw').afirst()
+    if row is not None:
+        _lru.set(key, row)
+        return {**row, 'source': 'cache'}
+
+    if await nominatim_limiter.aacquire(getattr(settings, 'NOMINATIM_MAX_WAIT', 1.0)):
+        try:
+            data = await anominatim_reverse(lat, lon, timeout=getattr(settings, 'NOMINATIM_TIMEOUT', 2.0))
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning('Nominatim reverse geocoding failed for %s,%s: %s', lat, lon, e)
+        else:
+            if data.get('display_name'):
+                result = {'address': data['display_name'], 'raw': data}
+                await ReverseGeocodeCache.objects.aupdate_or_create(lat_key=key[0], lon_key=key[1], defaults=result)
+                _lru.set(key, result)
+                return {**result, 'source': 'nominatim'}
+    else:
+        logger.info('Nominatim rate limit reached; using the gazetteer for %s,%s', lat, lon)
+
+    return gazetteer_reverse(lat, lon)
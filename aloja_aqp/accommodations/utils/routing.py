@@ -1,10 +1,22 @@
 from django.conf import settings
 import requests
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
+import hashlib
 import logging
+import math
+
+from core.timing import timed
+
+from .estimates import estimate_fields
+from .geo import haversine_m
 
 logger = logging.getLogger(__name__)
 
+# Routing profile used for UniversityDistance.walk_time_minutes / route.
+ROUTE_PROFILE = 'walking'
+
+_FINGERPRINT_QUANTUM = Decimal('0.000001')
+
 
 def mapbox_route(lat1, lon1, lat2, lon2, profile='driving'):
 
@@ -28,7 +40,8 @@ def mapbox_route(lat1, lon1, lat2, lon2, profile='driving'):
         pass
 
     try:
-        resp = requests.get(url, params=params, timeout=12)
+        with timed('http', 'mapbox'):
+            resp = requests.get(url, params=params, timeout=12)
     except Exception as e:
         logger.exception('Error realizando request a Mapbox: %s', str(e))
         raise
@@ -51,3 +64,67 @@ def mapbox_route(lat1, lon1, lat2, lon2, profile='driving'):
         'duration_min': duration_min,
         'geometry': geometry,
     }
+
+
+def should_route(straight_km):
+    """Whether a pair is close enough (``settings.ROUTING_MAX_STRAIGHT_LINE_KM``) to be sent to Mapbox."""
+    return straight_km <= getattr(settings, 'ROUTING_MAX_STRAIGHT_LINE_KM', 5.0)
+
+
+def route_or_estimate(lat1, lon1, lat2, lon2, straight_km=None):
+    """Walking distance fields for a UniversityDistance row.
+
+    Pairs farther apart than ``settings.ROUTING_MAX_STRAIGHT_LINE_KM`` in a
+    straight line are not routed: they get the straight-line distance and a
+    calibrated walk time estimate with ``precision='estimated'`` (see
+    :mod:`.estimates`). Closer pairs are routed
+    with Mapbox (errors propagate). Returns ``None`` if Mapbox finds no route.
+    The result includes the pair's ``fingerprint`` (see :func:`route_fingerprint`).
+    """
+    fingerprint = route_fingerprint(lat1, lon1, lat2, lon2)
+    if straight_km is None:
+        straight_km = haversine_m(float(lat1), float(lon1), float(lat2), float(lon2)) / 1000.0
+    if not should_route(straight_km):
+        return dict(estimate_fields(straight_km), fingerprint=fingerprint)
+
+    result = mapbox_route(float(lat1), float(lon1), float(lat2), float(lon2), profile=ROUTE_PROFILE)
+    if not result:
+        return None
+    duration_min = result.get('duration_min')
+    return {
+        'distance_km': result.get('distance_km'),
+        'walk_time_minutes': math.ceil(duration_min) if duration_min is not None else None,
+        'route': result.get('geometry'),
+        'precision': 'routed',
+        'fingerprint': fingerprint,
+    }
+
+
+def _fingerprint_coord(value):
+    # Floats go through 15 significant digits, which is what PostgreSQL uses
+    # when casting double precision to numeric, so both sides round alike.
+    if isinstance(value, float):
+        value = format(value, '.15g')
+    q = Decimal(str(value)).quantize(_FINGERPRINT_QUANTUM, rounding=ROUND_HALF_UP)
+    return str(abs(q) if q == 0 else q)
+
+
+def route_fingerprint(lat1, lon1, lat2, lon2, profile=ROUTE_PROFILE):
+    """md5 of the origin/destination coordinates (rounded to ~10 cm) and the profile.
+
+    A UniversityDistance whose stored fingerprint differs from the one of its
+    current coordinates is stale. Must stay in sync with
+    :func:`route_fingerprint_sql`.
+    """
+    raw = f"{profile}|{_fingerprint_coord(lat1)},{_fingerprint_coord(lon1)}|{_fingerprint_coord(lat2)},{_fingerprint_coord(lon2)}"
+    return hashlib.md5(raw.encode('ascii')).hexdigest()
+
+
+def route_fingerprint_sql(lat1, lon1, lat2, lon2, profile=ROUTE_PROFILE):
+    """PostgreSQL expression computing :func:`route_fingerprint` from four column references."""
+    def coord(col):
+        return f"ROUND(({col})::numeric, 6)::text"
+    return (
+        f"md5('{profile}|' || {coord(lat1)} || ',' || {coord(lon1)} || '|' "
+        f"|| {coord(lat2)} || ',' || {coord(lon2)})"
+    )
@@ -0,0 +1,268 @@
+"""
+Public-transit travel times over a local GTFS feed.
+
+The router is a RAPTOR variant (Delling et al., "Round-Based Public Transit
+Routing") run in reverse: for a campus and a target arrival time it computes,
+for every stop, the latest departure that still reaches the campus on time.
+Campuses are few and accommodations many, so one backward run per campus
+answers every accommodation -> campus pair with a cheap lookup over the stops
+within walking distance of each accommodation.
+"""
+import csv
+import io
+import math
+import zipfile
+from bisect import bisect_right
+from datetime import date as date_cls
+
+from .geo import WALK_DETOUR_FACTOR, WALK_SPEED_MPS, PointGrid
+
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+
+def parse_gtfs_time(value):
+    """'HH:MM:SS' -> seconds after midnight. GTFS allows hours >= 24."""
+    h, m, s = value.strip().split(':')
+    return int(h) * 3600 + int(m) * 60 + int(s)
+
+
+def walk_seconds(distance_m):
+    return distance_m * WALK_DETOUR_FACTOR / WALK_SPEED_MPS
+
+
+class Pattern:
+    """Trips that visit exactly the same stop sequence (a RAPTOR "route").
+
+    ``arrivals[i]`` / ``departures[i]`` hold the times at the i-th stop for
+    every trip, ordered by departure from the first stop.
+    """
+
+    def __init__(self, stops, trips):
+        trips.sort(key=lambda t: t[0][0])
+        self.stops = stops
+        self.arrivals = [[arr[i] for arr, _ in trips] for i in range(len(stops))]
+        self.departures = [[dep[i] for _, dep in trips] for i in range(len(stops))]
+
+
+class TransitFeed:
+    def __init__(self, stop_ids, stop_coords, patterns, transfers):
+        self.stop_ids = stop_ids                # index -> GTFS stop_id
+        self.stop_coords = stop_coords          # index -> (lat, lon)
+        self.patterns = patterns                # list[Pattern]
+        self.transfers = transfers              # index -> [(index, seconds)]
+        self.patterns_by_stop = [[] for _ in stop_ids]
+        for p_idx, pattern in enumerate(patterns):
+            for pos, stop in enumerate(pattern.stops):
+                self.patterns_by_stop[stop].append((p_idx, pos))
+        self.grid = PointGrid(
+            ((idx, lat, lon) for idx, (lat, lon) in enumerate(stop_coords)), cell_m=1000
+        )
+
+    def stops_near(self, lat, lon, radius_m):
+        """``[(stop_index, walk_seconds), ...]`` reachable on foot within ``radius_m``."""
+        return [(idx, walk_seconds(d)) for idx, d in self.grid.within(lat, lon, radius_m)]
+
+    def latest_departures(self, egress, arrive_by, max_rounds=4):
+        """Reverse RAPTOR.
+
+        ``egress`` is ``[(stop_index, walk_seconds_to_target)]``. Returns a
+        dict ``stop_index -> latest departure (seconds)`` from that stop that
+        reaches the target by ``arrive_by`` using at least one vehicle.
+        """
+        n = len(self.stop_ids)
+        unreached = -math.inf
+        best = [unreached] * n          # best over all rounds, walking included
+        best_transit = {}               # only journeys that board a vehicle
+        marked = set()
+        for stop, walk in egress:
+            t = arrive_by - walk
+            if t > best[stop]:
+                best[stop] = t
+                marked.add(stop)
+        marked |= self._relax_transfers(best, marked)
+
+        for _ in range(max_rounds):
+            if not marked:
+                break
+            previous = list(best)
+            # For each pattern start scanning at the last marked stop.
+            queue = {}
+            for stop in marked:
+                for p_idx, pos in self.patterns_by_stop[stop]:
+                    if pos > queue.get(p_idx, -1):
+                        queue[p_idx] = pos
+            marked = set()
+            for p_idx, start in queue.items():
+                pattern = self.patterns[p_idx]
+                trip = None
+                for pos in range(start, -1, -1):
+                    stop = pattern.stops[pos]
+                    if trip is not None:
+                        dep = pattern.departures[pos][trip]
+                        if dep > best[stop]:
+                            best[stop] = dep
+                            marked.add(stop)
+                        if dep > best_transit.get(stop, unreached):
+                            best_transit[stop] = dep
+                    if previous[stop] == unreached:
+                        continue
+                    # Latest trip that arrives here in time to continue from this stop.
+                    arrivals = pattern.arrivals[pos]
+                    candidate = bisect_right(arrivals, previous[stop]) - 1
+                    if candidate >= 0 and (trip is None or candidate > trip):
+                        trip = candidate
+            marked |= self._relax_transfers(best, marked, best_transit)
+        return best_transit
+
+    def _relax_transfers(self, best, marked, best_transit=None):
+        improved = set()
+        for stop in list(marked):
+            for other, seconds in self.transfers[stop]:
+                t = best[stop] - seconds
+                if t > best[other]:
+                    best[other] = t
+                    improved.add(other)
+                if best_transit is not None and stop in best_transit:
+                    t = best_transit[stop] - seconds
+                    if t > best_transit.get(other, -math.inf):
+                        best_transit[other] = t
+        return improved
+
+
+def _active_services(zf, names, service_date):
+    """Service ids running on ``service_date`` (calendar.txt + calendar_dates.txt)."""
+    if 'calendar.txt' not in names and 'calendar_dates.txt' not in names:
+        return None  # feed without calendars: every trip runs every day
+    active = set()
+    ymd = service_date.strftime('%Y%m%d')
+    if 'calendar.txt' in names:
+        weekday = WEEKDAYS[service_date.weekday()]
+        for row in _read_csv(zf, 'calendar.txt'):
+            if row['start_date'] <= ymd <= row['end_date'] and row.get(weekday) == '1':
+                active.add(row['service_id'])
+    if 'calendar_dates.txt' in names:
+        for row in _read_csv(zf, 'calendar_dates.txt'):
+            if row['date'] != ymd:
+                continue
+            if row['exception_type'] == '1':
+                active.add(row['service_id'])
+            elif row['exception_type'] == '2':
+                active.discard(row['service_id'])
+    return active
+
+
+def _read_csv(zf, name):
+    with zf.open(name) as fh:
+        yield from csv.DictReader(io.TextIOWrapper(fh, encoding='utf-8-sig'))
+
+
+def load_gtfs(path, service_date=None, max_transfer_m=300):
+    """Load a GTFS zip into a :class:`TransitFeed` for ``service_date``.
+
+    ``frequencies.txt`` (common for combis, which run on headways rather than
+    timetables) is expanded into individual trips. Walking transfers between
+    stops closer than ``max_transfer_m`` are generated on top of any
+    ``transfers.txt`` entries.
+    """
+    service_date = service_date or date_cls.today()
+    with zipfile.ZipFile(path) as zf:
+        names = set(zf.namelist())
+
+        stop_ids, stop_coords, stop_index = [], [], {}
+        for row in _read_csv(zf, 'stops.txt'):
+            if not row.get('stop_lat') or not row.get('stop_lon'):
+                continue
+            stop_index[row['stop_id']] = len(stop_ids)
+            stop_ids.append(row['stop_id'])
+            stop_coords.append((float(row['stop_lat']), float(row['stop_lon'])))
+
+        services = _active_services(zf, names, service_date)
+        trip_ids = set()
+        for row in _read_csv(zf, 'trips.txt'):
+            if services is None or row['service_id'] in services:
+                trip_ids.add(row['trip_id'])
+
+        stop_times = {}
+        for row in _read_csv(zf, 'stop_times.txt'):
+            if row['trip_id'] not in trip_ids or row['stop_id'] not in stop_index:
+                continue
+            arr = row.get('arrival_time') or row.get('departure_time')
+            dep = row.get('departure_time') or arr
+            if not arr:
+                continue  # untimed stop; interpolation is out of scope
+            stop_times.setdefault(row['trip_id'], []).append((
+                int(row['stop_sequence']), stop_index[row['stop_id']],
+                parse_gtfs_time(arr), parse_gtfs_time(dep),
+            ))
+
+        frequencies = {}
+        if 'frequencies.txt' in names:
+            for row in _read_csv(zf, 'frequencies.txt'):
+                frequencies.setdefault(row['trip_id'], []).append((
+                    parse_gtfs_time(row['start_time']), parse_gtfs_time(row['end_time']),
+                    int(row['headway_secs']),
+                ))
+
+        explicit_transfers = []
+        if 'transfers.txt' in names:
+            for row in _read_csv(zf, 'transfers.txt'):
+                a, b = stop_index.get(row['from_stop_id']), stop_index.get(row['to_stop_id'])
+                if a is not None and b is not None and a != b and row.get('transfer_type') != '3':
+                    explicit_transfers.append((a, b, int(row.get('min_transfer_time') or 0)))
+
+    by_pattern = {}
+    for trip_id, rows in stop_times.items():
+        if len(rows) < 2:
+            continue
+        rows.sort()
+        stops = tuple(r[1] for r in rows)
+        arr = [r[2] for r in rows]
+        dep = [r[3] for r in rows]
+        instances = [(arr, dep)]
+        if trip_id in frequencies:
+            # The template times only describe the offsets between stops.
+            instances = []
+            for start, end, headway in frequencies[trip_id]:
+                for first in range(start, end, max(headway, 1)):
+                    shift = first - dep[0]
+                    instances.append(([t + shift for t in arr], [t + shift for t in dep]))
+        by_pattern.setdefault(stops, []).extend(instances)
+    patterns = [Pattern(list(stops), trips) for stops, trips in by_pattern.items()]
+
+    transfers = [[] for _ in stop_ids]
+    grid = PointGrid(((idx, lat, lon) for idx, (lat, lon) in enumerate(stop_coords)), cell_m=max(max_transfer_m, 1))
+    for idx, (lat, lon) in enumerate(stop_coords):
+        for other, d in grid.within(lat, lon, max_transfer_m):
+            if other != idx:
+                transfers[idx].append((other, walk_seconds(d)))
+    for a, b, seconds in explicit_transfers:
+        # Reverse search: walking a -> b lets a departure from b be reached from a.
+        transfers[b].append((a, seconds))
+    return TransitFeed(stop_ids, stop_coords, patterns, transfers)
+
+
+def transit_minutes_matrix(feed, origins, destinations, arrive_by, max_walk_m=600, max_rounds=4):
+    """Bus travel time in minutes for every origin x destination pair.
+
+    ``origins`` and ``destinations`` are ``[(key, lat, lon)]``. Returns
+    ``{(origin_key, destination_key): minutes}``; pairs without a transit
+    journey are omitted. Times are door to door for a trip that arrives by
+    ``arrive_by`` (seconds after midnight), walking legs included.
+    """
+    access = {key: feed.stops_near(lat, lon, max_walk_m) for key, lat, lon in origins}
+    result = {}
+    for dest_key, lat, lon in destinations:
+        egress = feed.stops_near(lat, lon, max_walk_m)
+        if not egress:
+            continue
+        latest = feed.latest_departures(egress, arrive_by, max_rounds=max_rounds)
+        if not latest:
+            continue
+        for origin_key, stops in access.items():
+            leave = max(
+                (latest[stop] - walk for stop, walk in stops if stop in latest),
+                default=None,
+            )
+            if leave is not None:
+                result[(origin_key, dest_key)] = int(math.ceil((arrive_by - leave) / 60.0))
+    return result
@@ -6,30 +6,28 @@ from .permissions import IsOwnerOrReadOnly, IsStudentOrReadOnly,IsAccommodationO
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
-import requests
-# Endpoint de reverse geocoding
-class ReverseGeocodeAPIView(APIView):
+from .utils.address_search import get_address_index
+from core.reference import reference_table
+from core.timing import timed
+# Autocompletado de direcciones (índice local de calles/lugares, sin red)
+class AddressSearchAPIView(APIView):
     permission_classes = [permissions.AllowAny]
+    max_limit = 20
 
     def get(self, request):
-        lat = request.GET.get('lat')
-        lon = request.GET.get('lon')
-        if not lat or not lon:
-            return Response({'error': 'lat and lon are required'}, status=400)
+        query = request.GET.get('q', '').strip()
+        if len(query) < 2:
+            return Response({'error': 'q must have at least 2 characters'}, status=400)
         try:
-            url = f'https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}&zoom=18&addressdetails=1'
-            headers = {'User-Agent': 'alojaaqp/1.0'}
-            resp = requests.get(url, headers=headers, timeout=5)
-            if resp.status_code != 200:
-                return Response({'error': 'Nominatim error', 'status': resp.status_code}, status=502)
-            data = resp.json()
-            address = data.get('display_name')
-            return Response({'address': address, 'raw': data})
-        except Exception as e:
-            return Response({'error': str(e)}, status=500)
+            limit = min(int(request.GET.get('limit', 10)), self.max_limit)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=400)
+        if limit < 1:
+            return Response({'error': 'limit must be at least 1'}, status=400)
+        return Response({'results': get_address_index().search(query, limit=limit)})
 from rest_framework import status
 from rest_framework.decorators import action
-from django.db.models import Count, Q, Min, Max
+from django.db.models import Count, Q, Min, Max, prefetch_related_objects
 from decimal import Decimal
 from rest_framework.pagination import PageNumberPagination
 
@@ -38,30 +36,39 @@ from rest_framework.pagination import PageNumberPagination
 class AccommodationStatusViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = AccommodationStatus.objects.all()
     serializer_class = AccommodationStatusSerializer
+    replica_reads = True
 
 
 class AccommodationTypeViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = AccommodationType.objects.all()
     serializer_class = AccommodationTypeSerializer
+    replica_reads = True
 
 
 class PredefinedServiceViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = PredefinedService.objects.all()
     serializer_class = PredefinedServiceSerializer
+    replica_reads = True
 
 
 #  Alojamiento 
-class PublicAccommodationViewSet(viewsets.ReadOnlyModelViewSet):
+class PublicAccommodationViewSet(viewsets.GenericViewSet):
+    # Lista, detalle y autocompletado: vistas asíncronas en async_views.py
     serializer_class = AccommodationSerializer
     # Paginate only this viewset: 10 items per page
     class TenPerPagePagination(PageNumberPagination):
         page_size = 6
     pagination_class = TenPerPagePagination
     permission_classes = [permissions.AllowAny]
+    # Lecturas anónimas del catálogo: van a la réplica si hay una (core.db_router)
+    replica_reads = True
     
     def get_queryset(self):
-        # Filtra solo los alojamientos con estado "published"
-        return Accommodation.objects.filter(status__name__iexact="published").select_related('owner', 'accommodation_type')
+        # Filtra solo los alojamientos con estado "published" (por id, sin join con la tabla de estados)
+        published = reference_table(AccommodationStatus).id("published")
+        if published is None:
+            return Accommodation.objects.none()
+        return Accommodation.objects.filter(status_id=published).select_related(*ACCOMMODATION_SERIALIZER_SELECT)
 
     def get_serializer_context(self):
         """Include selected_university_id from query params in serializer context so
@@ -73,39 +80,23 @@ class PublicAccommodationViewSet(viewsets.ReadOnlyModelViewSet):
             context['selected_university_id'] = university_id
         return context
 
-    @action(detail=False, methods=['get'], url_path='autocomplete')
-    def autocomplete(self, request):
-        q = request.GET.get('q', '').strip()
-        limit = int(request.GET.get('limit', 8))
-        if not q:
-            return Response([], status=200)
-        qs = self.get_queryset().filter(Q(title__icontains=q) | Q(address__icontains=q))[:limit]
-        results = []
-        for a in qs:
-            thumb = None
-            first_photo = a.photos.first()
-            if first_photo and first_photo.image:
-                thumb = first_photo.image.url
-            results.append({
-                'id': a.id,
-                'title': a.title,
-                'address': a.address,
-                'monthly_price': str(a.monthly_price),
-                'rooms': a.rooms,
-                'thumbnail': thumb,
-            })
-        return Response(results)
-
     @action(detail=False, methods=['get'], url_path='filter')
     def filter_accommodations(self, request):
         qs = self.get_queryset()
 
-        # Calcular el precio y habitaciones mínimo y máximo global (sin filtros)
-        global_qs = self.get_queryset()
-        global_min_price = global_qs.aggregate(min_price=Min('monthly_price'))['min_price']
-        global_max_price = global_qs.aggregate(max_price=Max('monthly_price'))['max_price']
-        global_min_rooms = global_qs.aggregate(min_rooms=Min('rooms'))['min_rooms']
-        global_max_rooms = global_qs.aggregate(max_rooms=Max('rooms'))['max_rooms']
+        # Calcular el precio y habitaciones mínimo y máximo global (sin filtros), en una sola consulta
+        global_bounds = self.get_queryset().aggregate(
+            min_price=Min('monthly_price'), max_price=Max('monthly_price'),
+            min_rooms=Min('rooms'), max_rooms=Max('rooms'),
+        )
+        global_min_price = global_bounds['min_price']
+        global_max_price = global_bounds['max_price']
+        global_min_rooms = global_bounds['min_rooms']
+        global_max_rooms = global_bounds['max_rooms']
+        # DISTINCT solo hace falta si se filtra por una relación a muchos; sin él
+        # el ORDER BY monthly_price LIMIT se resuelve con acc_status_price_idx
+        joins_many = False
+
         # full-text like filters
         q = request.GET.get('q')
         if q:
@@ -114,14 +105,25 @@ class PublicAccommodationViewSet(viewsets.ReadOnlyModelViewSet):
         # university / campus filters (via UniversityDistance)
         campus_id = request.GET.get('campus_id')
         university_id = request.GET.get('university_id')
+        # "within N minutes walking": applied in the same filter() call as the campus so both
+        # conditions hit the same UniversityDistance row (index on campus, walk_time_minutes)
+        walk_filter = {}
+        max_walk_minutes = request.GET.get('max_walk_minutes')
+        if max_walk_minutes:
+            try:
+                walk_filter['universitydistance__walk_time_minutes__lte'] = int(max_walk_minutes)
+            except ValueError:
+                pass
         if campus_id:
             # Use the actual reverse relation name present on Accommodation model
             # (no explicit related_name was set on UniversityDistance.accommodation)
             # available lookups include 'universitydistance' (see FieldError choices)
-            qs = qs.filter(universitydistance__campus__id=campus_id)
+            qs = qs.filter(universitydistance__campus__id=campus_id, **walk_filter)
+            joins_many = True
         elif university_id:
             # filter accommodations that have a distance entry to any campus of the university
-            qs = qs.filter(universitydistance__campus__university__id=university_id)
+            qs = qs.filter(universitydistance__campus__university__id=university_id, **walk_filter)
+            joins_many = True
 
 
         # filtro por tipo de alojamiento
@@ -167,10 +169,12 @@ class PublicAccommodationViewSet(viewsets.ReadOnlyModelViewSet):
                     qs = qs.filter(services__service__id__in=service_ids).annotate(
                         matched_services=Count('services__service', filter=Q(services__service__id__in=service_ids), distinct=True)
                     ).filter(matched_services__gte=len(service_ids))
+                    joins_many = True
             except Exception:
                 pass
 
-        qs = qs.distinct()
+        if joins_many:
+            qs = qs.distinct()
         # Ordering: if a university is selected, order by the minimum distance to that university's campuses
         if university_id:
             try:
@@ -184,13 +188,20 @@ class PublicAccommodationViewSet(viewsets.ReadOnlyModelViewSet):
             # default ordering: by monthly price ascending
             qs = qs.order_by('monthly_price')
         page = self.paginate_queryset(qs)
+        if page is not None:
+            # Relaciones de toda la página en 5 consultas (ver accommodation_serializer_prefetch)
+            prefetch_related_objects(page, *accommodation_serializer_prefetch())
+        else:
+            qs = qs.prefetch_related(*accommodation_serializer_prefetch())
         serializer_context = {'request': request}
         if university_id:
             serializer_context['selected_university_id'] = university_id
 
         if page is not None:
             serializer = self.get_serializer(page, many=True, context=serializer_context)
-            paginated_response = self.get_paginated_response(serializer.data)
+            with timed('serialize'):
+                data = serializer.data
+            paginated_response = self.get_paginated_response(data)
             # Agregar los campos de precio y habitaciones globales a la respuesta paginada
             if hasattr(paginated_response, 'data') and isinstance(paginated_response.data, dict):
                 paginated_response.data['global_min_price'] = str(global_min_price) if global_min_price is not None else None
@@ -199,8 +210,10 @@ class PublicAccommodationViewSet(viewsets.ReadOnlyModelViewSet):
                 paginated_response.data['global_max_rooms'] = int(global_max_rooms) if global_max_rooms is not None else None
             return paginated_response
         serializer = self.get_serializer(qs, many=True, context=serializer_context)
+        with timed('serialize'):
+            data = serializer.data
         return Response({
-            'results': serializer.data,
+            'results': data,
             'global_min_price': str(global_min_price) if global_min_price is not None else None,
             'global_max_price': str(global_max_price) if global_max_price is not None else None,
             'global_min_rooms': int(global_min_rooms) if global_min_rooms is not None else None,
@@ -280,8 +293,8 @@ class AccommodationPhotoViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'owner_profile'):
-            return AccommodationPhoto.objects.filter(accommodation__owner=user.owner_profile)
+        if user.owner_profile_id:
+            return AccommodationPhoto.objects.filter(accommodation__owner_id=user.owner_profile_id)
         return AccommodationPhoto.objects.none()  # Estudiantes no pueden ver aquí, usar nested serializer en alojamiento
 
 
@@ -293,8 +306,8 @@ class AccommodationServiceViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'owner_profile'):
-            return AccommodationService.objects.filter(accommodation__owner=user.owner_profile)
+        if user.owner_profile_id:
+            return AccommodationService.objects.filter(accommodation__owner_id=user.owner_profile_id)
         return AccommodationService.objects.none()
 
 
@@ -306,12 +319,44 @@ class UniversityDistanceViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'owner_profile'):
-            return UniversityDistance.objects.filter(accommodation__owner=user.owner_profile)
+        if user.owner_profile_id:
+            return UniversityDistance.objects.filter(accommodation__owner_id=user.owner_profile_id)
         return UniversityDistance.objects.none()
 
 
 
+#  Isócronas a pie por campus 
+class CampusIsochroneViewSet(viewsets.ReadOnlyModelViewSet):
+    """Polígonos "a N minutos caminando" de cada campus, como GeoJSON.
+
+    Filtros: ?campus_id=, ?university_id=, ?minutes=. El listado se devuelve como FeatureCollection.
+    """
+    queryset = CampusIsochrone.objects.all()
+    serializer_class = CampusIsochroneSerializer
+    permission_classes = [permissions.AllowAny]
+    replica_reads = True
+
+    def get_queryset(self):
+        qs = CampusIsochrone.objects.all()
+        campus_id = self.request.query_params.get('campus_id')
+        university_id = self.request.query_params.get('university_id')
+        minutes = self.request.query_params.get('minutes')
+        try:
+            if campus_id:
+                qs = qs.filter(campus_id=int(campus_id))
+            if university_id:
+                qs = qs.filter(campus__university_id=int(university_id))
+            if minutes:
+                qs = qs.filter(minutes=int(minutes))
+        except ValueError:
+            return CampusIsochrone.objects.none()
+        return qs
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer(self.get_queryset(), many=True)
+        return Response({'type': 'FeatureCollection', 'features': serializer.data})
+
+
 #  Lugares cercanos 
 class AccommodationNearbyPlaceViewSet(viewsets.ModelViewSet):
     queryset = AccommodationNearbyPlace.objects.all()
@@ -320,8 +365,8 @@ class AccommodationNearbyPlaceViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'owner_profile'):
-            return AccommodationNearbyPlace.objects.filter(accommodation__owner=user.owner_profile)
+        if user.owner_profile_id:
+            return AccommodationNearbyPlace.objects.filter(accommodation__owner_id=user.owner_profile_id)
         return AccommodationNearbyPlace.objects.none()
 
 
@@ -333,15 +378,15 @@ class ReviewViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'student_profile'):
-            return Review.objects.all()
+        if user.student_profile_id:
+            return Review.objects.select_related('student__user')
         return Review.objects.none()
 
     def perform_create(self, serializer):
         user = self.request.user
-        if not hasattr(user, 'student_profile'):
+        if not user.student_profile_id:
             raise PermissionDenied("Solo estudiantes pueden dejar reseñas")
-        serializer.save(student=user.student_profile)
+        serializer.save(student_id=user.student_profile_id)
 
 
 #  Favoritos 
@@ -352,20 +397,20 @@ class FavoriteViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'student_profile'):
-            return Favorite.objects.filter(student=user.student_profile)
+        if user.student_profile_id:
+            return Favorite.objects.filter(student_id=user.student_profile_id)
         return Favorite.objects.none()
 
     def perform_create(self, serializer):
         user = self.request.user
-        if not hasattr(user, 'student_profile'):
+        if not user.student_profile_id:
             raise PermissionDenied("Solo estudiantes pueden agregar favoritos")
-        serializer.save(student=user.student_profile)
+        serializer.save(student_id=user.student_profile_id)
     
     def create(self, request, *args, **kwargs):
         """Create favorite but make operation idempotent: if favorite exists, return it instead of raising DB error."""
         user = request.user
-        if not hasattr(user, 'student_profile'):
+        if not user.student_profile_id:
             raise PermissionDenied("Solo estudiantes pueden agregar favoritos")
 
         serializer = self.get_serializer(data=request.data)
@@ -375,7 +420,7 @@ class FavoriteViewSet(viewsets.ModelViewSet):
             return Response({'detail': 'accommodation is required'}, status=status.HTTP_400_BAD_REQUEST)
 
         # check existing
-        existing = Favorite.objects.filter(student=user.student_profile, accommodation=accommodation).first()
+        existing = Favorite.objects.filter(student_id=user.student_profile_id, accommodation=accommodation).first()
         if existing:
             existing_serialized = self.get_serializer(existing)
             return Response(existing_serialized.data, status=status.HTTP_200_OK)
@@ -388,11 +433,11 @@ class FavoriteViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         """Ensure students can only delete their own favorites. Return 404 if not found."""
         user = request.user
-        if not hasattr(user, 'student_profile'):
+        if not user.student_profile_id:
             raise PermissionDenied("Solo estudiantes pueden quitar favoritos")
 
         pk = kwargs.get('pk')
-        fav = Favorite.objects.filter(pk=pk, student=user.student_profile).first()
+        fav = Favorite.objects.filter(pk=pk, student_id=user.student_profile_id).first()
         if not fav:
             return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
         fav.delete()
@@ -416,36 +461,48 @@ class AccommodationViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'owner_profile'):
-            return Accommodation.objects.filter(owner=user.owner_profile).exclude(status__name="deleted")
-        return Accommodation.objects.all().exclude(status__name="deleted")
+        qs = Accommodation.objects.all()
+        if user.owner_profile_id:
+            qs = qs.filter(owner_id=user.owner_profile_id)
+        if self.action in ('list', 'retrieve'):
+            # Todas las filas son del mismo propietario: owner y su usuario se precargan una vez
+            # (sin filas no se consulta users_user)
+            qs = qs.select_related('accommodation_type').prefetch_related(
+                'owner__user', *accommodation_serializer_prefetch()
+            )
+        deleted = reference_table(AccommodationStatus).id("deleted")
+        return qs if deleted is None else qs.exclude(status_id=deleted)
+
+    def _set_status(self, accommodation, name):
+        accommodation.status_id = reference_table(AccommodationStatus).get_or_create_id(name)
+        accommodation.save()
 
     def perform_create(self, serializer):
-        status_obj = AccommodationStatus.objects.get(name="draft")
-        serializer.save(owner=self.request.user.owner_profile, status=status_obj)
+        # Solo propietarios verificados por RENIEC (owner_profile_id es None si está pendiente o rechazado)
+        owner_id = self.request.user.owner_profile_id
+        if owner_id is None:
+            raise PermissionDenied("Solo un propietario verificado puede crear alojamientos.")
+        serializer.save(
+            owner_id=owner_id,
+            status_id=reference_table(AccommodationStatus).get_or_create_id("draft"),
+        )
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsOwnerOrReadOnly])
     def publish(self, request, pk=None):
         accommodation = self.get_object()
-        status_obj = AccommodationStatus.objects.get(name="published")
-        accommodation.status = status_obj
-        accommodation.save()
+        self._set_status(accommodation, "published")
         return Response({"detail": "Alojamiento publicado correctamente."}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsOwnerOrReadOnly])
     def hide(self, request, pk=None):
         accommodation = self.get_object()
-        status_obj = AccommodationStatus.objects.get(name="hidden")
-        accommodation.status = status_obj
-        accommodation.save()
+        self._set_status(accommodation, "hidden")
         return Response({"detail": "Alojamiento ocultado correctamente."}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsOwnerOrReadOnly], url_path="delete-original")
     def delete_logical(self, request, pk=None):
         accommodation = self.get_object()
-        status_obj = AccommodationStatus.objects.get(name="deleted")
-        accommodation.status = status_obj
-        accommodation.save()
+        self._set_status(accommodation, "deleted")
         return Response({"detail": "Alojamiento borrado correctamente."}, status=status.HTTP_200_OK)
    
     
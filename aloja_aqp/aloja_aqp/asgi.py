@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "aloja_aqp.settings")
 
 application = get_asgi_application()
+
+# Each worker listens for cache invalidations from the others (core.invalidation).
+# Started on the first request so it runs in the forked workers, not the master.
+from core.invalidation import start_listener_on_first_request  # noqa: E402
+
+start_listener_on_first_request()
@@ -97,6 +97,8 @@ SOCIALACCOUNT_PROVIDERS = {
 }
 
 MIDDLEWARE = [
+    # First, so its total covers the rest of the chain
+    'core.middleware.ServerTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -106,6 +108,7 @@ MIDDLEWARE = [
     'allauth.account.middleware.AccountMiddleware',
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    'core.middleware.ReplicaRoutingMiddleware',
 ]
 
 AUTH_USER_MODEL = 'users.User'
@@ -144,6 +147,20 @@ DATABASES = {
     }
 }
 
+# Read replica for safe-method requests of public viewsets (core.db_router).
+# Without DATABASE_REPLICA_HOST every query goes to "default".
+DATABASE_REPLICA_HOST = config('DATABASE_REPLICA_HOST', default='')
+if DATABASE_REPLICA_HOST:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': DATABASE_REPLICA_HOST,
+        'PORT': config('DATABASE_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'NAME': config('DATABASE_REPLICA_NAME', default=DATABASES['default']['NAME']),
+    }
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+# How long a client that wrote keeps reading from the primary (read-your-writes)
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=10, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -166,9 +183,14 @@ REST_FRAMEWORK = {
     # Use Django's standard `django.contrib.auth` permissions,
     # or allow read-only access for unauthenticated users.
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # JSONRenderer that counts its encoding as serialization time (core.timing)
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.timing.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 # Internationalization
@@ -208,12 +230,68 @@ LOGOUT_REDIRECT_URL = "/"
 
 API_KEY = config('DECOLECTA_API_KEY')
 
+# RENIEC (decolecta) lookups are cached by DNI; "not found" answers expire sooner
+RENIEC_TIMEOUT = config('RENIEC_TIMEOUT', default=10, cast=int)
+RENIEC_CACHE_TTL_DAYS = config('RENIEC_CACHE_TTL_DAYS', default=30, cast=int)
+RENIEC_NOT_FOUND_TTL_HOURS = config('RENIEC_NOT_FOUND_TTL_HOURS', default=24, cast=int)
+# Owner profiles still pending after this (RENIEC down, never retried) are rejected and free their DNI
+OWNER_VERIFICATION_TIMEOUT_HOURS = config('OWNER_VERIFICATION_TIMEOUT_HOURS', default=48, cast=int)
+
 # Mapbox token (used by accommodations.utils.routing.mapbox_route)
 MAPBOX_ACCESS_TOKEN = config('MAPBOX_ACCESS_TOKEN')
 
+# Campuses farther than this straight-line distance (km) from an accommodation are
+# not sent to Mapbox; they get a straight-line estimate flagged as such.
+ROUTING_MAX_STRAIGHT_LINE_KM = config('ROUTING_MAX_STRAIGHT_LINE_KM', default=5.0, cast=float)
+
+# GTFS zip with Arequipa's bus/combi network (used by update_bus_times_gtfs)
+GTFS_FEED_PATH = config('GTFS_FEED_PATH', default='')
+
+# Automatic nearby places: k nearest points of interest of each type within this radius
+NEARBY_PLACES_PER_TYPE = config('NEARBY_PLACES_PER_TYPE', default=3, cast=int)
+NEARBY_PLACES_MAX_KM = config('NEARBY_PLACES_MAX_KM', default=1.5, cast=float)
+
+# Reverse geocoding (accommodations.utils.geocoding): Nominatim allows 1 request/s;
+# calls that cannot get a slot within NOMINATIM_MAX_WAIT seconds, or time out, use the gazetteer.
+NOMINATIM_URL = config('NOMINATIM_URL', default='https://nominatim.openstreetmap.org/reverse')
+NOMINATIM_MIN_INTERVAL = config('NOMINATIM_MIN_INTERVAL', default=1.0, cast=float)
+NOMINATIM_MAX_WAIT = config('NOMINATIM_MAX_WAIT', default=1.0, cast=float)
+NOMINATIM_TIMEOUT = config('NOMINATIM_TIMEOUT', default=2.0, cast=float)
+REVERSE_GEOCODE_LRU_SIZE = config('REVERSE_GEOCODE_LRU_SIZE', default=2048, cast=int)
+# Street/district gazetteer JSON; empty uses the bundled accommodations/data/arequipa_gazetteer.json
+GAZETTEER_PATH = config('GAZETTEER_PATH', default='')
+
+# Worker threads for in-process background jobs (core.background)
+BACKGROUND_TASK_WORKERS = config('BACKGROUND_TASK_WORKERS', default=2, cast=int)
+# Run background jobs inline after commit instead of on the thread pool
+BACKGROUND_TASKS_EAGER = config('BACKGROUND_TASKS_EAGER', default=False, cast=bool)
+
 CORS_ALLOW_ALL_ORIGINS = True
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=7),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=30),
-}
\ No newline at end of file
+    # Access tokens carry roles/profile ids as claims (users.authentication)
+    "TOKEN_OBTAIN_SERIALIZER": "users.authentication.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "users.authentication.ClaimsTokenRefreshSerializer",
+}
+# How long the current roles_version of a user is cached; bounds how late other
+# processes (with a per-process cache) notice a revocation
+JWT_ROLES_CACHE_SECONDS = config('JWT_ROLES_CACHE_SECONDS', default=300, cast=int)
+
+# Cached /api/auth/me/ payload per user (invalidated by users.signals on changes)
+USER_PROFILE_CACHE_SECONDS = config('USER_PROFILE_CACHE_SECONDS', default=600, cast=int)
+
+# Reference tables (statuses, types, groups) kept in memory by core.reference are
+# invalidated through the bus below; this bounds the age of a local copy regardless
+REFERENCE_DATA_MAX_AGE = config('REFERENCE_DATA_MAX_AGE', default=600, cast=int)
+
+# Cross-worker invalidation of in-process caches (core.invalidation): Postgres
+# LISTEN/NOTIFY plus a polling fallback on per-topic version counters
+INVALIDATION_BUS_ENABLED = config('INVALIDATION_BUS_ENABLED', default=True, cast=bool)
+INVALIDATION_POLL_SECONDS = config('INVALIDATION_POLL_SECONDS', default=30, cast=int)
+
+# Per-request timings (core.timing): a Server-Timing header with queries, DB, outgoing
+# HTTP and serialization time; this fraction of the requests is also logged as JSON
+SERVER_TIMING_ENABLED = config('SERVER_TIMING_ENABLED', default=False, cast=bool)
+SERVER_TIMING_LOG_SAMPLE_RATE = config('SERVER_TIMING_LOG_SAMPLE_RATE', default=0.01, cast=float)
@@ -0,0 +1,49 @@
+"""
+Minimal in-process background execution.
+
+Work is handed to a small thread pool once the surrounding transaction
+commits, so the request that triggered it returns immediately and the worker
+never sees uncommitted rows. Jobs that must survive a process restart keep
+their own checkpoints in the database (see ``accommodations.tasks``).
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 2),
+            thread_name_prefix='aloja-background',
+        )
+    return _executor
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', getattr(func, '__name__', func))
+    finally:
+        # Each worker thread has its own connections; don't leak them.
+        connections.close_all()
+
+
+def run_in_background(func, *args, **kwargs):
+    """Run ``func(*args, **kwargs)`` in a worker thread after the current transaction commits.
+
+    With ``settings.BACKGROUND_TASKS_EAGER`` the function runs inline in the
+    on_commit callback instead (tests, management shells).
+    """
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        transaction.on_commit(lambda: func(*args, **kwargs))
+        return
+    transaction.on_commit(lambda: _get_executor().submit(_run, func, args, kwargs))
@@ -0,0 +1,127 @@
+"""
+Primary/replica routing for the public read traffic.
+
+Anonymous reads of the public catalogue are most of the load. When a
+``replica`` alias is configured (``DATABASE_REPLICA_HOST`` in settings),
+``ReplicaRoutingMiddleware`` (core.middleware) flags safe-method requests to
+views whose class sets ``replica_reads = True`` and ``PrimaryReplicaRouter``
+sends the reads of those requests to the replica. Writes, reads of every
+other view and reads inside a transaction use ``default``. Without a replica
+alias everything uses ``default``.
+
+Read-your-writes: a successful unsafe request pins its client to the primary
+for ``REPLICA_STICKY_SECONDS`` so an owner always sees their own edits,
+whatever the replication lag. The pin is a cookie, plus an entry under the
+JWT user id in the default cache for API clients that do not keep cookies
+(per worker with the local-memory cache, shared once CACHES points at Redis).
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+PRIMARY_ALIAS = 'default'
+REPLICA_ALIAS = 'replica'
+PIN_COOKIE = 'db_primary_until'
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+def replica_alias():
+    """Alias of the configured replica, or None when there is none."""
+    return REPLICA_ALIAS if REPLICA_ALIAS in settings.DATABASES else None
+
+
+def replica_reads_enabled():
+    """True while the current request may read from the replica."""
+    return _replica_reads.get()
+
+
+def set_replica_reads(enabled):
+    """Flag (or unflag) the current context for replica reads; returns a token for ``reset_replica_reads``."""
+    return _replica_reads.set(enabled)
+
+
+def reset_replica_reads(token):
+    _replica_reads.reset(token)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Route the reads of the enclosed block to the replica (or back to the primary)."""
+    token = set_replica_reads(enabled)
+    try:
+        yield
+    finally:
+        reset_replica_reads(token)
+
+
+def _pin_cache_key(user_id):
+    return f'db:primary_until:{user_id}'
+
+
+def _sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+
+def pin_to_primary(response, user=None):
+    """Keep the client of ``response`` (and ``user``) on the primary for a while."""
+    seconds = _sticky_seconds()
+    until = int(time.time()) + seconds
+    response.set_cookie(PIN_COOKIE, str(until), max_age=seconds, httponly=True, samesite='Lax')
+    if user is not None and user.is_authenticated:
+        cache.set(_pin_cache_key(user.id), until, seconds)
+
+
+def _jwt_user_id(request):
+    # The same validation DRF runs later on; only the user id claim is used here
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return None
+    try:
+        return auth.get_validated_token(raw_token).get(api_settings.USER_ID_CLAIM)
+    except (InvalidToken, TokenError):
+        return None
+
+
+def is_pinned_to_primary(request):
+    """True if the client wrote recently (pin cookie or, for JWT clients, the cached pin)."""
+    try:
+        until = int(request.COOKIES.get(PIN_COOKIE, 0))
+    except ValueError:
+        until = 0
+    if until > time.time():
+        return True
+    user_id = _jwt_user_id(request)
+    return user_id is not None and cache.get(_pin_cache_key(user_id)) is not None
+
+
+class PrimaryReplicaRouter:
+    """Reads of flagged requests go to the replica; everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get():
+            return None
+        alias = replica_alias()
+        # Inside a transaction the primary may hold rows the replica cannot see yet
+        if alias is None or connections[PRIMARY_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
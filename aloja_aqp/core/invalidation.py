@@ -0,0 +1,249 @@
+"""
+Cross-worker invalidation bus for in-process caches.
+
+Module-level indexes and the local-memory cache backend (reference tables,
+the POI and address indexes, cached roles and profiles) live in each worker.
+``publish(topic, payload)`` tells every worker to drop the matching entries:
+
+* after the current transaction commits, the topic's ``InvalidationCounter``
+  row is incremented and a ``NOTIFY`` carrying the topic, the new version and
+  the payload is sent on ``INVALIDATION_CHANNEL`` (PostgreSQL only);
+* each web worker runs a listener thread (started on its first request, see
+  ``aloja_aqp/wsgi.py``) that ``LISTEN``s on the channel and calls the
+  handlers registered with ``subscribe(topic, handler)``;
+* the same thread polls the counters every ``INVALIDATION_POLL_SECONDS``.
+  A topic whose version moved past the last notification seen (the listener
+  was reconnecting, or the database has no NOTIFY) gets its handlers called
+  with ``payload=None``, meaning "drop everything for this topic".
+
+The publishing worker evicts its own entries directly; its listener skips
+the notifications it sent.
+"""
+import json
+import logging
+import os
+import select
+import socket
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import request_started
+from django.db import DatabaseError, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = 'aloja_invalidate'
+# Built-in topic: payload is a space-separated list of keys of the default cache
+CACHE_TOPIC = 'cache'
+# NOTIFY payloads must stay under 8000 bytes
+MAX_PAYLOAD_BYTES = 7000
+
+_handlers = defaultdict(list)
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def _sender_id():
+    # Computed on each call: gunicorn workers forked from a preloaded master share module state
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def subscribe(topic, handler):
+    """Call ``handler(payload)`` when another worker publishes ``topic`` (``payload`` None = everything)."""
+    if handler not in _handlers[topic]:
+        _handlers[topic].append(handler)
+
+
+def unsubscribe(topic, handler):
+    if handler in _handlers.get(topic, ()):
+        _handlers[topic].remove(handler)
+
+
+def dispatch(topic, payload):
+    for handler in list(_handlers.get(topic, ())):
+        try:
+            handler(payload)
+        except Exception:
+            logger.exception('Invalidation handler %r failed for topic %s', handler, topic)
+
+
+def publish(topic, payload='', using='default'):
+    """Ask the other workers to evict ``topic``/``payload`` once the current transaction commits."""
+    transaction.on_commit(lambda: _send(topic, payload, using), using=using)
+
+
+def publish_cache_keys(keys, using='default'):
+    """Ask the other workers to delete ``keys`` from their local-memory cache."""
+    chunk, size = [], 0
+    for key in keys:
+        if chunk and size + len(key) + 1 > MAX_PAYLOAD_BYTES:
+            publish(CACHE_TOPIC, ' '.join(chunk), using)
+            chunk, size = [], 0
+        chunk.append(key)
+        size += len(key) + 1
+    if chunk:
+        publish(CACHE_TOPIC, ' '.join(chunk), using)
+
+
+def _send(topic, payload, using):
+    from .models import InvalidationCounter
+
+    connection = connections[using]
+    table = InvalidationCounter._meta.db_table
+    try:
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (topic, version) VALUES (%s, 1) '
+                f'ON CONFLICT (topic) DO UPDATE SET version = {table}.version + 1 RETURNING version',
+                [topic],
+            )
+            version = cursor.fetchone()[0]
+            if connection.vendor == 'postgresql':
+                message = json.dumps({'t': topic, 'v': version, 'p': payload, 's': _sender_id()})
+                cursor.execute('SELECT pg_notify(%s, %s)', [INVALIDATION_CHANNEL, message])
+    except DatabaseError:
+        # The request already committed; other workers catch up through MAX_AGE/TTLs
+        logger.exception('Could not publish invalidation for topic %s', topic)
+
+
+def _delete_local_cache_keys(payload):
+    cache = caches['default']
+    if not isinstance(cache, LocMemCache):
+        return  # shared backends were already updated by the publisher
+    if payload is None:
+        cache.clear()
+    else:
+        cache.delete_many(payload.split())
+
+
+class InvalidationListener(threading.Thread):
+    """LISTENs for invalidations and polls the counters; reconnects with backoff."""
+
+    def __init__(self, using='default', poll_seconds=None):
+        super().__init__(name='aloja-invalidation', daemon=True)
+        self.using = using
+        self.poll_seconds = poll_seconds or getattr(settings, 'INVALIDATION_POLL_SECONDS', 30)
+        self.seen = None  # topic -> last version handled
+        self._stop_event = threading.Event()
+        self._conn = None
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        backoff = 1
+        while not self._stop_event.is_set():
+            try:
+                self._connect()
+                self.poll()  # catch up on what was missed while disconnected
+                backoff = 1
+                self._loop()
+            except Exception as e:
+                logger.warning('Invalidation listener error (retrying in %ss): %s', backoff, e)
+                self._close()
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, 60)
+        self._close()
+
+    def _connect(self):
+        db = connections[self.using]
+        if db.vendor != 'postgresql' or self._conn is not None:
+            return
+        conn = db.get_new_connection(db.get_connection_params())
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN {INVALIDATION_CHANNEL}')
+        self._conn = conn
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+        connections[self.using].close()
+
+    def _loop(self):
+        next_poll = time.monotonic() + self.poll_seconds
+        while not self._stop_event.is_set():
+            # Wake up at least every second so stop() is honoured quickly
+            timeout = min(max(next_poll - time.monotonic(), 0), 1.0)
+            if self._conn is not None:
+                if select.select([self._conn], [], [], timeout)[0]:
+                    self._conn.poll()
+                    self._drain()
+            else:
+                self._stop_event.wait(timeout)
+            if time.monotonic() >= next_poll:
+                self.poll()
+                next_poll = time.monotonic() + self.poll_seconds
+
+    def _drain(self):
+        while self._conn.notifies:
+            self.handle_message(self._conn.notifies.pop(0).payload)
+
+    def handle_message(self, raw):
+        try:
+            message = json.loads(raw)
+            topic, version = message['t'], message['v']
+        except (ValueError, KeyError, TypeError):
+            logger.warning('Ignoring malformed invalidation message %r', raw)
+            return
+        if self.seen is not None:
+            self.seen[topic] = max(self.seen.get(topic, 0), version)
+        if message.get('s') != _sender_id():
+            dispatch(topic, message.get('p'))
+
+    def poll(self):
+        """Compare the counters with the versions seen; evict whole topics that moved."""
+        from .models import InvalidationCounter
+
+        if self._conn is not None:
+            with self._conn.cursor() as cursor:
+                cursor.execute(f'SELECT topic, version FROM {InvalidationCounter._meta.db_table}')
+                rows = cursor.fetchall()
+            # Notifications delivered while the query ran are handled before comparing
+            self._drain()
+        else:
+            rows = list(InvalidationCounter.objects.using(self.using).values_list('topic', 'version'))
+            connections[self.using].close()
+
+        if self.seen is None:
+            self.seen = dict(rows)  # first poll: nothing cached yet in this worker
+            return
+        for topic, version in rows:
+            if version > self.seen.get(topic, 0):
+                self.seen[topic] = version
+                dispatch(topic, None)
+
+
+def start_listener():
+    """Start this worker's listener thread (again, if it died or the process forked)."""
+    global _listener
+    if not getattr(settings, 'INVALIDATION_BUS_ENABLED', True):
+        return None
+    with _listener_lock:
+        if _listener is None or not _listener.is_alive() or _listener.pid != os.getpid():
+            _listener = InvalidationListener()
+            _listener.pid = os.getpid()
+            _listener.start()
+    return _listener
+
+
+def _on_request_started(**kwargs):
+    listener = _listener
+    if listener is None or listener.pid != os.getpid() or not listener.is_alive():
+        start_listener()
+
+
+def start_listener_on_first_request():
+    """Start the listener lazily, after the server has forked its workers."""
+    request_started.connect(_on_request_started, dispatch_uid='core.invalidation.listener')
+
+
+subscribe(CACHE_TOPIC, _delete_local_cache_keys)
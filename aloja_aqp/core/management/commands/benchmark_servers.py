@@ -0,0 +1,194 @@
+"""
+Concurrent-request throughput of the WSGI (gunicorn) and ASGI (uvicorn) setups.
+
+Each server is started on a free local port with the same number of worker
+processes, warmed up, and hit with ``--requests`` requests per path keeping
+``--concurrency`` in flight. Reverse geocoding goes to a local stub that
+answers like Nominatim after ``--upstream-ms`` (every request uses a new
+coordinate, so each one waits on the "upstream"); that is the I/O-bound case
+where a sync worker sits idle while an async one keeps serving.
+
+    python manage.py benchmark_servers --concurrency 50 --requests 400 --workers 2
+"""
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = (
+    '/api/public/accommodations/',
+    '/api/public/accommodations/autocomplete/?q=a',
+    '/api/reverse-geocode?lat={lat}&lon={lon}',
+)
+SERVER_COMMANDS = {
+    'wsgi': ['gunicorn', 'aloja_aqp.wsgi:application', '--bind', '127.0.0.1:{port}', '--workers', '{workers}'],
+    'asgi': ['uvicorn', 'aloja_aqp.asgi:application', '--host', '127.0.0.1', '--port', '{port}',
+             '--workers', '{workers}', '--no-access-log'],
+}
+# Arequipa, for random reverse-geocoding points
+LAT_RANGE = (-16.45, -16.35)
+LON_RANGE = (-71.60, -71.48)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_fake_nominatim(delay_ms):
+    """Local HTTP server answering like Nominatim's /reverse after ``delay_ms``."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay_ms / 1000)
+            body = json.dumps({'display_name': f'Calle de prueba {self.path}'}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', _free_port()), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _expand(path):
+    return path.format(
+        lat=f'{random.uniform(*LAT_RANGE):.5f}', lon=f'{random.uniform(*LON_RANGE):.5f}',
+    )
+
+
+async def run_load(base_url, path, total, concurrency, timeout=30.0):
+    """Latencies (s) and status codes of ``total`` GETs with ``concurrency`` in flight."""
+    latencies, statuses, errors = [], [], 0
+    remaining = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                started = time.perf_counter()
+                try:
+                    resp = await client.get(_expand(path))
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+                statuses.append(resp.status_code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, statuses, errors, elapsed
+
+
+def summarize(latencies, statuses, errors, elapsed):
+    ms = sorted(x * 1000 for x in latencies)
+    quantiles = statistics.quantiles(ms, n=100) if len(ms) > 1 else ms * 99
+    return {
+        'requests': len(ms) + errors,
+        'errors': errors + sum(1 for s in statuses if s >= 500),
+        'rps': round(len(ms) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(quantiles[49], 1) if ms else None,
+        'p95_ms': round(quantiles[94], 1) if ms else None,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent-request throughput of the gunicorn (WSGI) and uvicorn (ASGI) setups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', default='wsgi,asgi', help='Comma-separated: wsgi, asgi')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Path to request (repeatable); {lat}/{lon} become random points in Arequipa')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per path')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight')
+        parser.add_argument('--workers', type=int, default=2, help='Worker processes per server')
+        parser.add_argument('--upstream-ms', type=int, default=200, help='Latency of the fake Nominatim')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        servers = [s.strip() for s in options['servers'].split(',') if s.strip()]
+        unknown = set(servers) - set(SERVER_COMMANDS)
+        if unknown:
+            raise CommandError(f'Unknown server(s): {", ".join(sorted(unknown))}')
+        paths = options['paths'] or list(DEFAULT_PATHS)
+
+        upstream = start_fake_nominatim(options['upstream_ms'])
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'aloja_aqp.settings'),
+            'NOMINATIM_URL': f'http://127.0.0.1:{upstream.server_address[1]}/reverse',
+            # Let every request reach the fake upstream instead of the rate limiter's fallback
+            'NOMINATIM_MIN_INTERVAL': '0.000001',
+            'NOMINATIM_TIMEOUT': '30',
+        }
+        results = []
+        try:
+            for server in servers:
+                for path in paths:
+                    result = self._bench(server, path, env, options)
+                    results.append(result)
+                    if not options['json']:
+                        self.stdout.write(
+                            f"{server:5} {path:50} {result['rps']:>8} req/s  p50 {result['p50_ms']} ms  "
+                            f"p95 {result['p95_ms']} ms  errors {result['errors']}/{result['requests']}"
+                        )
+        finally:
+            upstream.shutdown()
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+
+    def _bench(self, server, path, env, options):
+        port = _free_port()
+        command = [
+            part.format(port=port, workers=options['workers']) for part in SERVER_COMMANDS[server]
+        ]
+        process = subprocess.Popen(
+            command, cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        base_url = f'http://127.0.0.1:{port}'
+        try:
+            self._wait_until_up(process, base_url, path)
+            # Warm-up: first request of each worker starts its listeners and loads indexes
+            asyncio.run(run_load(base_url, path, options['workers'] * 4, options['workers'] * 2))
+            latencies, statuses, errors, elapsed = asyncio.run(
+                run_load(base_url, path, options['requests'], options['concurrency'])
+            )
+        finally:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        return {'server': server, 'path': path, 'concurrency': options['concurrency'],
+                'workers': options['workers'], **summarize(latencies, statuses, errors, elapsed)}
+
+    def _wait_until_up(self, process, base_url, path, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'{process.args[0]} exited with code {process.returncode}')
+            try:
+                httpx.get(base_url + _expand(path), timeout=5)
+                return
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        raise CommandError(f'{process.args[0]} did not start within {timeout}s')
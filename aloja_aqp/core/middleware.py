@@ -0,0 +1,96 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.permissions import SAFE_METHODS
+
+from . import timing
+from .db_router import is_pinned_to_primary, pin_to_primary, replica_alias, set_replica_reads
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Sends the reads of safe-method requests to views with ``replica_reads = True``
+    to the replica, unless the client wrote recently; pins clients to the
+    primary after a successful write (see core.db_router).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self._finish(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._finish(request, await self.get_response(request))
+
+    def _finish(self, request, response):
+        if request.__dict__.pop('_replica_reads', False):
+            # Cleared by value: under ASGI process_view ran in a thread and only
+            # the value (not a context token) was copied back to this context
+            set_replica_reads(False)
+        if request.method not in SAFE_METHODS and response.status_code < 400 and replica_alias():
+            pin_to_primary(response, getattr(request, 'user', None))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        if (
+            request.method in SAFE_METHODS
+            and getattr(view_class, 'replica_reads', False)
+            and replica_alias()
+            and not is_pinned_to_primary(request)
+        ):
+            set_replica_reads(True)
+            request._replica_reads = True
+        return None
+
+
+class ServerTimingMiddleware:
+    """
+    Adds a ``Server-Timing`` header with the queries, database, outgoing HTTP
+    and serialization time of the request, and logs a sample of them (see
+    core.timing). Not used at all unless ``SERVER_TIMING_ENABLED``.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'SERVER_TIMING_LOG_SAMPLE_RATE', 0.0)
+        timing.enable_query_timing()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = timing.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            timings = timing.end_request(token)
+        return self._finish(request, response, timings)
+
+    async def __acall__(self, request):
+        token = timing.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timings = timing.end_request(token)
+        return self._finish(request, response, timings)
+
+    def _finish(self, request, response, timings):
+        total = timings.total()
+        response['Server-Timing'] = timings.header(total)
+        timing.log_sampled(request, response, timings, total, self.sample_rate)
+        return response
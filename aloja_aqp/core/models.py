@@ -1,3 +1,108 @@
+import copy
+
+from django.core.exceptions import ValidationError
 from django.db import models
 
-# Create your models here.
+
+class DirtyFieldsMixin:
+    """Track which concrete fields changed since the instance was loaded.
+
+    ``from_db`` snapshots the loaded values, so signal handlers and views can
+    ask ``changed_fields`` / ``has_changed()`` without re-reading the row.
+
+    ``save()`` on a loaded instance without explicit ``update_fields`` only
+    writes the changed columns (plus ``auto_now`` ones), and is a no-op
+    (no query, no signals) when nothing changed. Instances that were never
+    loaded from the database save as usual.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot(field_names, values)
+        return instance
+
+    def _snapshot(self, attnames=None, values=None):
+        if attnames is None:
+            attnames = [f.attname for f in self._meta.concrete_fields if f.attname in self.__dict__]
+            values = [self.__dict__[name] for name in attnames]
+        loaded = self.__dict__.setdefault('_loaded_values', {})
+        for name, value in zip(attnames, values):
+            # JSON values can be mutated in place; keep our own copy.
+            loaded[name] = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+    @property
+    def changed_fields(self):
+        """Names of the concrete fields whose value differs from the loaded one.
+
+        For an instance that was not loaded from the database, every field counts as changed.
+        """
+        loaded = self.__dict__.get('_loaded_values')
+        fields = self._meta.concrete_fields
+        if loaded is None:
+            return {f.name for f in fields}
+        changed = set()
+        for field in fields:
+            if field.attname not in self.__dict__:
+                continue  # deferred and never assigned
+            if field.attname not in loaded or _value_changed(field, loaded[field.attname], self.__dict__[field.attname]):
+                changed.add(field.name)
+        return changed
+
+    def has_changed(self, *field_names):
+        """True if any of ``field_names`` changed since the instance was loaded."""
+        return bool(self.changed_fields.intersection(field_names))
+
+    def loaded_value(self, field_name):
+        """Value ``field_name`` had when loaded (None if unknown)."""
+        field = self._meta.get_field(field_name)
+        return self.__dict__.get('_loaded_values', {}).get(field.attname)
+
+    def save(self, *args, **kwargs):
+        if (
+            '_loaded_values' in self.__dict__
+            and not self._state.adding
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+            and not args
+        ):
+            changed = self.changed_fields
+            if not changed:
+                return
+            auto_now = {f.name for f in self._meta.concrete_fields if getattr(f, 'auto_now', False)}
+            kwargs['update_fields'] = changed | auto_now
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self._snapshot()
+        else:
+            saved = [self._meta.get_field(name) for name in update_fields]
+            self._snapshot([f.attname for f in saved], [self.__dict__.get(f.attname) for f in saved])
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None:
+            self._snapshot()
+        else:
+            refreshed = [self._meta.get_field(name) for name in fields]
+            self._snapshot([f.attname for f in refreshed], [self.__dict__.get(f.attname) for f in refreshed])
+
+
+def _value_changed(field, old, new):
+    if old == new:
+        return False
+    try:
+        # Normalise e.g. float vs Decimal coordinates before comparing.
+        return field.to_python(old) != field.to_python(new)
+    except ValidationError:
+        return True
+
+
+class InvalidationCounter(models.Model):
+    """Last version published per invalidation topic (see core.invalidation)."""
+
+    topic = models.CharField(max_length=100, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.topic} v{self.version}'
@@ -0,0 +1,144 @@
+"""
+Process-wide registry of small reference tables (statuses, types, groups...).
+
+Hot paths resolve rows of these tables by name (``status "published"``,
+group ``"student"``). A :class:`ReferenceTable` loads the whole table once
+per process as a ``name -> id`` map so callers can filter with
+``status_id=<id>`` instead of joining on the name, and create rows with a
+known foreign key instead of a ``get_or_create`` per request.
+
+Invalidation: saving or deleting a row clears the local copy and publishes
+the ``reference`` topic on the invalidation bus (core.invalidation) so the
+other workers clear theirs. A local copy is also reloaded after
+``REFERENCE_DATA_MAX_AGE`` seconds as a last resort.
+
+A table read inside a transaction is used for that lookup but not kept, so
+ids of rows that end up rolled back are never cached.
+"""
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+
+from .invalidation import publish, subscribe
+
+REFERENCE_TOPIC = 'reference'
+
+# Tables registered when the core app is ready (see CoreConfig.ready)
+REFERENCE_MODELS = (
+    'auth.Group',
+    'users.UserStatus',
+    'accommodations.AccommodationStatus',
+    'accommodations.AccommodationType',
+    'accommodations.PredefinedService',
+    'points.PointType',
+)
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+class ReferenceTable:
+    """``name -> id`` map of a small table keyed by a unique name field (case-insensitive)."""
+
+    def __init__(self, model, field='name'):
+        self.model = model
+        self.field = field
+        self._lock = threading.Lock()
+        self._data = None  # (name -> id, id -> name)
+        self._loaded_at = 0.0
+        # Bumped on every invalidation so a load that raced with it is not stored
+        self._generation = 0
+        uid = f'reference_table:{model._meta.label_lower}'
+        post_save.connect(self._changed, sender=model, weak=False, dispatch_uid=uid)
+        post_delete.connect(self._changed, sender=model, weak=False, dispatch_uid=uid)
+
+    def __repr__(self):
+        return f'<ReferenceTable {self.model._meta.label}>'
+
+    def _loaded(self, now):
+        data = self._data
+        if data is not None and now - self._loaded_at < getattr(settings, 'REFERENCE_DATA_MAX_AGE', 600):
+            return data
+        return None
+
+    def _maps(self):
+        now = time.monotonic()
+        data = self._loaded(now)
+        if data is not None:
+            return data
+
+        generation = self._generation
+        rows = list(self.model._default_manager.values_list('pk', self.field))
+        data = ({name.lower(): pk for pk, name in rows}, dict(rows))
+
+        if not connection.in_atomic_block:
+            with self._lock:
+                if generation == self._generation:
+                    self._data, self._loaded_at = data, now
+        return data
+
+    def id(self, name):
+        """Primary key of the row called ``name``, or None if there is none."""
+        return self._maps()[0].get(name.lower())
+
+    async def aid(self, name):
+        """``id`` for async code; only a (re)load runs in a thread."""
+        data = self._loaded(time.monotonic()) or await sync_to_async(self._maps)()
+        return data[0].get(name.lower())
+
+    def name(self, pk):
+        """Name of the row with primary key ``pk``, or None."""
+        return self._maps()[1].get(pk)
+
+    def ids(self, *names):
+        """Primary keys of the existing rows among ``names``."""
+        ids = self._maps()[0]
+        return [ids[n.lower()] for n in names if n.lower() in ids]
+
+    def get_or_create_id(self, name):
+        """Like ``id`` but creates the row when it does not exist yet."""
+        pk = self.id(name)
+        if pk is None:
+            pk = self.model._default_manager.get_or_create(**{self.field: name})[0].pk
+        return pk
+
+    def clear(self):
+        """Drop the local copy (the next lookup reloads it)."""
+        with self._lock:
+            self._generation += 1
+            self._data = None
+
+    def _changed(self, **kwargs):
+        self.clear()
+        publish(REFERENCE_TOPIC, self.model._meta.label_lower)
+
+
+def reference_table(model):
+    """The process-wide :class:`ReferenceTable` of ``model`` (a model class or ``'app.Model'`` label)."""
+    if isinstance(model, str):
+        model = apps.get_model(model)
+    table = _tables.get(model)
+    if table is None:
+        with _tables_lock:
+            table = _tables.get(model)
+            if table is None:
+                table = _tables[model] = ReferenceTable(model)
+    return table
+
+
+def clear_reference_tables(label=None):
+    """Clear one table (by ``'app.model'`` label) or all of them."""
+    for table in list(_tables.values()):
+        if label is None or table.model._meta.label_lower == label:
+            table.clear()
+
+
+def register_reference_tables():
+    for label in REFERENCE_MODELS:
+        reference_table(label)
+    subscribe(REFERENCE_TOPIC, clear_reference_tables)
@@ -1,7 +1,9 @@
-from django.test import TestCase
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, override_settings
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
+from unittest import skipUnless
 from unittest.mock import patch
 
 from users.models import User, UserStatus, OwnerProfile, StudentProfile
@@ -65,7 +67,10 @@ class IntegrationOwnerAccommodationTests(APITestCase):
             'contact_address': 'Av. Ejército 123'
         }
 
-        with patch('users.serializers.verificar_dni') as mock_verificar:
+        # La verificación con RENIEC corre en segundo plano al confirmar la transacción
+        with patch('users.utils.api_reniec.fetch_dni') as mock_verificar, \
+                override_settings(BACKGROUND_TASKS_EAGER=True), \
+                self.captureOnCommitCallbacks(execute=True):
             mock_verificar.return_value = {
                 'first_name': 'Carlos',
                 'last_name_1': 'Martínez',
@@ -77,7 +82,9 @@ class IntegrationOwnerAccommodationTests(APITestCase):
         self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
         owner_profile = OwnerProfile.objects.get(user=owner_user)
         self.assertIsNotNone(owner_profile, "El OwnerProfile debería existir")
-        print(f"✓ OwnerProfile creado: DNI {owner_profile.dni}")
+        self.assertEqual(owner_profile.verification_status, OwnerProfile.VERIFICATION_VERIFIED)
+        print(f"✓ OwnerProfile creado y verificado: DNI {owner_profile.dni}")
+        owner_user.refresh_from_db()
 
         # --- PASO 3: Crear anuncio en estado draft ---
         print("\n[PASO 3] Creando anuncio en estado DRAFT...")
@@ -130,7 +137,7 @@ class IntegrationOwnerAccommodationTests(APITestCase):
         Flujo:
         1. Crear usuario base (SIN registrar como propietario)
         2. Intentar crear anuncio
-        3. Verificar que falla (lanza RelatedObjectDoesNotExist)
+        3. Verificar que falla con 403
         """
         print("\n" + "="*70)
         print("INTEGRACIÓN 2: NO SE PUEDE CREAR ANUNCIO SIN OWNERPROFILE")
@@ -157,15 +164,13 @@ class IntegrationOwnerAccommodationTests(APITestCase):
             'rooms': 1
         }
         print(f"Datos de entrada: {accommodation_data['title']}")
-        print("Esperado: Lanzar excepción (RelatedObjectDoesNotExist)")
+        print("Esperado: 403 FORBIDDEN")
 
         # --- VERIFICACIÓN ---
-        # Esperamos que lance una excepción porque el usuario NO tiene owner_profile
-        # El endpoint intenta acceder a self.request.user.owner_profile sin validar
-        with self.assertRaises(Exception):
-            resp = self.client.post(accommodation_url, accommodation_data, format='json')
-        
-        print("Resultado: ✓ Excepción lanzada correctamente")
+        resp = self.client.post(accommodation_url, accommodation_data, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
+
+        print("Resultado: ✓ Creación rechazada (403)")
         
         # Verificar que NO se creó anuncio
         self.assertEqual(Accommodation.objects.filter(title='Habitación sin permiso').count(), 0)
@@ -232,7 +237,8 @@ class IntegrationOwnerAccommodationTests(APITestCase):
         owner_profile = OwnerProfile.objects.create(
             user=owner_user,
             dni='87654321',
-            status=self.user_status_active
+            status=self.user_status_active,
+            verification_status=OwnerProfile.VERIFICATION_VERIFIED,
         )
         self.client.force_authenticate(user=owner_user)
 
@@ -267,7 +273,8 @@ class IntegrationOwnerAccommodationTests(APITestCase):
         owner1_profile = OwnerProfile.objects.create(
             user=owner1_user,
             dni='11111111',
-            status=self.user_status_active
+            status=self.user_status_active,
+            verification_status=OwnerProfile.VERIFICATION_VERIFIED,
         )
 
         acc1 = Accommodation.objects.create(
@@ -282,7 +289,8 @@ class IntegrationOwnerAccommodationTests(APITestCase):
         owner2_profile = OwnerProfile.objects.create(
             user=owner2_user,
             dni='22222222',
-            status=self.user_status_active
+            status=self.user_status_active,
+            verification_status=OwnerProfile.VERIFICATION_VERIFIED,
         )
 
         acc2 = Accommodation.objects.create(
@@ -352,3 +360,475 @@ class IntegrationOwnerAccommodationTests(APITestCase):
         publish_url = reverse('accommodation-publish', kwargs={'pk': acc.id})
         resp_publish = self.client.post(publish_url)
         self.assertEqual(resp_publish.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class DirtyFieldsMixinTests(TestCase):
+    """
+    PRUEBAS: SEGUIMIENTO DE CAMPOS MODIFICADOS (DirtyFieldsMixin)
+    -------------------------------------------------------------------
+    Objetivo: Detectar cambios sin releer la fila, guardar solo las columnas
+    modificadas y omitir los guardados sin cambios.
+    """
+
+    def setUp(self):
+        owner = OwnerProfile.objects.create(
+            user=User.objects.create_user(email='dirty@test.com', password='123'),
+            dni='45454545',
+            status=UserStatus.objects.create(name='active'),
+        )
+        self.status_draft = AccommodationStatus.objects.create(name="draft")
+        self.status_published = AccommodationStatus.objects.create(name="published")
+        acc = Accommodation.objects.create(owner=owner, title="Cuarto", monthly_price=300, status=self.status_draft)
+        Accommodation.objects.filter(pk=acc.pk).update(latitude='-16.4050000000', longitude='-71.5300000000')
+        self.acc_id = acc.id
+
+    def test_changed_fields(self):
+        """DIRTY-1: changed_fields refleja solo lo asignado; valores equivalentes no cuentan."""
+        acc = Accommodation.objects.get(pk=self.acc_id)
+        self.assertEqual(acc.changed_fields, set())
+        acc.latitude = -16.405  # float equivalente al Decimal guardado
+        self.assertEqual(acc.changed_fields, set())
+        acc.title = "Cuarto amplio"
+        acc.status = self.status_published
+        self.assertEqual(acc.changed_fields, {'title', 'status'})
+        self.assertTrue(acc.has_changed('status', 'latitude'))
+        self.assertEqual(acc.loaded_value('status'), self.status_draft.id)
+
+    def test_noop_save_issues_no_queries(self):
+        """DIRTY-2: Guardar sin cambios no ejecuta consultas."""
+        acc = Accommodation.objects.get(pk=self.acc_id)
+        with self.assertNumQueries(0):
+            acc.save()
+
+    def test_save_updates_only_changed_columns_without_select(self):
+        """DIRTY-3: Publicar hace un único UPDATE con las columnas cambiadas (sin SELECT previo)."""
+        acc = Accommodation.objects.get(pk=self.acc_id)
+        acc.status = self.status_published
+        with self.assertNumQueries(1) as ctx:
+            acc.save()
+        sql = ctx.captured_queries[0]['sql']
+        self.assertTrue(sql.startswith('UPDATE'))
+        self.assertIn('"status_id"', sql)
+        self.assertIn('"updated_at"', sql)
+        self.assertNotIn('"title"', sql)
+        self.assertEqual(acc.changed_fields, set())
+        acc.refresh_from_db()
+        self.assertEqual(acc.status, self.status_published)
+
+    def test_coordinate_change_triggers_recalculation(self):
+        """DIRTY-4: El signal de distancias solo se dispara si cambian las coordenadas."""
+        campus = UniversityCampus.objects.create(
+            university=University.objects.create(name="UNSA", abbreviation="UNSA"),
+            name="Central", latitude=-16.3989, longitude=-71.5350,
+        )
+        acc = Accommodation.objects.get(pk=self.acc_id)
+        acc.title = "Solo título"
+        acc.save()
+        self.assertFalse(UniversityDistance.objects.filter(accommodation=acc).exists())
+
+        acc.latitude = -16.4100
+        with patch('accommodations.utils.routing.mapbox_route', return_value=None):
+            acc.save()
+        self.assertTrue(UniversityDistance.objects.filter(accommodation=acc, campus=campus).exists())
+
+
+class ReferenceTableTests(TransactionTestCase):
+    """
+    PU021: REGISTRO EN MEMORIA DE TABLAS DE REFERENCIA
+    -------------------------------------------------------------------
+    Objetivo: Resolver estados y grupos por nombre sin consultar la base de
+    datos en cada petición, filtrar por status_id sin join e invalidar el
+    registro cuando cambian las filas (también en otros workers).
+    Usa TransactionTestCase: dentro de una transacción el registro no guarda nada.
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+        from core.reference import clear_reference_tables, reference_table
+        cache.clear()
+        clear_reference_tables()
+        self.addCleanup(clear_reference_tables)
+        self.published = AccommodationStatus.objects.create(name='published')
+        self.deleted = AccommodationStatus.objects.create(name='deleted')
+        self.statuses = reference_table(AccommodationStatus)
+
+    def test_ids_loaded_once(self):
+        """PU021-1: La tabla se carga una vez y luego se resuelve sin consultas (sin distinguir mayúsculas)."""
+        with self.assertNumQueries(1):
+            self.assertEqual(self.statuses.id('published'), self.published.id)
+            self.assertEqual(self.statuses.id('Deleted'), self.deleted.id)
+            self.assertEqual(self.statuses.name(self.published.id), 'published')
+            self.assertIsNone(self.statuses.id('hidden'))
+
+    def test_invalidated_on_save_and_by_other_workers(self):
+        """PU021-2: Guardar una fila limpia el registro y lo publica en el bus; el mensaje de otro worker también lo limpia."""
+        import json
+        from core.invalidation import InvalidationListener
+        from core.models import InvalidationCounter
+        self.assertIsNone(self.statuses.id('hidden'))
+        hidden = AccommodationStatus.objects.create(name='hidden')
+        self.assertEqual(self.statuses.id('hidden'), hidden.id)
+        self.assertTrue(InvalidationCounter.objects.filter(topic='reference').exists())
+
+        # Otro worker renombró el estado: a este proceso solo le llega el mensaje del bus
+        AccommodationStatus.objects.filter(pk=self.published.pk).update(name='publicado')
+        self.assertIsNone(self.statuses.id('publicado'))
+        InvalidationListener().handle_message(json.dumps(
+            {'t': 'reference', 'v': 99, 'p': 'accommodations.accommodationstatus', 's': 'otro-host:1'}
+        ))
+        self.assertEqual(self.statuses.id('publicado'), self.published.id)
+
+    def test_public_list_filters_by_status_id(self):
+        """PU021-3: La lista pública filtra por status_id, sin join con la tabla de estados."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        owner_user = User.objects.create_user(email='ref@propietario.com', password='password123')
+        owner = OwnerProfile.objects.create(user=owner_user, dni='12121212')
+        Accommodation.objects.create(owner=owner, title='Publicado', monthly_price=300, status=self.published)
+        Accommodation.objects.create(owner=owner, title='Eliminado', monthly_price=300, status=self.deleted)
+        self.statuses.id('published')
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('public-accommodations-list'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([a['title'] for a in resp.json()['results']], ['Publicado'])
+        self.assertEqual(resp.json()['results'][0]['status'], 'published')
+        self.assertFalse(any('accommodations_accommodationstatus' in q['sql'] for q in ctx.captured_queries))
+
+    def test_registration_uses_cached_group_and_status(self):
+        """PU021-4: Registrar estudiantes no repite get_or_create de grupo y estado."""
+        from django.contrib.auth.models import Group
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from core.reference import reference_table
+        payload = {'email': 'a@estudiante.com', 'password': 'password123', 'first_name': 'A', 'last_name': 'B'}
+        self.assertEqual(self.client.post(reverse('user-register'), payload, format='json').status_code, 201)
+        self.assertEqual(Group.objects.filter(name='student').count(), 1)
+        # Ambos ya están en el registro: el segundo registro no los busca por nombre
+        reference_table(Group).id('student')
+        reference_table(UserStatus).id('active')
+        with CaptureQueriesContext(connection) as ctx:
+            payload['email'] = 'b@estudiante.com'
+            self.assertEqual(self.client.post(reverse('user-register'), payload, format='json').status_code, 201)
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('"auth_group"."name" =', sql)
+        self.assertNotIn('"users_userstatus"', sql)
+        student = User.objects.get(email='b@estudiante.com')
+        self.assertEqual(list(student.groups.values_list('name', flat=True)), ['student'])
+        self.assertEqual(student.student_profile.status.name, 'active')
+
+
+class InvalidationBusTests(TransactionTestCase):
+    """
+    PU022: BUS DE INVALIDACIÓN ENTRE WORKERS (LISTEN/NOTIFY)
+    -------------------------------------------------------------------
+    Objetivo: Publicar invalidaciones al confirmar la transacción, recibirlas
+    en el hilo listener de otros workers y recuperar las perdidas con el
+    contador de versiones (polling).
+    """
+
+    def setUp(self):
+        import threading
+        from core import invalidation
+        self.received = []
+        self.event = threading.Event()
+
+        def handler(payload):
+            self.received.append(payload)
+            self.event.set()
+
+        invalidation.subscribe('test-topic', handler)
+        self.addCleanup(invalidation.unsubscribe, 'test-topic', handler)
+
+    def _wait(self):
+        self.assertTrue(self.event.wait(5), 'el listener no recibió la invalidación')
+        self.event.clear()
+
+    def test_publish_after_commit(self):
+        """PU022-1: publish incrementa el contador del tema solo cuando la transacción confirma."""
+        from django.db import transaction
+        from core.invalidation import publish
+        from core.models import InvalidationCounter
+        with transaction.atomic():
+            publish('test-topic', 'a')
+            publish('test-topic', 'b')
+            self.assertFalse(InvalidationCounter.objects.filter(topic='test-topic').exists())
+        self.assertEqual(InvalidationCounter.objects.get(topic='test-topic').version, 2)
+        with self.assertRaises(ValueError), transaction.atomic():
+            publish('test-topic', 'c')
+            raise ValueError
+        self.assertEqual(InvalidationCounter.objects.get(topic='test-topic').version, 2)
+
+    def test_listener_notify_and_polling_fallback(self):
+        """PU022-2: El listener despacha los NOTIFY de otros procesos y, sin NOTIFY, detecta el cambio por polling."""
+        import json
+        import time
+        from django.db import connection
+        from core.invalidation import INVALIDATION_CHANNEL, InvalidationListener
+        from core.models import InvalidationCounter
+
+        listener = InvalidationListener(poll_seconds=0.3)
+        listener.start()
+        self.addCleanup(listener.join, 5)
+        self.addCleanup(listener.stop)
+        deadline = time.monotonic() + 5
+        while listener.seen is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [
+                INVALIDATION_CHANNEL, json.dumps({'t': 'test-topic', 'v': 1, 'p': 'users:profile:7', 's': 'otro-host:1'}),
+            ])
+        self._wait()
+        self.assertEqual(self.received, ['users:profile:7'])
+
+        # Un cambio sin NOTIFY (listener caído, otra base) se detecta al comparar el contador
+        InvalidationCounter.objects.create(topic='test-topic', version=5)
+        self._wait()
+        self.assertEqual(self.received, ['users:profile:7', None])
+
+    def test_cache_keys_evicted_in_other_workers(self):
+        """PU022-3: El tema 'cache' borra las claves indicadas de la caché local del worker."""
+        import json
+        from django.core.cache import cache
+        from core.invalidation import InvalidationListener, publish_cache_keys
+        from core.models import InvalidationCounter
+        cache.set('users:profile:1', 'viejo')
+        cache.set('users:profile:2', 'vigente')
+        InvalidationListener().handle_message(json.dumps({'t': 'cache', 'v': 1, 'p': 'users:profile:1', 's': 'otro-host:1'}))
+        self.assertIsNone(cache.get('users:profile:1'))
+        self.assertEqual(cache.get('users:profile:2'), 'vigente')
+
+        # Listas largas se parten en varios mensajes (límite de 8000 bytes de NOTIFY)
+        publish_cache_keys([f'users:profile:{i}' for i in range(2000)])
+        self.assertGreater(InvalidationCounter.objects.get(topic='cache').version, 1)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    PU024: LECTURAS PÚBLICAS EN LA RÉPLICA CON LECTURA DE LAS PROPIAS ESCRITURAS
+    -------------------------------------------------------------------
+    Objetivo: Enviar las lecturas de las vistas públicas (métodos seguros) a la
+    réplica y mantener en la primaria, durante REPLICA_STICKY_SECONDS, a los
+    clientes que acaban de escribir (cookie o usuario del JWT).
+    Los casos con dos bases reales necesitan DATABASE_REPLICA_HOST/NAME
+    (p. ej. una segunda base en el Postgres local).
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+        from django.test import RequestFactory
+        cache.clear()
+        self.factory = RequestFactory()
+        self.seen = []
+
+    def _view(self, replica_reads):
+        from django.http import HttpResponse
+        from core.db_router import replica_reads_enabled
+
+        def view(request):
+            self.seen.append(replica_reads_enabled())
+            return HttpResponse(status=400 if request.GET.get('fail') else 200)
+        view.cls = type('View', (), {'replica_reads': replica_reads})
+        return view
+
+    def _run(self, request, replica_reads=True):
+        from core.middleware import ReplicaRoutingMiddleware
+        view = self._view(replica_reads)
+        middleware = ReplicaRoutingMiddleware(lambda req: middleware.process_view(req, view, (), {}) or view(req))
+        return middleware(request)
+
+    def test_router_targets(self):
+        """PU024-1: Solo las lecturas marcadas y fuera de una transacción van a la réplica; las escrituras siempre a la primaria."""
+        from django.db import transaction
+        from core.db_router import PrimaryReplicaRouter, replica_reads
+        router = PrimaryReplicaRouter()
+        with patch('core.db_router.replica_alias', return_value='replica'):
+            self.assertIsNone(router.db_for_read(Accommodation))
+            with replica_reads():
+                self.assertEqual(router.db_for_read(Accommodation), 'replica')
+                self.assertEqual(router.db_for_write(Accommodation), 'default')
+                with transaction.atomic():
+                    self.assertIsNone(router.db_for_read(Accommodation))
+        with patch('core.db_router.replica_alias', return_value=None), replica_reads():
+            self.assertIsNone(router.db_for_read(Accommodation))  # sin réplica configurada
+
+    @patch('core.middleware.replica_alias', return_value='replica')
+    def test_middleware_flags_public_safe_requests(self, _alias):
+        """PU024-2: GET a una vista pública usa la réplica; POST o vistas no marcadas, la primaria."""
+        from core.db_router import replica_reads_enabled
+        self._run(self.factory.get('/publica/'))
+        self._run(self.factory.get('/privada/'), replica_reads=False)
+        self._run(self.factory.post('/publica/'))
+        self.assertEqual(self.seen, [True, False, False])
+        self.assertFalse(replica_reads_enabled())  # el flag no sobrevive a la petición
+
+    @patch('core.middleware.replica_alias', return_value='replica')
+    def test_writer_pinned_by_cookie(self, _alias):
+        """PU024-3: Una escritura exitosa deja la cookie de fijación; con ella las lecturas van a la primaria."""
+        from core.db_router import PIN_COOKIE
+        self.assertNotIn(PIN_COOKIE, self._run(self.factory.post('/publica/?fail=1')).cookies)
+        response = self._run(self.factory.post('/publica/'))
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 10)
+
+        request = self.factory.get('/publica/')
+        request.COOKIES[PIN_COOKIE] = response.cookies[PIN_COOKIE].value
+        self._run(request)
+        request = self.factory.get('/publica/')
+        request.COOKIES[PIN_COOKIE] = '1'  # cookie vencida
+        self._run(request)
+        self.assertEqual(self.seen[-2:], [False, True])
+
+    @patch('core.middleware.replica_alias', return_value='replica')
+    def test_writer_pinned_by_jwt_user(self, _alias):
+        """PU024-4: Un cliente con JWT que escribió lee de la primaria aunque no guarde cookies."""
+        from rest_framework_simplejwt.tokens import AccessToken
+        user = User.objects.create_user(email='pin@propietario.com', password='password123')
+        other = User.objects.create_user(email='otro@propietario.com', password='password123')
+        request = self.factory.post('/publica/')
+        request.user = user
+        self._run(request)
+        self._run(self.factory.get('/publica/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}'))
+        self._run(self.factory.get('/publica/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(other)}'))
+        self.assertEqual(self.seen[-2:], [False, True])
+
+
+@skipUnless('replica' in settings.DATABASES, 'Configura DATABASE_REPLICA_HOST/NAME con una segunda base')
+class ReplicaDatabaseTests(TransactionTestCase):
+    """
+    PU024: LECTURAS PÚBLICAS EN LA RÉPLICA (DOS BASES)
+    -------------------------------------------------------------------
+    Objetivo: Con una réplica real (que aquí no replica nada) el anónimo lee
+    el catálogo de la réplica y el propietario que acaba de publicar ve su
+    alojamiento, con la cookie o solo con su JWT. Correr esta clase sola:
+    DATABASE_REPLICA_HOST=localhost DATABASE_REPLICA_NAME=alojaaqp_replica
+    python manage.py test core.tests.ReplicaDatabaseTests
+    (el resto de la suite crea sus datos solo en la primaria).
+    """
+    # Sin réplica la clase se salta, pero el runner igual prepara las bases que declara
+    databases = {'default', 'replica'} if 'replica' in settings.DATABASES else {'default'}
+
+    def setUp(self):
+        from django.contrib.auth.models import Group
+        from django.core.cache import cache
+        from rest_framework.test import APIClient
+        from core.reference import clear_reference_tables
+        cache.clear()
+        clear_reference_tables()
+        self.addCleanup(clear_reference_tables)
+        self.client = APIClient()
+        # Los estados existen en ambas bases con el mismo id; el alojamiento solo en la primaria
+        for alias in ('default', 'replica'):
+            AccommodationStatus.objects.using(alias).create(id=1, name='draft')
+            AccommodationStatus.objects.using(alias).create(id=2, name='published')
+        user = User.objects.create_user(email='replica@propietario.com', password='password123')
+        user.groups.add(Group.objects.create(name='owner'))
+        owner = OwnerProfile.objects.create(user=user, dni='24242424')
+        self.accommodation = Accommodation.objects.create(owner=owner, title='Recién publicado', monthly_price=500, status_id=1)
+        resp = self.client.post('/api/token/', {'email': 'replica@propietario.com', 'password': 'password123'}, format='json')
+        self.access = resp.data['access']
+
+    def _public_titles(self, client):
+        resp = client.get(reverse('public-accommodations-list'))
+        self.assertEqual(resp.status_code, 200)
+        return [a['title'] for a in resp.json()['results']]
+
+    def test_owner_reads_own_write(self):
+        """PU024-5: Tras publicar, el propietario ve su alojamiento (cookie o JWT); un anónimo lee la réplica."""
+        from rest_framework.test import APIClient
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        resp = self.client.post(reverse('accommodation-publish', args=[self.accommodation.id]))
+        self.assertEqual(resp.status_code, 200)
+
+        self.assertEqual(self._public_titles(self.client), ['Recién publicado'])
+        self.assertEqual(self._public_titles(APIClient()), [])  # la réplica aún no lo tiene
+
+        jwt_only = APIClient()
+        jwt_only.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        self.assertEqual(self._public_titles(jwt_only), ['Recién publicado'])
+
+
+@override_settings(SERVER_TIMING_ENABLED=True, SERVER_TIMING_LOG_SAMPLE_RATE=0.0)
+class ServerTimingTests(TestCase):
+    """
+    PU029: SERVER-TIMING POR PETICIÓN
+    -------------------------------------------------------------------
+    Objetivo: Con SERVER_TIMING_ENABLED cada respuesta trae en Server-Timing
+    las consultas y el tiempo de base de datos, de llamadas HTTP salientes y
+    de serialización, y una muestra de las peticiones se registra como JSON.
+    Desactivado, el middleware no entra en la cadena.
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+        from core.timing import disable_query_timing
+        cache.clear()
+        self.addCleanup(disable_query_timing)
+        published = AccommodationStatus.objects.create(name='published')
+        owner = OwnerProfile.objects.create(user=User.objects.create_user(email='timing@propietario.com'), dni='29292929')
+        for i in range(3):
+            Accommodation.objects.create(owner=owner, title=f'Depa {i}', monthly_price=400 + i, status=published)
+
+    def _metrics(self, response):
+        metrics = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            metrics[name] = dict(p.split('=', 1) for p in params)
+        return metrics
+
+    def test_header_counts_queries_and_serialization(self):
+        """PU029-1: El header cuenta las mismas consultas que la base de datos y el tiempo de serialización."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('public-accommodations-filter-accommodations'))
+        self.assertEqual(resp.status_code, 200)
+        metrics = self._metrics(resp)
+        self.assertEqual(metrics['db']['desc'], f'"{len(ctx.captured_queries)} queries"')
+        self.assertGreater(float(metrics['db']['dur']), 0)
+        self.assertGreater(float(metrics['serialize']['dur']), 0)
+        self.assertEqual(metrics['http']['desc'], '"no calls"')
+        self.assertGreaterEqual(float(metrics['total']['dur']), float(metrics['db']['dur']))
+
+    def test_async_view_counts_outgoing_http(self):
+        """PU029-2: En una vista asíncrona cuenta la llamada a Nominatim hecha en el bucle de eventos."""
+        from unittest.mock import AsyncMock, MagicMock
+        from accommodations.utils import geocoding
+        geocoding._lru.clear()
+        upstream = MagicMock()
+        upstream.get = AsyncMock(return_value=MagicMock(json=lambda: {'display_name': 'Calle Mercaderes'}))
+        with patch.object(geocoding, '_http_client', return_value=upstream), \
+                patch.object(geocoding.nominatim_limiter, 'aacquire', AsyncMock(return_value=True)):
+            resp = self.client.get(reverse('reverse-geocode'), {'lat': '-16.3989', 'lon': '-71.5369'})
+        self.assertEqual(resp.json()['source'], 'nominatim')
+        metrics = self._metrics(resp)
+        self.assertEqual(metrics['http']['desc'], '"nominatim x1"')
+        self.assertNotEqual(metrics['db']['desc'], '"0 queries"')  # caché de geocodificación en la tabla
+
+    def test_sampled_json_log(self):
+        """PU029-3: Con muestreo 1 cada petición se registra como una línea JSON; con 0, ninguna."""
+        import json
+        url = reverse('public-accommodations-filter-accommodations')
+        with self.settings(SERVER_TIMING_LOG_SAMPLE_RATE=1.0), self.assertLogs('core.timing', 'INFO') as logs:
+            self.client_class().get(url)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['route'], 'api/public/accommodations/filter/$')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(logs.records[0].server_timing, record)
+        self.assertGreater(record['queries'], 0)
+        with self.assertNoLogs('core.timing', 'INFO'):
+            self.client.get(url)
+
+    def test_disabled_middleware_not_used(self):
+        """PU029-4: Desactivado no hay header ni se instala el contador de consultas."""
+        from django.core.exceptions import MiddlewareNotUsed
+        from django.db import connection
+        from core.middleware import ServerTimingMiddleware
+        from core.timing import _timed_execute, disable_query_timing
+        disable_query_timing()
+        with self.settings(SERVER_TIMING_ENABLED=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                ServerTimingMiddleware(lambda request: None)
+            resp = self.client_class().get(reverse('public-accommodations-filter-accommodations'))
+        self.assertNotIn('Server-Timing', resp)
+        self.assertNotIn(_timed_execute, connection.execute_wrappers)
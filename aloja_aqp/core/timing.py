@@ -0,0 +1,154 @@
+"""
+Where the time of a request goes: queries, database time, outgoing HTTP time
+(Mapbox, Nominatim, RENIEC, Cloudinary) and serialization time.
+
+With ``SERVER_TIMING_ENABLED`` the ServerTimingMiddleware (core.middleware)
+puts a :class:`RequestTimings` in a context variable for each request, so it
+follows the request into ``sync_to_async`` threads. Queries are counted by a
+database execute wrapper; outgoing calls and serialization are the code run
+inside ``timed('http', '<service>')`` / ``timed('serialize')`` blocks. The
+totals go out as a ``Server-Timing`` header and, for a sample of the requests
+(``SERVER_TIMING_LOG_SAMPLE_RATE``), as one JSON line on this module's logger.
+
+Disabled, the middleware removes itself, the wrapper is never installed and
+``timed`` is a context-variable lookup. Metrics can overlap: queries run
+while serializing count as both ``db`` and ``serialize``.
+"""
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.renderers import JSONRenderer
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Totals of one request, in seconds."""
+    __slots__ = ('started', 'queries', 'db', 'http', 'http_calls', 'serialize')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.http = 0.0
+        self.http_calls = {}  # service -> calls
+        self.serialize = 0.0
+
+    def add(self, metric, seconds, label=None):
+        if metric == 'http':
+            self.http += seconds
+            self.http_calls[label] = self.http_calls.get(label, 0) + 1
+        elif metric == 'serialize':
+            self.serialize += seconds
+        else:
+            raise ValueError(f'Unknown timing metric {metric!r}')
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def header(self, total):
+        calls = ', '.join(f'{service} x{n}' for service, n in sorted(self.http_calls.items()))
+        return ', '.join([
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"',
+            f'http;dur={self.http * 1000:.1f};desc="{calls or "no calls"}"',
+            f'serialize;dur={self.serialize * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+    def as_dict(self, total):
+        return {
+            'total_ms': round(total * 1000, 1),
+            'queries': self.queries,
+            'db_ms': round(self.db * 1000, 1),
+            'http_ms': round(self.http * 1000, 1),
+            'http_calls': dict(self.http_calls),
+            'serialize_ms': round(self.serialize * 1000, 1),
+        }
+
+
+def start_request():
+    """Start the timings of a request; returns the token for ``end_request``."""
+    return _current.set(RequestTimings())
+
+
+def end_request(token):
+    timings = _current.get()
+    _current.reset(token)
+    return timings
+
+
+@contextmanager
+def timed(metric, label=None):
+    """Add the time spent in the block to ``metric`` (``'http'`` with the service name, or ``'serialize'``)."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(metric, time.perf_counter() - started, label)
+
+
+def _timed_execute(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.db += time.perf_counter() - started
+
+
+def _install_query_timer(sender=None, connection=None, **kwargs):
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _timed_execute)
+
+
+def enable_query_timing():
+    """Time the queries of every connection: the ones open in this thread and all opened from now on."""
+    connection_created.connect(_install_query_timer, dispatch_uid='core.timing.query_timer')
+    for connection in connections.all(initialized_only=True):
+        _install_query_timer(connection=connection)
+
+
+def disable_query_timing():
+    """Undo ``enable_query_timing`` for new connections and the ones open in this thread."""
+    connection_created.disconnect(dispatch_uid='core.timing.query_timer')
+    for connection in connections.all(initialized_only=True):
+        if _timed_execute in connection.execute_wrappers:
+            connection.execute_wrappers.remove(_timed_execute)
+
+
+def log_sampled(request, response, timings, total, rate):
+    """Log the timings of the request as a JSON line for a ``rate`` (0..1) fraction of the calls."""
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return
+    match = getattr(request, 'resolver_match', None)
+    record = {
+        'method': request.method,
+        'path': request.path,
+        'route': match.route if match else None,
+        'status': response.status_code,
+        **timings.as_dict(total),
+    }
+    logger.info(json.dumps(record, separators=(',', ':')), extra={'server_timing': record})
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """DRF's JSONRenderer with the encoding counted as serialization time."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('serialize'):
+            return super().render(data, accepted_media_type, renderer_context)
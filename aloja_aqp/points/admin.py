@@ -10,4 +10,5 @@ class PointTypeAdmin(admin.ModelAdmin):
 class PointOfInterestAdmin(admin.ModelAdmin):
     list_display = ('name', 'type', 'address', 'latitude', 'longitude')
     list_filter = ('type',)
+    list_select_related = ('type',)
     search_fields = ('name', 'address', 'type__name')
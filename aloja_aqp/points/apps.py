@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class PointsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "points"
+
+    def ready(self):
+        # Registra los handlers que invalidan el índice espacial de puntos de interés
+        from . import signals  # noqa: F401
+        from core.invalidation import subscribe
+        from .spatial import POI_INDEX_TOPIC, invalidate_poi_index
+
+        subscribe(POI_INDEX_TOPIC, lambda payload: invalidate_poi_index())
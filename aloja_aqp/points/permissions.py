@@ -7,4 +7,4 @@ class IsAdminOrOwnerOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return request.user and (request.user.is_staff or hasattr(request.user, 'owner_profile'))
\ No newline at end of file
+        return request.user and (request.user.is_staff or getattr(request.user, 'owner_profile_id', None) is not None)
\ No newline at end of file
@@ -0,0 +1,25 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.invalidation import publish
+
+from .models import PointOfInterest, PointType
+from .spatial import POI_INDEX_TOPIC, invalidate_poi_index
+
+
+@receiver(post_save, sender=PointOfInterest)
+@receiver(post_delete, sender=PointOfInterest)
+@receiver(post_save, sender=PointType)
+@receiver(post_delete, sender=PointType)
+def rebuild_poi_index(sender, **kwargs):
+    """Drop the in-memory POI index so the next query rebuilds it with the change.
+
+    It is dropped again after commit, in case another thread rebuilt it from
+    the old data in between, and the other workers are told to drop theirs.
+    QuerySet.update()/bulk_create() do not send these signals; call
+    invalidate_poi_index() and publish(POI_INDEX_TOPIC) after using them.
+    """
+    invalidate_poi_index()
+    transaction.on_commit(invalidate_poi_index)
+    publish(POI_INDEX_TOPIC)
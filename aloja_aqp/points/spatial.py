@@ -0,0 +1,175 @@
+"""
+In-memory spatial index over PointOfInterest coordinates.
+
+Points are bucketed by PointType and, inside each bucket, by square grid cells
+of ``cell_km``. Batch k-nearest queries only measure the points in the 3x3
+cells around each query point and are answered one occupied cell at a time
+with a single NumPy distance matrix, so a whole catalogue is matched against
+thousands of POIs in seconds. Single-point queries (the ``nearest`` endpoint)
+scan the type bucket with one vectorized haversine instead.
+"""
+import math
+import threading
+
+import numpy as np
+
+from accommodations.utils.geo import haversine_km_pairs
+
+KM_PER_DEGREE = 111.32
+
+
+class _Bucket:
+    def __init__(self, ids, lats, lons, cell_km, ref_lat):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self.cell_lat = cell_km / KM_PER_DEGREE
+        self.cell_lon = self.cell_lat / max(math.cos(math.radians(ref_lat)), 0.01)
+        ci = np.floor(self.lats / self.cell_lat).astype(np.int64)
+        cj = np.floor(self.lons / self.cell_lon).astype(np.int64)
+        self.cells = {}
+        order = np.lexsort((cj, ci))
+        if len(order):
+            keys = np.stack([ci[order], cj[order]], axis=1)
+            starts = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+            for chunk in np.split(order, starts):
+                self.cells[(int(ci[chunk[0]]), int(cj[chunk[0]]))] = chunk
+
+    def cell_of(self, lats, lons):
+        return (
+            np.floor(np.asarray(lats, dtype=float) / self.cell_lat).astype(np.int64),
+            np.floor(np.asarray(lons, dtype=float) / self.cell_lon).astype(np.int64),
+        )
+
+    def candidates(self, i, j):
+        parts = [self.cells[(i + di, j + dj)] for di in (-1, 0, 1) for dj in (-1, 0, 1) if (i + di, j + dj) in self.cells]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+
+class POIIndex:
+    """k-nearest points of interest per type within ``cell_km``.
+
+    ``rows`` is an iterable of ``(poi_id, type_id, lat, lon)``; points without
+    coordinates must be filtered out beforehand. Batch results never include
+    points farther than ``cell_km`` (the grid only looks at neighbouring cells).
+    """
+
+    def __init__(self, rows, cell_km=1.5, type_names=None):
+        self.cell_km = cell_km
+        # lower-cased PointType name -> id, so callers can ask for "farmacia"
+        self.type_names = {name.lower(): type_id for type_id, name in (type_names or {}).items()}
+        by_type = {}
+        for poi_id, type_id, lat, lon in rows:
+            by_type.setdefault(type_id, []).append((poi_id, float(lat), float(lon)))
+        self.size = sum(len(points) for points in by_type.values())
+        self.buckets = {}
+        for type_id, points in by_type.items():
+            ids, lats, lons = zip(*points)
+            self.buckets[type_id] = _Bucket(ids, lats, lons, cell_km, ref_lat=float(np.mean(lats)))
+
+    @property
+    def type_ids(self):
+        return list(self.buckets)
+
+    def resolve_type(self, value):
+        """PointType id for an id or a (case-insensitive) name; None if unknown."""
+        if value is None:
+            return None
+        try:
+            type_id = int(value)
+        except (TypeError, ValueError):
+            return self.type_names.get(str(value).strip().lower())
+        return type_id if type_id in self.buckets else None
+
+    def nearest(self, lat, lon, k=5, type_id=None, max_km=None):
+        """``[(poi_id, type_id, distance_km), ...]`` sorted by distance, for a single point.
+
+        Unlike the batch query this is not limited to the grid neighbourhood:
+        every point of the bucket is measured with one vectorized haversine.
+        With ``type_id=None`` all types are searched.
+        """
+        type_ids = [type_id] if type_id is not None else self.type_ids
+        found = []
+        for t in type_ids:
+            bucket = self.buckets.get(t)
+            if bucket is None or not len(bucket.ids):
+                continue
+            dist = haversine_km_pairs(float(lat), float(lon), bucket.lats, bucket.lons)
+            top = np.argpartition(dist, k - 1)[:k] if k < len(dist) else np.arange(len(dist))
+            for i in top:
+                if max_km is None or dist[i] <= max_km:
+                    found.append((int(bucket.ids[i]), t, float(dist[i])))
+        found.sort(key=lambda r: r[2])
+        return found[:k]
+
+    def nearest_many(self, lats, lons, k=5, type_id=None, max_km=None):
+        """Batch query for one type: a list (aligned with ``lats``) of ``[(poi_id, distance_km), ...]``."""
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        results = [[] for _ in range(len(lats))]
+        bucket = self.buckets.get(type_id)
+        if bucket is None or not len(lats):
+            return results
+        max_km = min(max_km or self.cell_km, self.cell_km)
+
+        ci, cj = bucket.cell_of(lats, lons)
+        groups = {}
+        for q, key in enumerate(zip(ci.tolist(), cj.tolist())):
+            groups.setdefault(key, []).append(q)
+
+        for (i, j), queries in groups.items():
+            cand = bucket.candidates(i, j)
+            if not len(cand):
+                continue
+            q = np.asarray(queries)
+            dist = haversine_km_pairs(lats[q, None], lons[q, None], bucket.lats[None, cand], bucket.lons[None, cand])
+            kk = min(k, len(cand))
+            top = np.argpartition(dist, kk - 1, axis=1)[:, :kk] if kk < len(cand) else np.tile(np.arange(len(cand)), (len(q), 1))
+            top_dist = np.take_along_axis(dist, top, axis=1)
+            order = np.argsort(top_dist, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_dist = np.take_along_axis(top_dist, order, axis=1)
+            poi_ids = bucket.ids[cand][top]
+            for row, query in enumerate(queries):
+                keep = top_dist[row] <= max_km
+                results[query] = list(zip(poi_ids[row][keep].tolist(), top_dist[row][keep].tolist()))
+        return results
+
+
+# Invalidation bus topic (core.invalidation) for the POI index
+POI_INDEX_TOPIC = 'poi_index'
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def build_poi_index(cell_km=None):
+    """Build a :class:`POIIndex` from the database."""
+    from django.conf import settings
+    from .models import PointOfInterest, PointType
+
+    rows = PointOfInterest.objects.filter(
+        latitude__isnull=False, longitude__isnull=False
+    ).values_list('id', 'type_id', 'latitude', 'longitude')
+    return POIIndex(
+        rows,
+        cell_km=cell_km or getattr(settings, 'NEARBY_PLACES_MAX_KM', 1.5),
+        type_names=dict(PointType.objects.values_list('id', 'name')),
+    )
+
+
+def get_poi_index():
+    """Process-wide index, built on first use and dropped by the POI signals (points.signals)."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = build_poi_index()
+    return _index
+
+
+def invalidate_poi_index():
+    """Drop the process-wide index; the next :func:`get_poi_index` rebuilds it."""
+    global _index
+    with _index_lock:
+        _index = None
@@ -1,3 +1,71 @@
-from django.test import TestCase
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.urls import reverse
 
-# Create your tests here.
+from .models import PointOfInterest, PointType
+from .spatial import get_poi_index, invalidate_poi_index
+
+
+class NearestPointsTests(APITestCase):
+    """
+    PU015: PUNTOS DE INTERÉS MÁS CERCANOS
+    -------------------------------------------------------------------
+    Objetivo: Responder /points-of-interest/nearest/ desde el índice en
+    memoria y reconstruirlo cuando se guarda o elimina un punto de interés.
+    """
+
+    def setUp(self):
+        invalidate_poi_index()
+        self.url = reverse('pointofinterest-nearest')
+        self.market = PointType.objects.create(name='Mercado')
+        self.pharmacy = PointType.objects.create(name='Farmacia')
+        # Mercados a ~110 m, ~330 m y ~5 km; una farmacia a ~220 m
+        self.m1, self.m2, self.m_far = [
+            PointOfInterest.objects.create(name=f'Mercado {i}', type=self.market, latitude=lat, longitude='-71.5300')
+            for i, lat in enumerate(['-16.4060', '-16.4080', '-16.4500'])
+        ]
+        self.ph = PointOfInterest.objects.create(name='Botica', type=self.pharmacy, latitude='-16.4050', longitude='-71.5280')
+
+    def tearDown(self):
+        invalidate_poi_index()
+
+    def _get(self, **params):
+        return self.client.get(self.url, {'lat': '-16.4050', 'lon': '-71.5300', **params})
+
+    def test_nearest_by_type_name_and_id(self):
+        """PU015-1: Filtra por nombre o id de tipo y ordena por distancia."""
+        resp = self._get(type='mercado', k=2)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in resp.data], [self.m1.id, self.m2.id])
+        self.assertAlmostEqual(resp.data[0]['distance_km'], 0.111, places=2)
+        self.assertEqual(resp.data[0]['type_name'], 'Mercado')
+
+        resp = self._get(type=self.pharmacy.id)
+        self.assertEqual([p['id'] for p in resp.data], [self.ph.id])
+
+    def test_nearest_all_types_and_max_km(self):
+        """PU015-2: Sin tipo busca en todos; max_km descarta los lejanos."""
+        resp = self._get(k=10, max_km=1)
+        self.assertEqual([p['id'] for p in resp.data], [self.m1.id, self.ph.id, self.m2.id])
+        self.assertEqual(self._get(type='hospital').data, [])
+
+    def test_invalid_coordinates(self):
+        """PU015-3: lat/lon ausentes o no numéricos devuelven 400."""
+        self.assertEqual(self.client.get(self.url, {'lat': '-16.4'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._get(lon='abc').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_rebuilt_on_save_and_delete(self):
+        """PU015-4: Crear, mover o eliminar un punto invalida el índice."""
+        before = get_poi_index()
+        self.assertEqual(before.size, 4)
+
+        new = PointOfInterest.objects.create(name='Mercado nuevo', type=self.market, latitude='-16.4051', longitude='-71.5300')
+        self.assertIsNot(get_poi_index(), before)
+        self.assertEqual(self._get(type='Mercado', k=1).data[0]['id'], new.id)
+
+        new.latitude = '-16.5000'
+        new.save()
+        self.assertEqual(self._get(type='Mercado', k=1).data[0]['id'], self.m1.id)
+
+        self.m1.delete()
+        self.assertEqual(self._get(type='Mercado', k=1).data[0]['id'], self.m2.id)
@@ -1,13 +1,56 @@
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from .models import PointType, PointOfInterest
 from .serializers import PointTypeSerializer, PointOfInterestSerializer
 from .permissions import IsAdminOrOwnerOrReadOnly
+from .spatial import get_poi_index
+
+NEAREST_MAX_K = 50
 
 class PointTypeViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = PointType.objects.all()
     serializer_class = PointTypeSerializer
+    replica_reads = True
 
 class PointOfInterestViewSet(viewsets.ModelViewSet):
     queryset = PointOfInterest.objects.all()
     serializer_class = PointOfInterestSerializer
-    permission_classes = [IsAdminOrOwnerOrReadOnly]
\ No newline at end of file
+    permission_classes = [IsAdminOrOwnerOrReadOnly]
+
+    @action(detail=False, methods=['get'], url_path='nearest')
+    def nearest(self, request):
+        """k puntos de interés más cercanos a ?lat=&lon=, opcionalmente de un tipo (?type=id|nombre).
+
+        Se responde desde el índice en memoria (points.spatial); solo los k resultados se leen de la BD.
+        """
+        try:
+            lat = float(request.query_params['lat'])
+            lon = float(request.query_params['lon'])
+            k = min(int(request.query_params.get('k', 5)), NEAREST_MAX_K)
+            max_km = request.query_params.get('max_km')
+            max_km = float(max_km) if max_km else None
+        except (KeyError, ValueError):
+            return Response({'error': 'lat and lon are required numbers; k and max_km must be numeric'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if k < 1:
+            return Response([])
+
+        index = get_poi_index()
+        type_param = request.query_params.get('type')
+        type_id = index.resolve_type(type_param)
+        if type_param and type_id is None:
+            return Response([])
+
+        found = index.nearest(lat, lon, k=k, type_id=type_id, max_km=max_km)
+        points = PointOfInterest.objects.select_related('type').in_bulk([poi_id for poi_id, _, _ in found])
+        results = []
+        for poi_id, _, distance_km in found:
+            poi = points.get(poi_id)
+            if poi is None:
+                continue  # borrado desde que se construyó el índice
+            data = self.get_serializer(poi).data
+            data['type_name'] = poi.type.name if poi.type else None
+            data['distance_km'] = round(distance_km, 3)
+            results.append(data)
+        return Response(results)
@@ -8,7 +8,8 @@ class UniversityCampusAdmin(admin.ModelAdmin):
         # Solo recalcula si se modificó latitud o longitud
         if 'latitude' in form.changed_data or 'longitude' in form.changed_data:
             recalculate_accommodations_for_campus(obj.id)
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.urls import reverse
 from .models import University, StudentUniversity, UniversityCampus
 from django.utils.html import format_html
 
@@ -30,6 +31,8 @@ class StudentUniversityAdmin(admin.ModelAdmin):
     list_display = ('student', 'get_university', 'get_campus')
     search_fields = ('student__user__email', 'campus__name', 'campus__university__name', 'campus__university__abbreviation')
     list_filter = ('campus__university',)
+    list_select_related = ('student__user', 'student__status', 'campus__university')
+    autocomplete_fields = ('student', 'campus')
 
     def get_university(self, obj):
         return obj.campus.university.name
@@ -44,7 +47,29 @@ class UniversityCampusAdmin(admin.ModelAdmin):
     list_display = ('id','name', 'university', 'address', 'latitude', 'longitude')
     search_fields = ('name', 'university__name', 'address')
     list_filter = ('university',)
+    list_select_related = ('university',)
+    readonly_fields = ('distance_job_progress',)
+
     def save_model(self, request, obj, form, change):
+        coordenadas_cambiaron = obj.has_changed('latitude', 'longitude')
         super().save_model(request, obj, form, change)
-        if 'latitude' in form.changed_data or 'longitude' in form.changed_data:
-            recalculate_accommodations_for_campus(obj.id)
+        if coordenadas_cambiaron:
+            # Se ejecuta en segundo plano; el progreso se ve en "distance job progress"
+            job = recalculate_accommodations_for_campus(obj.id)
+            if job:
+                self.message_user(
+                    request,
+                    f"Recalculando distancias de {job.total} alojamientos en segundo plano (job #{job.id}).",
+                    messages.INFO,
+                )
+
+    def distance_job_progress(self, obj):
+        job = obj.distance_jobs.first() if obj.pk else None
+        if not job:
+            return '-'
+        url = reverse('admin:accommodations_campusdistancejob_change', args=[job.id])
+        return format_html(
+            '<a href="{}">#{}</a> {} - {}/{} ({}%), {} errores',
+            url, job.id, job.get_status_display(), job.processed, job.total, job.progress_percent, job.errors,
+        )
+    distance_job_progress.short_description = 'Distance job progress'
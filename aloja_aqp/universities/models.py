@@ -1,5 +1,6 @@
 from django.db import models
 from cloudinary.models import CloudinaryField
+from core.models import DirtyFieldsMixin
 
 
 class University(models.Model):
@@ -15,7 +16,7 @@ class University(models.Model):
         return self.abbreviation
 
 
-class UniversityCampus(models.Model):
+class UniversityCampus(DirtyFieldsMixin, models.Model):
     university = models.ForeignKey(University, on_delete=models.CASCADE, related_name="campuses")
     name = models.CharField(max_length=100)  
     address = models.CharField(max_length=255, blank=True, null=True)
@@ -4,10 +4,12 @@ from .serializers import UniversityCampusSimpleSerializer, UniversitySerializer
 
 
 class UniversityViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = University.objects.all()
+    queryset = University.objects.prefetch_related('campuses')
     serializer_class = UniversitySerializer
+    replica_reads = True
 
 # Create your views here.
 class UniversityCampusViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = UniversityCampus.objects.all()
-    serializer_class = UniversityCampusSimpleSerializer
\ No newline at end of file
+    serializer_class = UniversityCampusSimpleSerializer
+    replica_reads = True
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from core.background import run_in_background
 from .models import User, UserStatus, OwnerProfile, StudentProfile
+from .tasks import verify_owner_profile
 
 class OwnerProfileInline(admin.StackedInline):
     model = OwnerProfile
@@ -35,6 +37,9 @@ class UserAdmin(BaseUserAdmin):
         ),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('groups')
+
     def get_groups(self, obj):
         return ", ".join([group.name for group in obj.groups.all()])
     get_groups.short_description = 'Grupos'
@@ -46,9 +51,18 @@ class UserStatusAdmin(admin.ModelAdmin):
 
 @admin.register(OwnerProfile)
 class OwnerProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'dni', 'phone_number', 'verified', 'status')
-    list_filter = ('verified', 'status')
+    list_display = ('user', 'dni', 'phone_number', 'verified', 'verification_status', 'status')
+    list_filter = ('verified', 'verification_status', 'status')
     search_fields = ('user__email', 'dni', 'phone_number')
+    list_select_related = ('user', 'status')
+    actions = ['retry_dni_verification']
+
+    @admin.action(description='Reintentar verificación RENIEC de los pendientes')
+    def retry_dni_verification(self, request, queryset):
+        pending = list(queryset.filter(verification_status=OwnerProfile.VERIFICATION_PENDING).values_list('id', flat=True))
+        for profile_id in pending:
+            run_in_background(verify_owner_profile, profile_id)
+        self.message_user(request, f'{len(pending)} perfiles encolados para verificación.')
 
 @admin.register(StudentProfile)
 class StudentProfileAdmin(admin.ModelAdmin):
@@ -63,4 +77,5 @@ class StudentProfileAdmin(admin.ModelAdmin):
         'status',
     )
     list_filter = ('status',)
+    list_select_related = ('user', 'campus', 'status')
     search_fields = ('user__email', 'phone_number')
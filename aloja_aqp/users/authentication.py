@@ -0,0 +1,209 @@
+"""
+JWT con los roles y perfiles del usuario como claims.
+
+Los access tokens llevan ``roles`` (grupos), ``owner_profile_id`` (solo con
+el perfil verificado por RENIEC), ``student_profile_id``, ``is_staff``/``is_superuser`` y ``rv`` (la versión de
+roles del usuario). ``ClaimsJWTAuthentication`` devuelve un ``ClaimsUser``
+que responde los chequeos de permisos desde esos claims y solo carga el
+``User`` real si una vista lo necesita.
+
+Cuando cambian los grupos, los perfiles o is_staff/is_active de un usuario
+(ver users.signals) se incrementa ``User.roles_version`` y los tokens con un
+``rv`` anterior se rechazan con ``token_revoked``; el cliente debe refrescar
+el token para recibir los claims nuevos. La versión vigente se lee de la caché
+(``JWT_ROLES_CACHE_SECONDS``), no de la base de datos en cada petición; los
+demás workers se enteran del cambio por el bus de invalidación (core.invalidation).
+"""
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils.functional import SimpleLazyObject
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.invalidation import publish_cache_keys
+
+from .models import OwnerProfile, StudentProfile, User
+
+ROLES_VERSION_CLAIM = 'rv'
+
+
+def _roles_cache_key(user_id):
+    return f'auth:roles_version:{user_id}'
+
+
+def role_claims(user_id):
+    """Claims de roles y perfiles vigentes para un usuario (2 consultas), o None si no existe."""
+    row = User.objects.filter(pk=user_id).values(
+        'is_staff', 'is_superuser', 'roles_version', 'owner_profile__id', 'owner_profile__verification_status',
+        'student_profile__id',
+    ).first()
+    if row is None:
+        return None
+    return {
+        'roles': sorted(Group.objects.filter(user__id=user_id).values_list('name', flat=True)),
+        # Un propietario pendiente o rechazado no puede crear ni editar alojamientos
+        'owner_profile_id': (
+            row['owner_profile__id']
+            if row['owner_profile__verification_status'] == OwnerProfile.VERIFICATION_VERIFIED else None
+        ),
+        'student_profile_id': row['student_profile__id'],
+        'is_staff': row['is_staff'],
+        'is_superuser': row['is_superuser'],
+        ROLES_VERSION_CLAIM: row['roles_version'],
+    }
+
+
+def current_roles_state(user_id):
+    """``(roles_version, is_active)`` del usuario desde la caché, o None si no existe."""
+    key = _roles_cache_key(user_id)
+    state = cache.get(key)
+    if state is None:
+        row = User.objects.filter(pk=user_id).values_list('roles_version', 'is_active').first()
+        if row is None:
+            return None
+        state = tuple(row)
+        cache.set(key, state, getattr(settings, 'JWT_ROLES_CACHE_SECONDS', 300))
+    return state
+
+
+def bump_roles_version(user_id):
+    """Invalida los access tokens emitidos hasta ahora para el usuario."""
+    User.objects.filter(pk=user_id).update(roles_version=F('roles_version') + 1)
+    key = _roles_cache_key(user_id)
+    cache.delete(key)
+    # Otro hilo pudo volver a leer la versión vieja antes del commit
+    transaction.on_commit(lambda: cache.delete(key))
+    # Los demás workers borran su copia (caché en memoria por proceso)
+    publish_cache_keys([key])
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """RefreshToken cuyos access tokens llevan los claims de roles leídos al emitirlos."""
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        claims = role_claims(self[api_settings.USER_ID_CLAIM])
+        if claims is not None:
+            for claim, value in claims.items():
+                access[claim] = value
+        return access
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsUser(SimpleLazyObject):
+    """
+    Usuario autenticado servido desde los claims del token.
+
+    ``id``, ``is_staff``, ``owner_profile_id``, ``student_profile_id``,
+    ``role_names`` y ``hasattr(user, 'owner_profile')`` no consultan la base de
+    datos; cualquier otro atributo carga el ``User`` real (una vez) y se delega.
+    """
+
+    def __init__(self, token):
+        # simplejwt guarda el id como texto en el token
+        user_id = User._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])
+        super().__init__(lambda: User.objects.get(pk=user_id))
+        # LazyObject reenvía los setattr al objeto real; guardamos directo en __dict__
+        self.__dict__['token'] = token
+        self.__dict__['_user_id'] = user_id
+        self.__dict__['_profiles'] = {}
+
+    def __bool__(self):
+        return True
+
+    def __getattr__(self, name):
+        # RelatedObjectDoesNotExist es un AttributeError: sin esto Python caería
+        # aquí y cargaría el User real solo para volver a fallar.
+        if name in ('owner_profile', 'student_profile'):
+            raise getattr(User, name).RelatedObjectDoesNotExist(f'User has no {name}.')
+        return super().__getattr__(name)
+
+    @property
+    def id(self):
+        return self._user_id
+
+    pk = id
+
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
+    @property
+    def is_active(self):
+        return True  # los usuarios inactivos no pasan la autenticación
+
+    @property
+    def is_staff(self):
+        return self.token.get('is_staff', False)
+
+    @property
+    def is_superuser(self):
+        return self.token.get('is_superuser', False)
+
+    @property
+    def role_names(self):
+        return list(self.token.get('roles', []))
+
+    def has_role(self, role_name):
+        return role_name in self.token.get('roles', [])
+
+    @property
+    def owner_profile_id(self):
+        return self.token.get('owner_profile_id')
+
+    @property
+    def student_profile_id(self):
+        return self.token.get('student_profile_id')
+
+    def _profile(self, name, model):
+        profile_id = self.token.get(f'{name}_id')
+        if profile_id is None:
+            raise getattr(User, name).RelatedObjectDoesNotExist(f'User has no {name}.')
+        if name not in self._profiles:
+            self._profiles[name] = model.objects.get(pk=profile_id)
+        return self._profiles[name]
+
+    @property
+    def owner_profile(self):
+        return self._profile('owner_profile', OwnerProfile)
+
+    @property
+    def student_profile(self):
+        return self._profile('student_profile', StudentProfile)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication sin SELECT del usuario: valida la versión de roles y devuelve un ClaimsUser."""
+
+    def get_user(self, validated_token):
+        if ROLES_VERSION_CLAIM not in validated_token:
+            # Tokens emitidos antes de los claims de roles
+            return super().get_user(validated_token)
+
+        state = current_roles_state(validated_token[api_settings.USER_ID_CLAIM])
+        if state is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        roles_version, is_active = state
+        if not is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if validated_token[ROLES_VERSION_CLAIM] != roles_version:
+            raise AuthenticationFailed('Los roles del usuario cambiaron; refresca el token.', code='token_revoked')
+        return ClaimsUser(validated_token)
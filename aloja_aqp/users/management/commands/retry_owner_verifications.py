@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from users.models import OwnerProfile
+from users.tasks import expire_stale_pending_profiles, verify_owner_profile
+
+
+class Command(BaseCommand):
+    help = (
+        'Retry the RENIEC check of owner profiles left pending (e.g. decolecta was down), and reject the '
+        'ones pending longer than OWNER_VERIFICATION_TIMEOUT_HOURS so they free their DNI. Meant for cron.'
+    )
+
+    def handle(self, *args, **options):
+        expired = expire_stale_pending_profiles()
+        pending = OwnerProfile.objects.filter(
+            verification_status=OwnerProfile.VERIFICATION_PENDING,
+        ).order_by('created_at').values_list('id', flat=True)
+
+        results = {}
+        for profile_id in pending:
+            # None: RENIEC still unavailable (or someone else verified it meanwhile)
+            result = verify_owner_profile(profile_id) or 'still pending'
+            results[result] = results.get(result, 0) + 1
+
+        summary = ', '.join(f'{n} {result}' for result, n in sorted(results.items())) or 'nothing pending'
+        self.stdout.write(self.style.SUCCESS(f'Done. {expired} expired; {summary}.'))
@@ -0,0 +1,35 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_verified_owners(apps, schema_editor):
+    OwnerProfile = apps.get_model('users', 'OwnerProfile')
+    OwnerProfile.objects.filter(verified=True).update(verification_status='verified')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ownerprofile',
+            name='verification_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('verified', 'Verified'), ('rejected', 'Rejected')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(mark_verified_owners, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='DniLookup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dni', models.CharField(max_length=20, unique=True)),
+                ('found', models.BooleanField(default=True)),
+                ('first_name', models.CharField(blank=True, max_length=100)),
+                ('last_name_1', models.CharField(blank=True, max_length=100)),
+                ('last_name_2', models.CharField(blank=True, max_length=100)),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
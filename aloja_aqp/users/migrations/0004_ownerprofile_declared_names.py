@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+def copy_pending_names(apps, schema_editor):
+    # Pending profiles were registered with the typed names saved on the user
+    OwnerProfile = apps.get_model('users', 'OwnerProfile')
+    for profile in OwnerProfile.objects.filter(verification_status='pending').select_related('user'):
+        profile.declared_first_name = profile.user.first_name
+        profile.declared_last_name = profile.user.last_name
+        profile.save(update_fields=['declared_first_name', 'declared_last_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_roles_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ownerprofile',
+            name='declared_first_name',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='ownerprofile',
+            name='declared_last_name',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.RunPython(copy_pending_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_ownerprofile_declared_names'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ownerprofile',
+            name='dni',
+            field=models.CharField(db_index=True, max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='ownerprofile',
+            constraint=models.UniqueConstraint(condition=models.Q(('verification_status', 'rejected'), _negated=True), fields=('dni',), name='owner_dni_unique_unless_rejected'),
+        ),
+    ]
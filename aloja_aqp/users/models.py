@@ -6,6 +6,7 @@ from django.conf import settings
 from django.utils import timezone
 from universities.models import University
 from cloudinary.models import CloudinaryField
+from core.models import DirtyFieldsMixin
 
 from django.db import models
 
@@ -31,7 +32,7 @@ class CustomUserManager(BaseUserManager):
         extra_fields.setdefault('is_superuser', True)
         return self.create_user(email, password, **extra_fields)
 
-class User(AbstractBaseUser, PermissionsMixin):
+class User(DirtyFieldsMixin, AbstractBaseUser, PermissionsMixin):
 
     email = models.EmailField(unique=True)
     google_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
@@ -41,6 +42,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     date_joined = models.DateTimeField(default=timezone.now)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Se incrementa cuando cambian grupos/perfiles/is_staff; invalida los JWT con otro "rv" (users.authentication)
+    roles_version = models.PositiveIntegerField(default=0)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -57,21 +60,60 @@ class User(AbstractBaseUser, PermissionsMixin):
         """Verifica si el usuario tiene un rol específico"""
         return self.roles.filter(name=role_name).exists()
 
-class OwnerProfile(models.Model):
+    # Mismos atributos que users.authentication.ClaimsUser, para que vistas y permisos
+    # funcionen igual con el usuario del token o con un User cargado (admin, tests).
+    # Un perfil de propietario pendiente o rechazado por RENIEC todavía no cuenta
+    @property
+    def owner_profile_id(self):
+        profile = getattr(self, 'owner_profile', None)
+        return profile.id if profile and profile.is_verified else None
+
+    @property
+    def student_profile_id(self):
+        profile = getattr(self, 'student_profile', None)
+        return profile.id if profile else None
+
+class OwnerProfile(DirtyFieldsMixin, models.Model):
+    VERIFICATION_PENDING = 'pending'
+    VERIFICATION_VERIFIED = 'verified'
+    VERIFICATION_REJECTED = 'rejected'
+    VERIFICATION_CHOICES = [
+        (VERIFICATION_PENDING, 'Pending'),
+        (VERIFICATION_VERIFIED, 'Verified'),
+        (VERIFICATION_REJECTED, 'Rejected'),
+    ]
+
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='owner_profile')
     phone_number = models.CharField(max_length=20, blank=True)
-    dni = models.CharField(max_length=20, unique=True)
+    # Unique among profiles that are not rejected: a rejected attempt does not keep the DNI
+    dni = models.CharField(max_length=20, db_index=True)
     contact_address = models.CharField(max_length=255, blank=True)
     verification_date = models.DateTimeField(null=True, blank=True)
     verified = models.BooleanField(default=False)
+    # RENIEC check of dni + names, done in background (users.tasks.verify_owner_profile)
+    verification_status = models.CharField(max_length=10, choices=VERIFICATION_CHOICES, default=VERIFICATION_PENDING)
+    # Names typed at registration; the user's own names change only once RENIEC confirms them
+    declared_first_name = models.CharField(max_length=50, blank=True)
+    declared_last_name = models.CharField(max_length=50, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     status = models.ForeignKey('UserStatus', on_delete=models.SET_NULL, null=True, default=None)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dni'], condition=~models.Q(verification_status='rejected'), name='owner_dni_unique_unless_rejected',
+            ),
+        ]
+
+    @property
+    def is_verified(self):
+        return self.verification_status == self.VERIFICATION_VERIFIED
+
     def __str__(self):
         return f"{self.user.email} - {self.status}"
 
-class StudentProfile(models.Model):
+class StudentProfile(DirtyFieldsMixin, models.Model):
     GENDER_CHOICES = [
         ('M', 'Male'),
         ('F', 'Female'),
@@ -91,4 +133,17 @@ class StudentProfile(models.Model):
     status = models.ForeignKey('UserStatus', on_delete=models.SET_NULL, null=True, default=None)
 
     def __str__(self):
-        return f"{self.user.email} - {self.status or 'No status'}"
\ No newline at end of file
+        return f"{self.user.email} - {self.status or 'No status'}"
+
+
+class DniLookup(models.Model):
+    """RENIEC (decolecta) answer for a DNI, reused until it expires (see utils.api_reniec.lookup_dni)."""
+    dni = models.CharField(max_length=20, unique=True)
+    found = models.BooleanField(default=True)
+    first_name = models.CharField(max_length=100, blank=True)
+    last_name_1 = models.CharField(max_length=100, blank=True)
+    last_name_2 = models.CharField(max_length=100, blank=True)
+    fetched_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.dni} ({'found' if self.found else 'not found'})"
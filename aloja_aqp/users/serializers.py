@@ -6,7 +6,11 @@ from universities.models import StudentUniversity, UniversityCampus
 from django.contrib.auth.models import Group
 from django.contrib.auth import authenticate
 from django.contrib.auth import password_validation
-from .utils.api_reniec import verificar_dni, normalize_name
+from .utils.api_reniec import cached_dni_lookup
+from django.db import IntegrityError, transaction
+from .tasks import apply_dni_lookup, expire_stale_pending_profiles, names_match, verify_owner_profile
+from core.background import run_in_background
+from core.reference import reference_table
 from cloudinary.utils import cloudinary_url
 
 
@@ -48,17 +52,14 @@ class StudentRegistrationSerializer(serializers.ModelSerializer):
             last_name=validated_data.get('last_name', '')
         )
 
-        student_group, _ = Group.objects.get_or_create(name='student')
-        user.groups.add(student_group)
-
-        active_status, _ = UserStatus.objects.get_or_create(name='active')
+        user.groups.add(reference_table(Group).get_or_create_id('student'))
 
         student_profile = StudentProfile.objects.create(
             user=user,
             phone_number=phone_number,
             career=career,
             gender=gender,
-            status=active_status
+            status_id=reference_table(UserStatus).get_or_create_id('active')
         )
 
         # Asociar sedes si se enviaron
@@ -107,54 +108,58 @@ class OwnerRegistrationSerializer(serializers.Serializer):
     phone_number = serializers.CharField(required=False, allow_blank=True, max_length=20)
     dni = serializers.CharField(required=True)
     contact_address = serializers.CharField(required=False, allow_blank=True)
-    first_name = serializers.CharField(required=True)
-    last_name = serializers.CharField(required=True)
+    first_name = serializers.CharField(required=True, max_length=50)
+    last_name = serializers.CharField(required=True, max_length=50)
 
     def validate_dni(self, value):
-        if OwnerProfile.objects.filter(dni=value).exists():
+        # Los perfiles rechazados (de cualquier usuario) no retienen el DNI, ni los pendientes vencidos
+        expire_stale_pending_profiles(dni=value)
+        taken = OwnerProfile.objects.filter(dni=value).exclude(verification_status=OwnerProfile.VERIFICATION_REJECTED)
+        if taken.exists():
             raise serializers.ValidationError("Este DNI ya está registrado.")
         return value
 
     def create(self, validated_data):
         user = self.context['request'].user
 
-        if hasattr(user, 'owner_profile'):
+        # Un perfil propio que quedó pendiente sin respuesta de RENIEC vence y permite reintentar
+        expire_stale_pending_profiles(user=user)
+        owner_profile = OwnerProfile.objects.filter(user=user).first()
+        if owner_profile and owner_profile.verification_status != OwnerProfile.VERIFICATION_REJECTED:
             raise serializers.ValidationError("El usuario ya tiene perfil de owner.")
 
-        nombres_usuario = normalize_name(validated_data['first_name'] + " " + validated_data['last_name'])
-        print("Nombre ingresado por usuario (normalizado):", nombres_usuario)
-
-        dni_data = verificar_dni(validated_data['dni'])
-        print("Datos obtenidos de RENIEC:", dni_data)
-
-
-        if not dni_data:
-            raise serializers.ValidationError("DNI no encontrado en RENIEC.")
-
-        nombres_api = normalize_name(f"{dni_data['first_name']} {dni_data['last_name_1']} {dni_data['last_name_2']}".strip())
-        print("Nombre oficial RENIEC (normalizado):", nombres_api)
-        
-        if nombres_usuario != nombres_api:
-            raise serializers.ValidationError("Los nombres proporcionados no coinciden con RENIEC.")
-
-        # Crear perfil owner
-        user.first_name = dni_data['first_name']
-        user.last_name = f"{dni_data['last_name_1']} {dni_data['last_name_2']}".strip()
-        user.save()
-
-        owner_group, _ = Group.objects.get_or_create(name='owner')
-        user.groups.add(owner_group)
+        # Los nombres ingresados quedan en el perfil; el usuario recibe los oficiales al verificarse
+        first_name, last_name = validated_data['first_name'], validated_data['last_name']
+
+        # Si RENIEC ya respondió por este DNI se valida aquí mismo; si no, en segundo plano
+        lookup = cached_dni_lookup(validated_data['dni'])
+        if lookup is not None:
+            if not lookup.found:
+                raise serializers.ValidationError("DNI no encontrado en RENIEC.")
+            if not names_match(first_name, last_name, lookup):
+                raise serializers.ValidationError("Los nombres proporcionados no coinciden con RENIEC.")
+
+        # Sin grupo 'owner' hasta que RENIEC lo verifique (users.tasks.apply_dni_lookup)
+        owner_profile = owner_profile or OwnerProfile(user=user)
+        owner_profile.declared_first_name = first_name
+        owner_profile.declared_last_name = last_name
+        owner_profile.phone_number = validated_data.get('phone_number', '')
+        owner_profile.dni = validated_data['dni']
+        owner_profile.contact_address = validated_data.get('contact_address', '')
+        owner_profile.verified = False
+        owner_profile.verification_status = OwnerProfile.VERIFICATION_PENDING
+        owner_profile.status_id = reference_table(UserStatus).get_or_create_id('active')
+        try:
+            with transaction.atomic():
+                owner_profile.save()
+        except IntegrityError:
+            # Otro registro tomó el DNI entre validate_dni y aquí (owner_dni_unique_unless_rejected)
+            raise serializers.ValidationError("Este DNI ya está registrado.")
 
-        active_status, _ = UserStatus.objects.get_or_create(name='active')
-
-        owner_profile = OwnerProfile.objects.create(
-            user=user,
-            phone_number=validated_data.get('phone_number', ''),
-            dni=validated_data['dni'],
-            contact_address=validated_data.get('contact_address', ''),
-            verified=True,
-            status=active_status
-        )
+        if lookup is not None:
+            apply_dni_lookup(owner_profile, lookup)
+        else:
+            run_in_background(verify_owner_profile, owner_profile.id)
 
         return owner_profile
     
@@ -165,46 +170,11 @@ class OwnerRegistrationSerializer(serializers.Serializer):
 from rest_framework import serializers
 from .models import User, StudentProfile, OwnerProfile
 
-class StudentProfileSerializer(serializers.ModelSerializer):
-    # Esto construye la estructura jerárquica de universidades -> sedes
-    universities = serializers.SerializerMethodField()
-
-    class Meta:
-        model = StudentProfile
-        fields = [
-            'phone_number',
-            'gender',
-            'age',
-            'career',
-            'bio',
-            'status_id',
-            'universities',  # mantiene tu estructura jerárquica
-        ]
-
-    def get_universities(self, obj):
-        # Obtenemos todas las sedes del estudiante
-        student_universities = StudentUniversity.objects.filter(student=obj)
-        
-        # Diccionario para agrupar por universidad
-        universities_dict = {}
-        for su in student_universities:
-            uni = su.campus.university
-            if uni.id not in universities_dict:
-                universities_dict[uni.id] = {
-                    'university_id': uni.id,
-                    'university_name': uni.name,
-                    'campuses': []
-                }
-            universities_dict[uni.id]['campuses'].append({
-                'campus_id': su.campus.id,
-                'campus_name': su.campus.name
-            })
-        return list(universities_dict.values())
-
 class OwnerProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = OwnerProfile
-        fields = ['phone_number', 'dni', 'contact_address', 'verified', 'status_id']
+        fields = ['phone_number', 'dni', 'contact_address', 'verified', 'verification_status', 'status_id']
+        read_only_fields = ['verification_status']
 
 class UserSerializer(serializers.ModelSerializer):
     avatar = serializers.SerializerMethodField()
@@ -252,13 +222,18 @@ class StudentProfileSerializer(serializers.ModelSerializer):
 
     def get_campuses(self, obj):
         # Obtenemos todos los campus asociados a este estudiante
+        # (ya vienen cargados si el usuario salió de load_user_for_response)
+        if 'studentuniversity_set' in getattr(obj, '_prefetched_objects_cache', {}):
+            student_universities = obj.studentuniversity_set.all()
+        else:
+            student_universities = StudentUniversity.objects.filter(student=obj).select_related('campus__university')
         return [
             {
                 "id": su.campus.id,
                 "name": su.campus.name,
                 "university": su.campus.university.name if su.campus.university else None
             }
-            for su in StudentUniversity.objects.filter(student=obj)
+            for su in student_universities
         ]
 
 class UserResponseSerializer(serializers.ModelSerializer):
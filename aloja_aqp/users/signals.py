@@ -0,0 +1,74 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from universities.models import StudentUniversity, University, UniversityCampus
+
+from .authentication import bump_roles_version
+from .models import OwnerProfile, StudentProfile, User
+from .utils.profile_cache import invalidate_user_profile
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Al agregar o quitar grupos se revocan los tokens con los roles anteriores."""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            bump_roles_version(instance.pk)
+            invalidate_user_profile(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        # group.user_set.add(...): instance es el grupo y pk_set los usuarios
+        for user_id in pk_set:
+            bump_roles_version(user_id)
+        invalidate_user_profile(*pk_set)
+    elif action == 'pre_clear':
+        # después del clear ya no se sabe qué usuarios tenía el grupo
+        user_ids = list(instance.user_set.values_list('pk', flat=True))
+        for user_id in user_ids:
+            bump_roles_version(user_id)
+        invalidate_user_profile(*user_ids)
+
+
+@receiver(post_save, sender=OwnerProfile)
+@receiver(post_save, sender=StudentProfile)
+def profile_saved(sender, instance, created, **kwargs):
+    # owner_profile_id va en el token solo con el perfil verificado
+    if created or (sender is OwnerProfile and instance.has_changed('verification_status')):
+        bump_roles_version(instance.user_id)
+    invalidate_user_profile(instance.user_id)
+
+
+@receiver(post_delete, sender=OwnerProfile)
+@receiver(post_delete, sender=StudentProfile)
+def profile_deleted(sender, instance, **kwargs):
+    bump_roles_version(instance.user_id)
+    invalidate_user_profile(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    """is_staff/is_superuser/is_active van en el token (o deciden si es válido)."""
+    if not created and instance.has_changed('is_staff', 'is_superuser', 'is_active'):
+        bump_roles_version(instance.pk)
+    if created or instance.has_changed('email', 'first_name', 'last_name', 'avatar'):
+        invalidate_user_profile(instance.pk)
+
+
+@receiver(post_save, sender=StudentUniversity)
+@receiver(post_delete, sender=StudentUniversity)
+def student_campus_changed(sender, instance, **kwargs):
+    invalidate_user_profile(*StudentProfile.objects.filter(pk=instance.student_id).values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=UniversityCampus)
+def campus_saved(sender, instance, created, **kwargs):
+    """El perfil muestra el nombre de la sede y de su universidad."""
+    if not created and instance.has_changed('name', 'university'):
+        invalidate_user_profile(*StudentUniversity.objects.filter(campus=instance).values_list('student__user_id', flat=True))
+
+
+@receiver(post_save, sender=University)
+def university_saved(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_user_profile(*StudentUniversity.objects.filter(
+            campus__university=instance
+        ).values_list('student__user_id', flat=True).distinct())
@@ -0,0 +1,111 @@
+import logging
+from datetime import timedelta
+
+import cloudinary.uploader
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.db.models import Q
+from django.utils import timezone
+
+from core.reference import reference_table
+from core.timing import timed
+
+from .utils.api_reniec import ReniecUnavailable, full_name, lookup_dni, normalize_name
+from .utils.profile_cache import invalidate_user_profile
+
+logger = logging.getLogger(__name__)
+
+
+def names_match(first_name, last_name, lookup):
+    """True si los nombres ingresados coinciden con los de RENIEC."""
+    return lookup.found and normalize_name(f"{first_name} {last_name}") == full_name(lookup)
+
+
+def apply_dni_lookup(profile, lookup):
+    """
+    Marca el perfil como verificado o rechazado según el DniLookup.
+    Solo al verificarse el usuario recibe los nombres oficiales, el grupo 'owner'
+    y ``owner_profile_id`` en el token; un perfil rechazado pierde el grupo y
+    puede volver a registrarse con datos corregidos.
+    """
+    user = profile.user
+    if names_match(profile.declared_first_name, profile.declared_last_name, lookup):
+        user.first_name = lookup.first_name
+        user.last_name = f"{lookup.last_name_1} {lookup.last_name_2}".strip()
+        user.save(update_fields=['first_name', 'last_name'])
+        user.groups.add(reference_table(Group).get_or_create_id('owner'))
+        profile.verified = True
+        profile.verification_status = profile.VERIFICATION_VERIFIED
+        profile.verification_date = timezone.now()
+    else:
+        profile.verified = False
+        profile.verification_status = profile.VERIFICATION_REJECTED
+        owner_group_id = reference_table(Group).id('owner')
+        if owner_group_id:
+            user.groups.remove(owner_group_id)
+    profile.save()
+    return profile.verification_status
+
+
+def verify_owner_profile(profile_id):
+    """
+    Verifica en segundo plano el DNI de un OwnerProfile pendiente contra RENIEC (con caché).
+    Si decolecta no está disponible el perfil queda pendiente: se reintenta desde el admin o con
+    ``manage.py retry_owner_verifications``, y vence a las OWNER_VERIFICATION_TIMEOUT_HOURS.
+    """
+    from .models import OwnerProfile
+
+    profile = OwnerProfile.objects.select_related('user').filter(
+        id=profile_id, verification_status=OwnerProfile.VERIFICATION_PENDING
+    ).first()
+    if profile is None:
+        return None
+    try:
+        lookup = lookup_dni(profile.dni)
+    except ReniecUnavailable as e:
+        logger.warning("Verificación de DNI del perfil %s pospuesta: %s", profile_id, e)
+        return None
+    result = apply_dni_lookup(profile, lookup)
+    logger.info("Perfil de propietario %s: %s", profile_id, result)
+    return result
+
+
+def expire_stale_pending_profiles(**filters):
+    """
+    Rechaza los OwnerProfile que siguen pendientes pasadas OWNER_VERIFICATION_TIMEOUT_HOURS
+    (RENIEC caído y sin reintento), para que no retengan el DNI. El usuario puede volver a
+    registrarse. Devuelve cuántos perfiles se rechazaron.
+    """
+    from .models import OwnerProfile
+
+    cutoff = timezone.now() - timedelta(hours=getattr(settings, 'OWNER_VERIFICATION_TIMEOUT_HOURS', 48))
+    expired = 0
+    for profile in OwnerProfile.objects.filter(
+        verification_status=OwnerProfile.VERIFICATION_PENDING, updated_at__lt=cutoff, **filters
+    ):
+        # save() y no update(): las señales invalidan el perfil en caché
+        profile.verified = False
+        profile.verification_status = OwnerProfile.VERIFICATION_REJECTED
+        profile.save()
+        logger.info("Perfil de propietario %s: pendiente desde %s, rechazado", profile.id, profile.created_at)
+        expired += 1
+    return expired
+
+
+def upload_google_avatar(user_id, picture_url):
+    """
+    Sube a Cloudinary la foto de perfil de Google de un usuario nuevo.
+    No pisa un avatar que el usuario haya subido mientras tanto.
+    """
+    from .models import User
+
+    try:
+        with timed('http', 'cloudinary'):
+            upload_result = cloudinary.uploader.upload(picture_url)
+    except Exception:
+        logger.exception("Error subiendo avatar desde Google para el usuario %s", user_id)
+        return None
+    if User.objects.filter(Q(avatar__isnull=True) | Q(avatar=''), id=user_id).update(avatar=upload_result['public_id']):
+        # update() no dispara post_save
+        invalidate_user_profile(user_id)
+    return upload_result['public_id']
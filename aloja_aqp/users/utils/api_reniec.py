@@ -1,12 +1,36 @@
-import os
+import logging
+import threading
 import unicodedata
+from concurrent.futures import Future
+from datetime import timedelta
+
 import requests
 from decouple import config
+from django.conf import settings
+from django.utils import timezone
+
+from core.timing import timed
+
+logger = logging.getLogger(__name__)
 
 API_KEY = config('DECOLECTA_API_KEY')
 
 RENIEC_URL = "https://api.decolecta.com/v1/reniec/dni"
 
+# Respuestas de decolecta que significan "el DNI no existe" (se guardan en caché)
+NOT_FOUND_STATUSES = (400, 404, 422)
+
+_session = requests.Session()
+
+# Consultas en curso por DNI dentro de este proceso (ver _fetch_coalesced)
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class ReniecUnavailable(Exception):
+    """decolecta no respondió (sin API key, 401, 429, 5xx, timeout...): no se guarda en caché."""
+
+
 def normalize_name(name: str) -> str:
     """Quita tildes y pasa a minúsculas"""
     name = name.lower()
@@ -16,41 +40,92 @@ def normalize_name(name: str) -> str:
     )
     return name
 
-def verificar_dni(dni: str):
-    """Consulta RENIEC y devuelve nombres y apellidos oficiales del DNI"""
+
+def full_name(lookup) -> str:
+    """Nombre oficial normalizado de un DniLookup (nombres + apellidos)."""
+    return normalize_name(f"{lookup.first_name} {lookup.last_name_1} {lookup.last_name_2}".strip())
+
+
+def fetch_dni(dni: str):
+    """Consulta decolecta. Devuelve el dict de nombres, None si el DNI no existe, o lanza ReniecUnavailable."""
     if not API_KEY:
-        print("No se encontró API_KEY en las variables de entorno.")
-        return None
+        raise ReniecUnavailable("No se encontró DECOLECTA_API_KEY en las variables de entorno.")
 
     headers = {
         "Authorization": f"Bearer {API_KEY}",
         "Content-Type": "application/json",
         "Accept": "application/json"
     }
-
     try:
-        resp = requests.get(RENIEC_URL, headers=headers, params={"numero": dni}, timeout=10)
-        print("Status code RENIEC:", resp.status_code)
-        print("Respuesta cruda:", resp.text)
-
-        if resp.status_code == 200:
-            data = resp.json()
-            print("Datos JSON recibidos:", data)
-            return {
-                "first_name": data.get("first_name", ""),
-                "last_name_1": data.get("first_last_name", ""),
-                "last_name_2": data.get("second_last_name", "")
-            }
-
-        elif resp.status_code == 401:
-            print("401 Unauthorized — API key inválida.")
-        elif resp.status_code == 429:
-            print("429 Rate limit — Límite de peticiones alcanzado.")
-        else:
-            print(f"Error {resp.status_code}: {resp.text}")
+        with timed('http', 'reniec'):
+            resp = _session.get(RENIEC_URL, headers=headers, params={"numero": dni},
+                                timeout=getattr(settings, 'RENIEC_TIMEOUT', 10))
+    except requests.RequestException as e:
+        raise ReniecUnavailable(f"Error de conexión a RENIEC: {e}") from e
 
+    logger.info("RENIEC status %s para DNI ***%s", resp.status_code, dni[-3:])
+    if resp.status_code == 200:
+        data = resp.json()
+        return {
+            "first_name": data.get("first_name", ""),
+            "last_name_1": data.get("first_last_name", ""),
+            "last_name_2": data.get("second_last_name", "")
+        }
+    if resp.status_code in NOT_FOUND_STATUSES:
         return None
+    if resp.status_code == 401:
+        raise ReniecUnavailable("401 Unauthorized — API key inválida.")
+    if resp.status_code == 429:
+        raise ReniecUnavailable("429 Rate limit — Límite de peticiones alcanzado.")
+    raise ReniecUnavailable(f"Error {resp.status_code} de RENIEC")
 
-    except requests.RequestException as e:
-        print("Error de conexión a RENIEC:", e)
+
+def _fetch_coalesced(dni: str):
+    """fetch_dni, pero los hilos que piden el mismo DNI a la vez esperan la misma consulta."""
+    with _inflight_lock:
+        future = _inflight.get(dni)
+        owner = future is None
+        if owner:
+            future = _inflight[dni] = Future()
+    if not owner:
+        return future.result(timeout=getattr(settings, 'RENIEC_TIMEOUT', 10) + 5)
+
+    try:
+        future.set_result(fetch_dni(dni))
+    except Exception as e:
+        future.set_exception(e)
+    finally:
+        with _inflight_lock:
+            _inflight.pop(dni, None)
+    return future.result()
+
+
+def cached_dni_lookup(dni: str):
+    """DniLookup vigente para el DNI, o None (no consulta la API)."""
+    from users.models import DniLookup
+
+    lookup = DniLookup.objects.filter(dni=dni).first()
+    if lookup is None:
         return None
+    if lookup.found:
+        ttl = timedelta(days=getattr(settings, 'RENIEC_CACHE_TTL_DAYS', 30))
+    else:
+        ttl = timedelta(hours=getattr(settings, 'RENIEC_NOT_FOUND_TTL_HOURS', 24))
+    return lookup if lookup.fetched_at >= timezone.now() - ttl else None
+
+
+def lookup_dni(dni: str):
+    """DniLookup del DNI, desde la caché o consultando decolecta (lanza ReniecUnavailable)."""
+    from users.models import DniLookup
+
+    lookup = cached_dni_lookup(dni)
+    if lookup is not None:
+        return lookup
+
+    data = _fetch_coalesced(dni)
+    lookup = DniLookup(dni=dni, found=data is not None, fetched_at=timezone.now(), **(data or {}))
+    DniLookup.objects.bulk_create(
+        [lookup], update_conflicts=True, unique_fields=['dni'],
+        update_fields=['found', 'first_name', 'last_name_1', 'last_name_2', 'fetched_at'],
+    )
+    return lookup
@@ -0,0 +1,62 @@
+"""
+Transporte de google-auth con sesión HTTP reutilizada y caché de certificados.
+
+``id_token.verify_oauth2_token`` descarga los certificados públicos de Google
+en cada llamada si el transporte no los guarda. Este transporte reutiliza una
+``requests.Session`` (conexiones keep-alive) y conserva las respuestas GET
+exitosas de las URLs de certificados durante el ``max-age`` que indica Google
+(Cache-Control), como haría un cliente HTTP con caché.
+"""
+import re
+import threading
+import time
+
+import requests
+from google.auth.transport.requests import Request
+
+from core.timing import timed
+
+CERT_URL_PREFIX = 'https://www.googleapis.com/oauth2/'
+# Si la respuesta no trae max-age, se guarda este tiempo
+DEFAULT_MAX_AGE = 60 * 60
+
+_max_age_re = re.compile(r'max-age=(\d+)')
+
+
+class CachingRequest(Request):
+    """google.auth Request que guarda en memoria las respuestas de certificados."""
+
+    def __init__(self, session=None):
+        super().__init__(session=session or requests.Session())
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, url, method='GET', body=None, headers=None, timeout=None, **kwargs):
+        if method != 'GET' or not url.startswith(CERT_URL_PREFIX):
+            with timed('http', 'google'):
+                return super().__call__(url, method=method, body=body, headers=headers, timeout=timeout, **kwargs)
+
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(url)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        with timed('http', 'google'):
+            response = super().__call__(url, method=method, body=body, headers=headers, timeout=timeout, **kwargs)
+        if response.status == 200:
+            match = _max_age_re.search(response.headers.get('Cache-Control', ''))
+            max_age = int(match.group(1)) if match else DEFAULT_MAX_AGE
+            # Leer el contenido ahora para que la respuesta guardada no dependa de la conexión
+            response.data
+            with self._lock:
+                self._cache[url] = (now + max_age, response)
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+# Instancia compartida por el proceso (la sesión y la caché son thread-safe para este uso)
+google_request = CachingRequest()
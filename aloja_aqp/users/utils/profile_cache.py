@@ -0,0 +1,55 @@
+"""
+Respuesta de ``UserResponseSerializer`` armada en pocas consultas y en caché.
+
+``load_user_for_response`` trae el usuario con sus perfiles (1 consulta), sus
+grupos (1) y las sedes del estudiante con su universidad (1). La respuesta
+serializada se guarda por usuario durante ``USER_PROFILE_CACHE_SECONDS`` y
+se invalida (ver users.signals) cuando cambian el usuario, sus perfiles, sus
+grupos o sus sedes, o el nombre de una sede/universidad que tiene asignada.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+
+from core.invalidation import publish_cache_keys
+from universities.models import StudentUniversity
+from users.models import User
+
+
+def _profile_cache_key(user_id):
+    return f'users:profile:{user_id}'
+
+
+def load_user_for_response(user_id):
+    """User con todo lo que lee UserResponseSerializer ya cargado (3 consultas)."""
+    return User.objects.select_related('student_profile', 'owner_profile').prefetch_related(
+        'groups',
+        Prefetch(
+            'student_profile__studentuniversity_set',
+            queryset=StudentUniversity.objects.select_related('campus__university').order_by('id'),
+        ),
+    ).get(pk=user_id)
+
+
+def render_user_profile(user_id):
+    """Datos de UserResponseSerializer para el usuario, desde la caché si están."""
+    from users.serializers import UserResponseSerializer
+
+    key = _profile_cache_key(user_id)
+    data = cache.get(key)
+    if data is None:
+        data = dict(UserResponseSerializer(load_user_for_response(user_id)).data)
+        cache.set(key, data, getattr(settings, 'USER_PROFILE_CACHE_SECONDS', 600))
+    return data
+
+
+def invalidate_user_profile(*user_ids):
+    """Borra la respuesta en caché de los usuarios indicados."""
+    keys = [_profile_cache_key(user_id) for user_id in user_ids]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    # Otra petición pudo guardar los datos viejos antes del commit
+    transaction.on_commit(lambda: cache.delete_many(keys))
+    publish_cache_keys(keys)
@@ -1,7 +1,7 @@
-from rest_framework_simplejwt.tokens import RefreshToken
+from users.authentication import ClaimsRefreshToken
 
 def generate_tokens_for_user(user):
-    refresh = RefreshToken.for_user(user)
+    refresh = ClaimsRefreshToken.for_user(user)
     return {
         'refresh': str(refresh),
         'access': str(refresh.access_token)
@@ -7,9 +7,9 @@ from ..serializers import (
     LoginSerializer,
     StudentRegistrationSerializer,
     OwnerRegistrationSerializer,
-    ChangePasswordSerializer,
-    UserResponseSerializer
+    ChangePasswordSerializer
 )
+from ..utils.profile_cache import render_user_profile
 from ..utils.tokens import generate_tokens_for_user
 
 
@@ -20,7 +20,7 @@ class UserLoginView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
-        user_data = UserResponseSerializer(user).data
+        user_data = render_user_profile(user.id)
         tokens = generate_tokens_for_user(user)
         return Response({"user": user_data, **tokens}, status=status.HTTP_200_OK)
 
@@ -33,10 +33,9 @@ class UserRegistrationView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
-        response_serializer = UserResponseSerializer(user)
         return Response({
             "message": "Usuario registrado exitosamente",
-            "user": response_serializer.data
+            "user": render_user_profile(user.id)
         }, status=status.HTTP_201_CREATED)
 
 
@@ -48,18 +47,21 @@ class OwnerRegistrationView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
         owner_profile = serializer.save()
-        user_data = UserResponseSerializer(owner_profile.user).data
+        user_data = render_user_profile(owner_profile.user_id)
+        # Los tokens anteriores quedaron revocados al cambiar los roles; se entregan nuevos
+        tokens = generate_tokens_for_user(owner_profile.user)
         return Response({
             "message": "Perfil de propietario creado exitosamente",
-            "user": user_data
+            "verification_status": owner_profile.verification_status,
+            "user": user_data,
+            **tokens
         }, status=status.HTTP_201_CREATED)
 
 class CurrentUserProfileView(generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        serializer = UserResponseSerializer(request.user)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(render_user_profile(request.user.id), status=status.HTTP_200_OK)
     
 class LogoutView(APIView):
     permission_classes = [IsAuthenticated]
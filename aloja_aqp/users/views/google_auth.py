@@ -6,10 +6,12 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from google.oauth2 import id_token
-from google.auth.transport import requests
-import cloudinary.uploader
+from core.background import run_in_background
+from core.reference import reference_table
 from ..models import User, UserStatus, StudentProfile
-from ..serializers import UserResponseSerializer
+from ..tasks import upload_google_avatar
+from ..utils.google_certs import google_request
+from ..utils.profile_cache import render_user_profile
 from ..utils.tokens import generate_tokens_for_user
 
 GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
@@ -23,7 +25,7 @@ class GoogleLoginAPIView(APIView):
             return Response({'error': 'ID Token no proporcionado'}, status=400)
 
         try:
-            idinfo = id_token.verify_oauth2_token(token, requests.Request(), GOOGLE_CLIENT_ID)
+            idinfo = id_token.verify_oauth2_token(token, google_request, GOOGLE_CLIENT_ID)
             email = idinfo['email']
             first_name = idinfo.get('given_name', '')
             last_name = idinfo.get('family_name', '')
@@ -35,22 +37,16 @@ class GoogleLoginAPIView(APIView):
                 user.last_name = last_name
                 user.google_id = idinfo['sub']
                 user.set_unusable_password()
-                if picture_url:
-                    try:
-                        upload_result = cloudinary.uploader.upload(picture_url)
-                        user.avatar = upload_result['public_id']
-
-                    except Exception as e:
-                        print("Error subiendo avatar desde Google:", e)
                 user.save()
-                user.refresh_from_db()  # 🔄 recarga avatar y demás campos
-                student_group, _ = Group.objects.get_or_create(name='student')
-                user.groups.add(student_group)
-
-                active_status, _ = UserStatus.objects.get_or_create(name='active')
-                StudentProfile.objects.create(user=user, phone_number='', status=active_status)
-
-            user_data = UserResponseSerializer(user).data
+                if picture_url:
+                    # La foto se sube a Cloudinary en segundo plano; el login no la espera
+                    run_in_background(upload_google_avatar, user.id, picture_url)
+                user.groups.add(reference_table(Group).get_or_create_id('student'))
+                StudentProfile.objects.create(
+                    user=user, phone_number='', status_id=reference_table(UserStatus).get_or_create_id('active')
+                )
+
+            user_data = render_user_profile(user.id)
             tokens = generate_tokens_for_user(user)
             return Response({"user": user_data, **tokens}, status=status.HTTP_200_OK)
 
@@ -4,6 +4,6 @@ from ..models import OwnerProfile
 from ..serializers import OwnerProfileSViewDataSerializer
 
 class OwnerProfileDetailView(generics.RetrieveAPIView):
-    queryset = OwnerProfile.objects.all()
+    queryset = OwnerProfile.objects.select_related('user')
     serializer_class = OwnerProfileSViewDataSerializer
     lookup_field = 'id'  # permite usar /owners/<id>/
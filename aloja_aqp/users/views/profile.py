@@ -2,7 +2,8 @@ from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from ..serializers import UserUpdateSerializer, UserResponseSerializer, StudentProfileSerializer
+from ..serializers import UserUpdateSerializer, StudentProfileSerializer
+from ..utils.profile_cache import render_user_profile
 from universities.models import StudentUniversity, UniversityCampus
 from universities.serializers import StudentUniversitySerializer
 
@@ -57,6 +58,5 @@ class UpdateUserInfoView(APIView):
                 )
 
         # Respuesta final con datos completos
-        user.refresh_from_db()
-        user_data = UserResponseSerializer(user).data
+        user_data = render_user_profile(user.id)
         return Response(user_data, status=status.HTTP_200_OK)
\ No newline at end of file